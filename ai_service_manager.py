@@ -1,28 +1,170 @@
-from kimi_manager import AIManager as KimiManager
-from tencent_manager import TencentAIManager
-from baidu_manager import BaiduAIManager
-from chatgpt_manager import ChatGPTManager
+import importlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Any
 from config_manager import ConfigManager
-# 后续可以导入其他AI管理器
-# from claude_manager import ClaudeManager
+
+# 配置文件中没有 providers 段时使用的默认服务列表
+DEFAULT_PROVIDERS = [
+    {'name': 'Kimi', 'module': 'kimi_manager', 'class': 'AIManager', 'enabled': True},
+    {'name': 'TencentAI', 'module': 'tencent_manager', 'class': 'TencentAIManager', 'enabled': True},
+    {'name': 'BaiduAI', 'module': 'baidu_manager', 'class': 'BaiduAIManager', 'enabled': True},
+    {'name': 'ChatGPT', 'module': 'chatgpt_manager', 'class': 'ChatGPTManager', 'enabled': False},
+]
+
 
 class AIServiceManager:
+    """AI服务注册表
+
+    服务在 config.yaml 的 providers 段中声明。声明只记录模块和类名，服务模块
+    （以及它依赖的 SDK）在第一次被启用时才导入和构造；配置文件变化时，
+    新增或删除的服务会同步到注册表并通知监听者。
+    """
     def __init__(self):
-        # 确保配置已加载
-        ConfigManager()
-        self.ai_services = {
-            'Kimi': KimiManager(),
-            'TencentAI': TencentAIManager(),
-            'BaiduAI': BaiduAIManager(),
-            # 'ChatGPT': ChatGPTManager(),
-            # 后续可以添加其他AI服务
-            # 'Claude': ClaudeManager(),
-        }
-    
+        self._lock = threading.Lock()
+        self._specs: Dict[str, Dict[str, Any]] = {}
+        self._construct_locks: Dict[str, threading.Lock] = {}
+        self.ai_services = {}  # 已构造的服务实例
+        self._listeners: List[Callable[[], None]] = []
+
+        config_manager = ConfigManager()
+        self._load_specs(config_manager)
+        config_manager.add_reload_listener(self._on_config_reload)
+
+    def _load_specs(self, config_manager: ConfigManager) -> bool:
+        """从配置加载服务声明，返回服务列表是否发生变化"""
+        providers = config_manager.get_optional_config('providers') or DEFAULT_PROVIDERS
+        specs = {}
+        for provider in providers:
+            try:
+                specs[provider['name']] = {
+                    'name': provider['name'],
+                    'module': provider['module'],
+                    'class': provider['class'],
+                    'enabled': bool(provider.get('enabled', True)),
+                }
+            except KeyError as e:
+                print(f"AI服务声明缺少字段 {e}: {dict(provider)}")
+
+        with self._lock:
+            old_specs = self._specs
+            self._specs = specs
+        # 被删除或改了实现的服务需要释放旧实例
+        stale = [name for name, spec in old_specs.items()
+                 if name not in specs
+                 or (spec['module'], spec['class']) != (specs[name]['module'], specs[name]['class'])]
+        for name in stale:
+            self._drop_instance(name)
+        return list(specs) != list(old_specs) or bool(stale)
+
+    def _on_config_reload(self, config_manager: ConfigManager):
+        if self._load_specs(config_manager):
+            self._notify()
+
+    def _notify(self):
+        for callback in list(self._listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"通知AI服务变更时出错: {e}")
+
+    def add_change_listener(self, callback: Callable[[], None]):
+        """注册服务列表变化时的回调（可能在非主线程中调用）"""
+        self._listeners.append(callback)
+
+    def register_provider(self, name: str, module: str, class_name: str, enabled: bool = True):
+        """在运行时添加一个AI服务声明"""
+        with self._lock:
+            self._specs[name] = {'name': name, 'module': module, 'class': class_name, 'enabled': enabled}
+        self._notify()
+
+    def unregister_provider(self, name: str):
+        """在运行时移除一个AI服务，已构造的实例会被停止"""
+        with self._lock:
+            if self._specs.pop(name, None) is None:
+                return
+        self._drop_instance(name)
+        self._notify()
+
+    def _drop_instance(self, name: str):
+        with self._lock:
+            service = self.ai_services.pop(name, None)
+        if service is not None and hasattr(service, 'stop'):
+            service.stop()
+
     def get_available_services(self):
-        """返回所有可用的AI服务名称"""
-        return list(self.ai_services.keys())
-    
+        """返回所有已声明的AI服务名称"""
+        with self._lock:
+            return list(self._specs.keys())
+
+    def is_enabled(self, name) -> bool:
+        """返回配置中该服务是否默认启用"""
+        with self._lock:
+            spec = self._specs.get(name)
+        return bool(spec and spec['enabled'])
+
+    def get_active_services(self) -> Dict[str, Any]:
+        """返回已经构造的服务实例"""
+        with self._lock:
+            return dict(self.ai_services)
+
+    def enable(self, name) -> Optional[Any]:
+        """导入并构造服务（如果尚未构造），失败时返回None"""
+        return self.get_service(name)
+
+    def disable(self, name):
+        """停止并释放服务实例，声明保留，之后可以重新启用"""
+        self._drop_instance(name)
+
+    @staticmethod
+    def _construct(name: str, spec: Dict[str, Any]) -> Optional[Any]:
+        try:
+            start_time = time.time()
+            module = importlib.import_module(spec['module'])
+            service = getattr(module, spec['class'])()
+            print(f"AI服务 {name} 已加载，耗时: {(time.time() - start_time)*1000:.2f}ms")
+            return service
+        except Exception as e:
+            print(f"加载AI服务 {name} 失败: {e}")
+            return None
+
+    def create_instance(self, name) -> Optional[Any]:
+        """构造一个不进入注册表的独立实例（有自己的对话历史），失败时返回None"""
+        with self._lock:
+            spec = self._specs.get(name)
+        if spec is None:
+            return None
+        return self._construct(name, spec)
+
     def get_service(self, name):
-        """获取指定的AI服务实例"""
-        return self.ai_services.get(name) 
\ No newline at end of file
+        """获取指定的AI服务实例，第一次获取时才导入模块并构造"""
+        with self._lock:
+            service = self.ai_services.get(name)
+            if service is not None:
+                return service
+            spec = self._specs.get(name)
+            if spec is None:
+                return None
+            construct_lock = self._construct_locks.setdefault(name, threading.Lock())
+
+        # 每个服务单独加锁构造，避免导入较慢的SDK时阻塞其他服务和界面线程
+        with construct_lock:
+            with self._lock:
+                service = self.ai_services.get(name)
+            if service is not None:
+                return service
+            service = self._construct(name, spec)
+            if service is None:
+                return None
+            with self._lock:
+                current = self._specs.get(name)
+                registered = (current is not None
+                              and (current['module'], current['class']) == (spec['module'], spec['class']))
+                if registered:
+                    self.ai_services[name] = service
+            if not registered:
+                # 构造期间声明已被移除或替换
+                if hasattr(service, 'stop'):
+                    service.stop()
+                return None
+            return service
@@ -0,0 +1,65 @@
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+# 句末标点；英文句点只在后面跟空白时才算句末，避免把小数点、版本号当作断句
+SENTENCE_ENDINGS = "。！？!?；;"
+
+
+class SentenceBudget:
+    """流式回复的"答案优先"截断预算
+
+    逐段喂入模型输出，累计到 max_sentences 个完整句子或 max_chars 个字符时
+    报告已完成，调用方随即关闭流或连接，不再等待剩余的生成。
+    """
+    def __init__(self, max_sentences: int = 3, max_chars: int = 0):
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+        self.text = ""
+        self.sentences = 0
+        self._scan_pos = 0
+        self.truncation: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_config(cls, config: Optional[Mapping[str, Any]]) -> Optional["SentenceBudget"]:
+        """根据服务配置中的 answer_first 段创建预算，未启用时返回 None"""
+        if not config or not config.get('enabled', False):
+            return None
+        return cls(max_sentences=config.get('max_sentences', 3),
+                   max_chars=config.get('max_chars', 0))
+
+    @property
+    def done(self) -> bool:
+        return self.truncation is not None
+
+    def feed(self, delta: str) -> Tuple[str, bool]:
+        """喂入一段输出，返回 (应保留的部分, 是否已达到预算)"""
+        if self.done or not delta:
+            return "", self.done
+
+        start = len(self.text)
+        combined = self.text + delta
+        cut = None
+        # 需要看到下一个字符才能判断句末，最后一个字符留到下一段再判断
+        for i in range(self._scan_pos, len(combined) - 1):
+            ch, nxt = combined[i], combined[i + 1]
+            if ch in SENTENCE_ENDINGS:
+                is_end = nxt not in SENTENCE_ENDINGS  # 连续的句末标点（如"？！"）只算一句
+            else:
+                is_end = ch == "." and nxt.isspace()
+            if not is_end:
+                continue
+            self.sentences += 1
+            if self.max_sentences and self.sentences >= self.max_sentences:
+                cut = i + 1
+                self.truncation = {'reason': 'sentences', 'sentences': self.sentences, 'chars': cut}
+                break
+        self._scan_pos = max(self._scan_pos, len(combined) - 1)
+
+        if self.max_chars and (cut if cut is not None else len(combined)) > self.max_chars:
+            cut = self.max_chars
+            self.truncation = {'reason': 'chars', 'sentences': self.sentences, 'chars': cut}
+
+        if cut is not None:
+            combined = combined[:cut]
+        accepted = combined[start:]
+        self.text = combined
+        return accepted, self.done
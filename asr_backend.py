@@ -0,0 +1,133 @@
+from typing import Any, Dict, List, Mapping, Optional
+
+# ASR 用到的几类模型在 FunASR（PyTorch）下的模型名
+TORCH_MODELS = {
+    'streaming': "paraformer-zh-streaming",
+    'offline': "paraformer-zh",
+    'punc': "ct-punc",
+    'punc_realtime': "iic/punc_ct-transformer_zh-cn-common-vad_realtime-vocab272727",
+}
+
+# 对应的 ONNX 模型目录或 ModelScope 模型ID，funasr_onnx 会在首次使用时下载并导出
+ONNX_MODELS = {
+    'streaming': "iic/speech_paraformer-large_asr_nat-zh-cn-16k-common-vocab8404-online",
+    'offline': "iic/speech_paraformer-large_asr_nat-zh-cn-16k-common-vocab8404-pytorch",
+    'punc': "iic/punc_ct-transformer_zh-cn-common-vocab272727-pytorch",
+    'punc_realtime': "iic/punc_ct-transformer_zh-cn-common-vad_realtime-vocab272727",
+}
+
+BACKENDS = ('torch', 'onnx')
+
+
+def _preds_text(result: Any) -> str:
+    """从 funasr_onnx 的识别结果中取出文本"""
+    if not result:
+        return ""
+    item = result[0] if isinstance(result, (list, tuple)) else result
+    if isinstance(item, dict):
+        item = item.get('preds', item.get('text', ""))
+    if isinstance(item, (list, tuple)):
+        item = item[0] if item else ""
+    return item if isinstance(item, str) else ""
+
+
+class _TorchThreadedModel:
+    """为 AutoModel 指定算子内线程数，每次推理前在调用线程上设置"""
+    def __init__(self, model, threads: int):
+        self.model = model
+        self.threads = threads
+
+    def generate(self, *args, **kwargs):
+        from thread_budget import set_torch_threads
+        set_torch_threads(self.threads)
+        return self.model.generate(*args, **kwargs)
+
+
+class _OnnxStreamingParaformer:
+    """ONNX Runtime 流式 Paraformer，接口与 AutoModel.generate 保持一致"""
+    def __init__(self, model_dir: str, chunk_size: List[int], **kwargs):
+        from funasr_onnx.paraformer_online_bin import Paraformer
+        self.model = Paraformer(model_dir, batch_size=1, chunk_size=chunk_size, **kwargs)
+
+    def generate(self, input, cache: Optional[Dict] = None, is_final: bool = False, **kwargs):
+        # cache 字典由模型原地填充，调用方传入新的空字典即可重置
+        param_dict = {'cache': cache if cache is not None else {}, 'is_final': is_final}
+        return [{"text": _preds_text(self.model(audio_in=input, param_dict=param_dict))}]
+
+
+class _OnnxOfflineParaformer:
+    """ONNX Runtime 非流式 Paraformer"""
+    def __init__(self, model_dir: str, **kwargs):
+        from funasr_onnx import Paraformer
+        self.model = Paraformer(model_dir, batch_size=1, **kwargs)
+
+    def generate(self, input, **kwargs):
+        return [{"text": _preds_text(self.model(input))}]
+
+
+class _OnnxPunctuation:
+    """ONNX Runtime 标点模型"""
+    def __init__(self, model_dir: str, **kwargs):
+        from funasr_onnx import CT_Transformer
+        self.model = CT_Transformer(model_dir, **kwargs)
+
+    def generate(self, input: str, **kwargs):
+        result = self.model(input)
+        return [{"text": result[0] if result else input}]
+
+
+class _OnnxRealtimePunctuation:
+    """ONNX Runtime 实时标点模型，cache 保存跨片段的上下文"""
+    def __init__(self, model_dir: str, **kwargs):
+        from funasr_onnx import CT_Transformer_VadRealtime
+        self.model = CT_Transformer_VadRealtime(model_dir, **kwargs)
+
+    def generate(self, input: str, cache: Optional[Dict] = None, **kwargs):
+        param_dict = {'cache': cache if cache is not None else {}}
+        # CT_Transformer_VadRealtime.__call__(text, param_dict, split_size)
+        result = self.model(input, param_dict=param_dict)
+        return [{"text": result[0] if result else input}]
+
+
+_ONNX_WRAPPERS = {
+    'streaming': _OnnxStreamingParaformer,
+    'offline': _OnnxOfflineParaformer,
+    'punc': _OnnxPunctuation,
+    'punc_realtime': _OnnxRealtimePunctuation,
+}
+
+
+def load_model(kind: str, config: Optional[Mapping[str, Any]] = None,
+               model: Optional[str] = None, chunk_size: Optional[List[int]] = None,
+               threads: Optional[int] = None):
+    """按 asr 配置中的 backend 加载一类模型，返回带 generate() 方法的对象
+
+    kind: streaming / offline / punc / punc_realtime；model 为空时使用该后端的默认模型。
+    torch 后端直接返回 FunASR 的 AutoModel；onnx 后端通过 funasr_onnx 加载导出的模型，
+    可选 int8 量化。threads 指定该模型的算子内线程数。
+    """
+    config = config or {}
+    backend = config.get('backend', 'torch')
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的ASR推理后端: {backend}，可选: {', '.join(BACKENDS)}")
+    if kind not in TORCH_MODELS:
+        raise ValueError(f"未知的模型类型: {kind}")
+
+    if backend == 'torch':
+        from funasr import AutoModel
+        auto_model = AutoModel(model=model or TORCH_MODELS[kind], disable_update=True)
+        return _TorchThreadedModel(auto_model, threads) if threads else auto_model
+
+    onnx_config = config.get('onnx') or {}
+    model_dir = model or (onnx_config.get('models') or {}).get(kind) or ONNX_MODELS[kind]
+    kwargs = {
+        'quantize': onnx_config.get('quantize', True),
+        'intra_op_num_threads': threads or onnx_config.get('intra_op_num_threads', 4),
+    }
+    try:
+        if kind == 'streaming':
+            return _OnnxStreamingParaformer(model_dir, chunk_size or [0, 10, 5], **kwargs)
+        return _ONNX_WRAPPERS[kind](model_dir, **kwargs)
+    except ImportError as e:
+        raise RuntimeError("ONNX 推理后端需要安装 funasr-onnx 和 onnxruntime: "
+                           "pip install funasr-onnx onnxruntime") from e
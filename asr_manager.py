@@ -1,8 +1,15 @@
 import os
+import queue
+import threading
 import numpy as np
-from funasr import AutoModel
-from typing import Optional, Callable
+from typing import Optional, Callable, List
 import time
+from asr_backend import load_model
+from config_manager import ConfigManager
+from thread_budget import ThreadBudget
+from endpoint_detector import EndpointDetector
+
+SENTENCE_ENDINGS = "。！？!?；;"
 
 class ASRManager:
     _instance = None
@@ -24,22 +31,75 @@ class ASRManager:
         
         # 初始化状态
         self.running = False
-        self.result_callback: Optional[Callable[[str], None]] = None
+        # 断句结果回调: (文本, 断句原因)，原因为 sentence/endpoint/silence/overflow/force
+        self.result_callback: Optional[Callable[[str, str], None]] = None
         self.silence_callback: Optional[Callable[[], None]] = None  # 新增空白回调
+        # 未断句的识别文本变化时回调: (当前句已识别的文本, 对应音频块送入识别的时间)
+        self.partial_callback: Optional[Callable[[str, float], None]] = None
+        
+        self.sample_rate = 16000
+        asr_config = ConfigManager().get_optional_config('asr')
         
-        # 初始化模型
+        # 初始化模型（asr.backend 选择 PyTorch 或 ONNX Runtime 推理）
         os.environ['MODELSCOPE_OFFLINE'] = '1'  # 启用离线模式
-        self.model = AutoModel(model="paraformer-zh-streaming", disable_update=True)
-        self.punc_model = AutoModel(model="ct-punc", disable_update=True)
+        load_start = time.time()
+        self.thread_budget = ThreadBudget()
+        self.thread_budget.apply_process()
+        self.model = load_model('streaming', asr_config, chunk_size=self.chunk_size,
+                                threads=self.thread_budget.model_threads('streaming'))
+        self.punc_model = load_model('punc', asr_config, threads=self.thread_budget.model_threads('punc'))
+        
+        # 两遍识别：断句后用离线模型重新解码整段音频，结果替换流式识别文本
+        two_pass_config = asr_config.get('two_pass') or {}
+        self.two_pass = bool(two_pass_config.get('enabled', False))
+        self.two_pass_budget = two_pass_config.get('budget_ms', 800) / 1000.0
+        self.offline_model = None
+        self._segment_queue = None
+        if self.two_pass:
+            self.offline_model = load_model('offline', asr_config,
+                                            threads=self.thread_budget.model_threads('offline'))
+            self._segment_queue = queue.Queue()
+            threading.Thread(target=self._second_pass_worker, name="asr-second-pass", daemon=True).start()
+        
+        # 流式标点：每个识别片段都送入实时标点模型，句子一结束就立即输出，不再等待静音
+        punc_config = asr_config.get('streaming_punc') or {}
+        self.streaming_punc = bool(punc_config.get('enabled', False))
+        self.min_sentence_chars = punc_config.get('min_chars', 4)
+        self.punc_rt_model = None
+        self.punc_cache = {}
+        if self.streaming_punc:
+            self.punc_rt_model = load_model('punc_realtime', asr_config, model=punc_config.get('model'),
+                                            threads=self.thread_budget.model_threads('punc_realtime'))
+        print(f"ASR模型加载耗时({asr_config.get('backend', 'torch')}): {time.time() - load_start:.2f}s")
+        
+        # 自适应断句：启用后取代固定的5秒无文本和10字阈值
+        self.endpoint = EndpointDetector.from_config(asr_config.get('endpoint'))
+        self.min_segment_chars = self.endpoint.min_chars if self.endpoint else 10
+        
+        # 长时间运行的内存上限：单句累积的字数和音频时长超过上限时强制断句并重置缓存
+        limits_config = asr_config.get('limits') or {}
+        self.max_segment_chars = limits_config.get('max_segment_chars', 500)
+        self.max_segment_samples = int(limits_config.get('max_segment_seconds', 60) * self.sample_rate)
+        
+        # 两遍识别的实时率（处理耗时 / 音频时长），指数滑动平均
+        self.streaming_rtf = 0.0
+        self.offline_rtf = 0.0
         
         # 缓存识别结果
+        self._lock = threading.Lock()
         self.cache = {}
         self.temp_result = []
+        self.segment_audio: List[np.ndarray] = []  # 当前句子的音频，供第二遍解码
+        self.segment_mid_chunk = False  # 当前句子从某个音频块的中间开始，音频无法与文本对齐
+        self.cache_samples = 0  # 流式缓存自上次重置以来处理的样本数
         self.last_speech_time = time.time()  # 添加最后检测到语音的时间
         
+        # 可选的滚动录音器，用于回放复现识别问题
+        self.recorder = None
+        
         self._initialized = True
     
-    def set_result_callback(self, callback: Callable[[str], None]):
+    def set_result_callback(self, callback: Callable[[str, str], None]):
         """设置结果回调函数"""
         self.result_callback = callback
     
@@ -47,10 +107,22 @@ class ASRManager:
         """设置空白检测回调函数"""
         self.silence_callback = callback
     
+    def set_partial_callback(self, callback: Callable[[str, float], None]):
+        """设置中间结果回调函数，用于实时显示尚未断句的文本"""
+        self.partial_callback = callback
+    
+    def set_recorder(self, recorder):
+        """设置滚动录音器，送入识别的音频和断句位置都会被记录"""
+        self.recorder = recorder
+    
     def process_audio(self, audio_chunk: np.ndarray):
         """处理音频数据"""
         if not self.running or not self.result_callback:
             return
+        self.thread_budget.enter_stage('asr')
+        
+        if self.recorder:
+            self.recorder.write(audio_chunk)
             
         print(f"ASR开始处理音频块，数据大小: {len(audio_chunk)}")
         start_time = time.time()
@@ -66,69 +138,245 @@ class ASRManager:
             encoder_chunk_look_back=self.encoder_chunk_look_back,
             decoder_chunk_look_back=self.decoder_chunk_look_back
         )
-        print(f"ASR识别耗时: {(time.time() - asr_start)*1000:.2f}ms")
+        asr_elapsed = time.time() - asr_start
+        print(f"ASR识别耗时: {asr_elapsed*1000:.2f}ms")
+        self.streaming_rtf = self._ema(self.streaming_rtf, asr_elapsed / (len(audio_chunk) / self.sample_rate))
+        
+        with self._lock:
+            self.cache_samples += len(audio_chunk)
+            if self.two_pass:
+                self.segment_audio.append(audio_chunk)
         
-        if res[0]["text"].strip():
+        text_changed = bool(res[0]["text"].strip())
+        if text_changed:
             print(f"识别到文本: {res[0]['text']}")
-            self.temp_result.append(res[0]["text"])
+            if self.streaming_punc:
+                self._punctuate_fragment(res[0]["text"])
+            else:
+                with self._lock:
+                    self.temp_result.append(res[0]["text"])
             self.last_speech_time = current_time  # 更新最后检测到文本的时间
-        elif current_time - self.last_speech_time > 5.0:  # 超过5秒没有新文本
+            self._notify_partial(start_time)
+        
+        if self.endpoint:
+            self._observe_endpoint(len(audio_chunk) / self.sample_rate, True, text_changed)
+        elif not text_changed and current_time - self.last_speech_time > 5.0:  # 超过5秒没有新文本
             print("检测到5秒无新文本，触发断句")
             self.handle_silence()  # 直接调用空白处理函数，让handle_silence来判断是否需要处理
         
+        self._enforce_limits()
+        
         print(f"本次音频处理总耗时: {(time.time() - start_time)*1000:.2f}ms")
     
+    def _notify_partial(self, audio_time: float):
+        if self.partial_callback:
+            with self._lock:
+                pending = "".join(self.temp_result)
+            self.partial_callback(pending, audio_time)
+    
+    def process_silence(self, duration: float):
+        """处理采集端判为静音、未送入识别的音频块，用于自适应断句"""
+        if not self.running:
+            return
+        if self.recorder:
+            self.recorder.mark_quiet(duration)
+        if not self.endpoint:
+            return
+        self._observe_endpoint(duration, False, False)
+    
+    def _observe_endpoint(self, duration: float, voice: bool, text_changed: bool):
+        with self._lock:
+            pending = "".join(self.temp_result)
+        reason = self.endpoint.observe(duration, voice, text_changed, pending)
+        if reason:
+            print(f"检测到断句点({reason})")
+            raw_text, audio = self._take_segment()
+            if raw_text:
+                self._finalize_segment(raw_text, audio, 'endpoint')
+    
+    @staticmethod
+    def _ema(current: float, value: float, alpha: float = 0.2) -> float:
+        return value if current == 0.0 else (1 - alpha) * current + alpha * value
+    
+    def _punctuate_fragment(self, text: str):
+        """用实时标点模型处理新片段，输出其中已经结束的句子"""
+        punc_start = time.time()
+        try:
+            punc_res = self.punc_rt_model.generate(input=text, cache=self.punc_cache)
+            punctuated = punc_res[0]["text"] if punc_res else text
+        except Exception as e:
+            print(f"流式标点处理出错: {e}")
+            punctuated = text
+        print(f"流式标点耗时: {(time.time() - punc_start)*1000:.2f}ms")
+        
+        with self._lock:
+            self.temp_result.append(punctuated)
+            pending = "".join(self.temp_result)
+            end = self._last_sentence_end(pending)
+            if end <= 0:
+                return
+            sentence, remainder = pending[:end], pending[end:]
+            if len("".join(sentence.split())) < self.min_sentence_chars:
+                return  # 过短的句子（如"嗯。"）并入下一句
+            self.temp_result = [remainder] if remainder else []
+            # 已输出的句子不再做第二遍识别。句子结束在最新的片段内，有剩余文本时它的音频
+            # 从这一块的中间开始，整块重新解码会重复已输出句子的结尾，只能用流式识别结果
+            self.segment_audio = []
+            self.segment_mid_chunk = bool(remainder)
+        
+        self._finalize_segment(sentence, None, 'sentence')
+    
+    @staticmethod
+    def _last_sentence_end(text: str) -> int:
+        """返回最后一个句末标点之后的位置，没有时返回0"""
+        for i in range(len(text) - 1, -1, -1):
+            if text[i] in SENTENCE_ENDINGS:
+                end = i + 1
+                # 连续的句末标点一并算入
+                while end < len(text) and text[end] in SENTENCE_ENDINGS:
+                    end += 1
+                return end
+        return 0
+    
+    def _enforce_limits(self):
+        """一直没有断句时，防止文本、音频和流式缓存无限增长"""
+        with self._lock:
+            chars = sum(len(t) for t in self.temp_result)
+            over = chars > self.max_segment_chars or self.cache_samples > self.max_segment_samples
+        if not over:
+            return
+        print(f"当前句子超出上限（{chars}字，{self.cache_samples / self.sample_rate:.0f}秒），强制断句")
+        raw_text, audio = self._take_segment()
+        if raw_text:
+            self._finalize_segment(raw_text, audio, 'overflow')
+    
+    def _take_segment(self):
+        """取出当前累积的文本和音频，并为下一句重置状态"""
+        with self._lock:
+            raw_text = "".join(self.temp_result)
+            audio = None if self.segment_mid_chunk else self.segment_audio
+            self.temp_result = []
+            self.segment_audio = []
+            self.segment_mid_chunk = False
+            self.cache = {}  # 重置 ASR 缓存
+            self.cache_samples = 0
+            self.punc_cache = {}
+        if self.endpoint:
+            self.endpoint.reset_segment()
+        return raw_text, audio
+    
+    def _punctuate(self, text: str) -> str:
+        """标点处理，出错时返回原文"""
+        try:
+            punc_start = time.time()
+            punc_res = self.punc_model.generate(input=text)
+            print(f"标点处理耗时: {(time.time() - punc_start)*1000:.2f}ms")
+            return punc_res[0]["text"]
+        except Exception as e:
+            print(f"标点处理出错: {e}")
+            return text
+    
+    def _finalize_segment(self, raw_text: str, audio: Optional[List[np.ndarray]], label: str):
+        """断句：直接加标点输出，或交给第二遍解码线程
+
+        启用两遍识别时所有句子（包括没有音频、不做第二遍的句子）都经过同一个队列，
+        由第二遍线程按断句顺序输出，后面的句子不会越过仍在解码的前一句。
+        """
+        if self.recorder:
+            self.recorder.mark(label, raw_text)
+        if self.two_pass:
+            self._segment_queue.put((raw_text, audio, label))
+            return
+        self._emit(self._complete_text(raw_text), label)
+    
+    def _complete_text(self, raw_text: str) -> str:
+        """为流式识别文本补全标点"""
+        if not self.streaming_punc:
+            return self._punctuate(raw_text)
+        # 已经带有实时标点，只需补上句末标点
+        text = raw_text.strip().rstrip("，,、")
+        if text and text[-1] not in SENTENCE_ENDINGS:
+            text += "。"
+        return text
+    
+    def _emit(self, final_text: str, label: str):
+        print(f"最终文本: {final_text}")
+        if self.result_callback:
+            self.result_callback(final_text, label)
+        # 断句后实时行只保留尚未断句的部分（两遍识别时可能已是下一句的文本）
+        self._notify_partial(time.time())
+    
+    def _second_pass_worker(self):
+        """后台线程：用离线模型重新解码已断句的音频"""
+        self.thread_budget.enter_stage('postprocess')
+        while True:
+            raw_text, chunks, label = self._segment_queue.get()
+            if not chunks:
+                self._emit(self._complete_text(raw_text), label)
+                continue
+            try:
+                text = self._second_pass(raw_text, chunks)
+            except Exception as e:
+                print(f"第二遍识别出错，使用流式识别结果: {e}")
+                text = raw_text
+            self._emit(self._punctuate(text), label)
+    
+    def _second_pass(self, raw_text: str, chunks: List[np.ndarray]) -> str:
+        """在预计耗时不超过预算时重新解码，返回用于输出的文本"""
+        audio = np.concatenate(chunks)
+        duration = len(audio) / self.sample_rate
+        predicted = self.offline_rtf * duration
+        if predicted > self.two_pass_budget:
+            print(f"第二遍识别预计耗时 {predicted*1000:.0f}ms 超出预算 "
+                  f"{self.two_pass_budget*1000:.0f}ms，使用流式识别结果")
+            # 慢慢衰减估计值，避免一次偶发的慢解码让第二遍永久失效
+            self.offline_rtf *= 0.9
+            return raw_text
+        
+        decode_start = time.time()
+        res = self.offline_model.generate(input=audio)
+        elapsed = time.time() - decode_start
+        self.offline_rtf = self._ema(self.offline_rtf, elapsed / duration)
+        text = res[0]["text"].replace(" ", "") if res and res[0].get("text") else ""
+        print(f"第二遍识别耗时: {elapsed*1000:.2f}ms，音频 {duration:.2f}s，"
+              f"RTF 流式: {self.streaming_rtf:.3f} 离线: {self.offline_rtf:.3f}")
+        if text and text != raw_text:
+            print(f"第二遍识别修正: {raw_text} -> {text}")
+        return text or raw_text
+    
     def handle_silence(self):
         """处理检测到的空白"""
-        current_text = "".join(self.temp_result)
+        with self._lock:
+            current_text = "".join(self.temp_result)
         # 去除空白字符，统计实际文字数量
         word_count = len("".join(current_text.split()))
         
-        if word_count >= 10:  # 检查实际单词数量
-            try:
-                # 标点处理
-                punc_start = time.time()
-                punc_res = self.punc_model.generate(input=current_text)
-                print(f"标点处理耗时: {(time.time() - punc_start)*1000:.2f}ms")
-                
-                final_text = punc_res[0]["text"]
-                print(f"最终文本: {final_text}")
-                self.result_callback(final_text)
-            except Exception as e:
-                print(f"标点处理出错: {e}")
-                self.result_callback(current_text)
-            self.temp_result = []
-            self.cache = {}  # 重置 ASR 缓存
+        if word_count >= self.min_segment_chars:  # 检查实际单词数量
+            raw_text, audio = self._take_segment()
+            self._finalize_segment(raw_text, audio, 'silence')
     
     def start(self):
         """开始识别"""
         self.running = True
-        self.cache = {}
-        self.temp_result = []
+        with self._lock:
+            self.cache = {}
+            self.temp_result = []
+            self.segment_audio = []
+            self.segment_mid_chunk = False
+            self.cache_samples = 0
+            self.punc_cache = {}
     
     def stop(self):
         """停止识别"""
         self.running = False
+        if self.endpoint:
+            print(self.endpoint.format_report())
     
     def force_generate(self):
         """强制生成当前累积的文本结果"""
         if not self.temp_result:
             return
         
-        raw_text = "".join(self.temp_result)
-        try:
-            # 标点处理
-            punc_start = time.time()
-            punc_res = self.punc_model.generate(input=raw_text)
-            print(f"标点处理耗时: {(time.time() - punc_start)*1000:.2f}ms")
-            
-            final_text = punc_res[0]["text"]
-            print(f"最终文本: {final_text}")
-            if self.result_callback:
-                self.result_callback(final_text)
-        except Exception as e:
-            print(f"标点处理出错: {e}")
-            if self.result_callback:
-                self.result_callback(raw_text)
-        self.temp_result = []
-        self.cache = {}  # 重置 ASR 缓存 
\ No newline at end of file
+        raw_text, audio = self._take_segment()
+        if raw_text:
+            self._finalize_segment(raw_text, audio, 'force')
@@ -0,0 +1,104 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Iterable, Optional
+
+
+class AsyncRuntime:
+    """进程内共享的后台事件循环
+
+    所有AI服务的异步请求都运行在同一个长期存在的事件循环线程上，
+    同步代码通过 run() 提交协程并等待结果，通过 cancel() 取消进行中的任务。
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(AsyncRuntime, cls).__new__(cls)
+                cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._initialized = True
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self.loop is None or self.loop.is_closed():
+                self.loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run_loop, args=(self.loop,),
+                                                name="async-runtime", daemon=True)
+                self._thread.start()
+            return self.loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def in_loop_thread(self) -> bool:
+        """当前线程是否就是事件循环线程"""
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """把协程提交到事件循环，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """在事件循环上运行协程并阻塞等待结果（不能在事件循环线程内调用）"""
+        if self.in_loop_thread():
+            raise RuntimeError("AsyncRuntime.run() cannot be called from the event loop thread")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def cancel(self, tasks: Iterable[asyncio.Task]):
+        """线程安全地取消一组任务
+
+        tasks 通常是事件循环中会增删的集合，快照和取消都放在事件循环线程中进行。
+        """
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+
+        def _cancel():
+            for task in list(tasks):
+                task.cancel()
+
+        try:
+            loop.call_soon_threadsafe(_cancel)
+        except RuntimeError:  # 事件循环在检查之后被关闭
+            pass
+
+    def shutdown(self, timeout: float = 2.0):
+        """取消所有任务并停止事件循环"""
+        with self._lock:
+            loop, thread = self.loop, self._thread
+            self.loop, self._thread = None, None
+        if loop is None or loop.is_closed():
+            return
+
+        async def _cancel_all():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_cancel_all(), loop).result(timeout)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        if not loop.is_running():
+            loop.close()
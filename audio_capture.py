@@ -2,6 +2,8 @@ import pyaudio
 import numpy as np
 from typing import Optional, Callable, Protocol
 import time
+from resampler import PolyphaseResampler
+from noise_suppressor import NoiseSuppressor
 
 class AudioSourceProtocol(Protocol):
     """音频源接口协议"""
@@ -18,13 +20,19 @@ class AudioSourceProtocol(Protocol):
         pass
 
 class SystemAudioCapture(AudioSourceProtocol):
-    def __init__(self, rate: int = 16000, chunk_size: int = 9600):
+    def __init__(self, rate: int = 16000, chunk_size: int = 9600, native_format: bool = True,
+                 denoiser: Optional[NoiseSuppressor] = None):
         self.rate = rate
         self.chunk = chunk_size
+        # 是否以设备原生采样率和声道数打开，再在本地下混并重采样到 rate
+        self.native_format = native_format
+        # 可选的降噪，在音量检测之前处理，纯噪声的块不再送入ASR
+        self.denoiser = denoiser
         self.running = False
         self.callback: Optional[Callable[[np.ndarray], None]] = None
         self.last_voice_time = time.time()
         self.silence_callback = None
+        self.quiet_callback: Optional[Callable[[float], None]] = None
         
     def set_callback(self, callback: Callable[[np.ndarray], None]):
         """设置音频数据回调函数"""
@@ -34,6 +42,10 @@ class SystemAudioCapture(AudioSourceProtocol):
         """设置空白检测回调"""
         self.silence_callback = callback
     
+    def set_quiet_callback(self, callback: Callable[[float], None]):
+        """设置静音块回调，参数为该块的时长（秒），供断句检测统计尾部静音"""
+        self.quiet_callback = callback
+    
     def _find_stereo_mix_device(self, p: pyaudio.PyAudio) -> int:
         """查找立体声混音设备"""
         target = '立体声混音'
@@ -43,6 +55,36 @@ class SystemAudioCapture(AudioSourceProtocol):
                 return i
         return -1
     
+    def _open_stream(self, p: pyaudio.PyAudio, device_index: int):
+        """打开音频流，返回 (stream, 设备采样率, 声道数, 每次读取的帧数)"""
+        if self.native_format:
+            dev_info = p.get_device_info_by_index(device_index)
+            device_rate = int(dev_info.get('defaultSampleRate') or self.rate)
+            channels = max(1, min(2, int(dev_info.get('maxInputChannels') or 1)))
+            frames = int(round(self.chunk * device_rate / self.rate))
+            try:
+                stream = p.open(
+                    format=pyaudio.paFloat32,
+                    channels=channels,
+                    rate=device_rate,
+                    input=True,
+                    input_device_index=device_index,
+                    frames_per_buffer=frames
+                )
+                return stream, device_rate, channels, frames
+            except Exception as e:
+                print(f"以原生格式打开设备失败({device_rate}Hz, {channels}声道): {e}，改用 {self.rate}Hz 单声道")
+        
+        stream = p.open(
+            format=pyaudio.paFloat32,
+            channels=1,
+            rate=self.rate,
+            input=True,
+            input_device_index=device_index,
+            frames_per_buffer=self.chunk
+        )
+        return stream, self.rate, 1, self.chunk
+    
     def start(self):
         """开始采集系统音频"""
         if self.running or not self.callback:
@@ -55,25 +97,38 @@ class SystemAudioCapture(AudioSourceProtocol):
         if device_index < 0:
             raise RuntimeError("未找到立体声混音设备！")
         
+        stream = None
         try:
-            print(f"开始音频采集，采样率: {self.rate}, 块大小: {self.chunk}")
-            stream = p.open(
-                format=pyaudio.paFloat32,
-                channels=1,
-                rate=self.rate,
-                input=True,
-                input_device_index=device_index,
-                frames_per_buffer=self.chunk
-            )
+            stream, device_rate, channels, read_frames = self._open_stream(p, device_index)
+            print(f"开始音频采集，设备采样率: {device_rate}, 声道数: {channels}, "
+                  f"输出采样率: {self.rate}, 块大小: {self.chunk}")
+            resampler = PolyphaseResampler(device_rate, self.rate, channels,
+                                           max_input_frames=read_frames)
+            # 重采样输出按固定块大小送给ASR，不足一块的部分留到下次
+            pending = np.empty(self.chunk * 2 + read_frames, dtype=np.float32)
+            pending_len = 0
             
             frame_count = 0
             last_log_time = time.time()
             
             while self.running:
                 try:
-                    audio_data = stream.read(self.chunk, exception_on_overflow=False)
+                    audio_data = stream.read(read_frames, exception_on_overflow=False)
                     audio_array = np.frombuffer(audio_data, dtype=np.float32)
                     
+                    if not resampler.passthrough:
+                        resampled = resampler.process(audio_array)
+                        pending[pending_len:pending_len + len(resampled)] = resampled
+                        pending_len += len(resampled)
+                        if pending_len < self.chunk:
+                            continue
+                        audio_array = pending[:self.chunk].copy()
+                        pending_len -= self.chunk
+                        pending[:pending_len] = pending[self.chunk:self.chunk + pending_len]
+                    
+                    if self.denoiser is not None:
+                        audio_array = self.denoiser.process(audio_array)
+                    
                     # 计算音量，只记录有声音的帧
                     volume = np.abs(audio_array).mean()
                     frame_count += 1
@@ -82,7 +137,9 @@ class SystemAudioCapture(AudioSourceProtocol):
                     
                     # 每5秒打印一次状态
                     if current_time - last_log_time >= 5:
-                        print(f"音频采集状态 - 已处理帧数: {frame_count}, 当前音量: {volume:.6f}")
+                        denoise_cost = (f", 降噪耗时: {self.denoiser.cost_ms_per_second:.2f}ms/秒音频"
+                                        if self.denoiser is not None else "")
+                        print(f"音频采集状态 - 已处理帧数: {frame_count}, 当前音量: {volume:.6f}{denoise_cost}")
                         last_log_time = current_time
                     
                     # 如果音量太小，可能是静音
@@ -90,7 +147,11 @@ class SystemAudioCapture(AudioSourceProtocol):
                         print(f"检测到声音，音量: {volume:.6f}")
                         self.last_voice_time = current_time
                         self.callback(audio_array)
-                    elif current_time - self.last_voice_time > 3.0:  # 超过3秒没有声音
+                        continue
+                    
+                    if self.quiet_callback:
+                        self.quiet_callback(len(audio_array) / self.rate)
+                    if current_time - self.last_voice_time > 3.0:  # 超过3秒没有声音
                         if self.silence_callback:
                             print("检测到3秒静音，触发回调")
                             self.silence_callback()
@@ -104,8 +165,9 @@ class SystemAudioCapture(AudioSourceProtocol):
             print(f"音频流创建或处理时出错: {e}")
         finally:
             print("停止音频采集")
-            stream.stop_stream()
-            stream.close()
+            if stream is not None:
+                stream.stop_stream()
+                stream.close()
             p.terminate()
     
     def stop(self):
@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional, Callable, List, Dict, Any
+import numpy as np
+from audio_capture import AudioSourceProtocol
+
+
+class AudioRecorder:
+    """基于内存映射环形文件的滚动录音器
+
+    送入ASR的 float32 音频被写入一个预先分配好的内存映射文件，覆盖最近 N 分钟。
+    采集线程上只做一次内存拷贝；元数据（写入位置、分段标记）和脏页回写由后台线程定期完成。
+    启动时如果已有同样容量和采样率的录音文件，则从元数据恢复写入位置和标记后续写，不会清空。
+    采集端判为静音、没有送入ASR的块只记录时长（同一位置的连续静音合并为一条），
+    回放时按原来的时长送给静音回调，自适应断句与实时采集时一致。
+    """
+    def __init__(self, path: str = "recordings/ring.f32", minutes: float = 10.0,
+                 rate: int = 16000, flush_interval: float = 2.0):
+        self.path = path
+        self.meta_path = path + ".json"
+        self.rate = rate
+        self.capacity = int(minutes * 60 * rate)
+        if self.capacity <= 0:
+            raise ValueError("录音时长必须为正数")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._written = 0  # 累计写入的样本数
+        self._start_time = time.time()
+        self._markers = deque(maxlen=10000)
+        self._quiet = deque(maxlen=10000)  # [写入位置, 静音秒数]
+        self._lock = threading.Lock()
+
+        meta = self._load_meta()
+        if meta is not None:
+            # 续写上次的录音，之前保存的最近 N 分钟仍然可以回放
+            self._ring = np.memmap(path, dtype=np.float32, mode='r+', shape=(self.capacity,))
+            self._written = meta['written']
+            self._start_time = meta.get('start_time', self._start_time)
+            self._markers.extend(meta.get('markers', []))
+            self._quiet.extend([sample, duration] for sample, duration in meta.get('quiet', []))
+        else:
+            self._ring = np.memmap(path, dtype=np.float32, mode='w+', shape=(self.capacity,))
+
+        self._flush_interval = flush_interval
+        self._stop_event = threading.Event()
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+
+    def _load_meta(self) -> Optional[Dict[str, Any]]:
+        """读取已有录音的元数据，文件大小、采样率或容量不一致时返回 None（重新创建）"""
+        try:
+            if os.path.getsize(self.path) != self.capacity * 4:
+                return None
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('rate') != self.rate or meta.get('capacity') != self.capacity:
+            return None
+        return meta
+
+    @property
+    def written(self) -> int:
+        return self._written
+
+    def write(self, chunk: np.ndarray):
+        """写入一块音频（在采集线程中调用）"""
+        n = len(chunk)
+        if n == 0:
+            return
+        if n > self.capacity:
+            chunk = chunk[-self.capacity:]
+            self._written += n - self.capacity
+            n = self.capacity
+        pos = self._written % self.capacity
+        first = min(n, self.capacity - pos)
+        self._ring[pos:pos + first] = chunk[:first]
+        if first < n:
+            self._ring[:n - first] = chunk[first:]
+        self._written += n
+
+    def mark(self, label: str, text: Optional[str] = None):
+        """在当前写入位置记录一个带时间戳的分段标记"""
+        with self._lock:
+            self._markers.append({
+                'time': time.time(),
+                'sample': self._written,
+                'label': label,
+                'text': text,
+            })
+
+    def mark_quiet(self, duration: float):
+        """记录一段未写入的静音（在采集线程中调用）"""
+        with self._lock:
+            if self._quiet and self._quiet[-1][0] == self._written:
+                self._quiet[-1][1] += duration
+            else:
+                self._quiet.append([self._written, duration])
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self._flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"录音文件刷新出错: {e}")
+
+    def flush(self):
+        """把环形缓冲区和元数据写回磁盘"""
+        self._ring.flush()
+        written = self._written
+        oldest = max(0, written - self.capacity)
+        with self._lock:
+            markers = [m for m in self._markers if m['sample'] >= oldest]
+            quiet = [[sample, round(duration, 3)] for sample, duration in self._quiet if sample >= oldest]
+        meta = {
+            'rate': self.rate,
+            'capacity': self.capacity,
+            'written': written,
+            'start_time': self._start_time,
+            'update_time': time.time(),
+            'markers': markers,
+            'quiet': quiet,
+        }
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.meta_path)
+
+    def close(self):
+        """停止后台刷新并做最后一次落盘"""
+        self._stop_event.set()
+        self._flush_thread.join(timeout=2.0)
+        self.flush()
+
+
+class FileAudioSource(AudioSourceProtocol):
+    """从录音环形文件回放指定窗口的音频源
+
+    与 SystemAudioCapture 接口一致：通过 set_callback 接收音频块，录制时的静音按原来的
+    位置和时长（按块大小切分）送给 quiet_callback，窗口内的分段标记按断句原因重放：
+    silence 触发 silence_callback，force 触发 force_callback；endpoint 只在 replay_endpoints
+    为 True（回放时未启用自适应断句）时触发 silence_callback，否则由检测器根据静音自己断句；
+    sentence（流式标点断句）和 overflow（超出上限）会在回放时自然重现，不做处理。
+    """
+    def __init__(self, path: str, start_sample: Optional[int] = None,
+                 end_sample: Optional[int] = None, chunk_size: int = 9600,
+                 realtime: bool = False, replay_endpoints: bool = True):
+        with open(path + ".json", 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.rate = self.meta['rate']
+        self.capacity = self.meta['capacity']
+        written = self.meta['written']
+        self.oldest = max(0, written - self.capacity)
+        self.newest = written
+
+        self.start_sample = self.oldest if start_sample is None else start_sample
+        self.end_sample = self.newest if end_sample is None else end_sample
+        if not (self.oldest <= self.start_sample <= self.end_sample <= self.newest):
+            raise ValueError(f"回放窗口 [{self.start_sample}, {self.end_sample}) 超出已保存的范围 "
+                             f"[{self.oldest}, {self.newest})")
+
+        self._ring = np.memmap(path, dtype=np.float32, mode='r', shape=(self.capacity,))
+        self.chunk = chunk_size
+        self.realtime = realtime
+        self.replay_endpoints = replay_endpoints
+        self.running = False
+        self.callback: Optional[Callable[[np.ndarray], None]] = None
+        self.silence_callback = None
+        self.quiet_callback: Optional[Callable[[float], None]] = None
+        self.force_callback: Optional[Callable[[], None]] = None
+
+    @classmethod
+    def list_segments(cls, path: str) -> List[Dict[str, Any]]:
+        """列出文件中仍然可以回放的分段（相邻标记之间的音频）"""
+        with open(path + ".json", 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        oldest = max(0, meta['written'] - meta['capacity'])
+        segments = []
+        prev = oldest
+        for marker in meta['markers']:
+            if marker['sample'] > prev:
+                segments.append({
+                    'start_sample': prev,
+                    'end_sample': marker['sample'],
+                    'duration': (marker['sample'] - prev) / meta['rate'],
+                    'time': marker['time'],
+                    'label': marker['label'],
+                    'text': marker['text'],
+                })
+            prev = max(prev, marker['sample'])
+        return segments
+
+    def set_callback(self, callback: Callable[[np.ndarray], None]):
+        """设置音频数据回调函数"""
+        self.callback = callback
+
+    def set_silence_callback(self, callback):
+        """设置空白检测回调"""
+        self.silence_callback = callback
+
+    def set_quiet_callback(self, callback: Callable[[float], None]):
+        """设置静音回调，参数为静音时长（秒）"""
+        self.quiet_callback = callback
+
+    def set_force_callback(self, callback: Callable[[], None]):
+        """设置强制断句回调，在手动断句（force）的标记处调用"""
+        self.force_callback = callback
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """读取绝对样本区间 [start, end) 的音频"""
+        pos = start % self.capacity
+        n = end - start
+        first = min(n, self.capacity - pos)
+        if first == n:
+            return np.array(self._ring[pos:pos + n])
+        return np.concatenate([self._ring[pos:], self._ring[:n - first]])
+
+    def start(self):
+        """开始回放"""
+        if self.running or not self.callback:
+            return
+        self.running = True
+        in_window = lambda sample: self.start_sample < sample <= self.end_sample
+        markers: Dict[int, List[str]] = {}
+        for m in self.meta['markers']:
+            if in_window(m['sample']):
+                markers.setdefault(m['sample'], []).append(m['label'])
+        quiet = {}
+        for sample, duration in self.meta.get('quiet', []):
+            if in_window(sample):
+                quiet[sample] = quiet.get(sample, 0.0) + duration
+        boundaries = sorted(set(markers) | set(quiet))
+        chunk_seconds = self.chunk / self.rate
+        pos = self.start_sample
+        try:
+            while self.running and pos < self.end_sample:
+                # 回放块不跨越分段标记和静音位置，保证断句位置与录制时一致
+                next_boundary = next((b for b in boundaries if b > pos), self.end_sample)
+                end = min(pos + self.chunk, next_boundary)
+                self.callback(self.read(pos, end))
+                pos = end
+                if self.realtime:
+                    time.sleep(chunk_seconds)
+                if pos != next_boundary:
+                    continue
+                if pos in quiet and self.quiet_callback:
+                    self._replay_quiet(quiet[pos], chunk_seconds)
+                for label in markers.get(pos, ()):
+                    self._replay_marker(label)
+        finally:
+            self.running = False
+
+    def _replay_marker(self, label: str):
+        if label == 'force':
+            if self.force_callback:
+                self.force_callback()
+        elif label == 'silence' or label == 'endpoint' and self.replay_endpoints:
+            if self.silence_callback:
+                self.silence_callback()
+
+    def _replay_quiet(self, duration: float, chunk_seconds: float):
+        """按采集块的时长分段送出一段静音，与实时采集时的回调粒度一致"""
+        while self.running and duration > 1e-6:
+            piece = min(chunk_seconds, duration)
+            self.quiet_callback(piece)
+            duration -= piece
+            if self.realtime:
+                time.sleep(piece)
+
+    def stop(self):
+        """停止回放"""
+        self.running = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录音环形文件中的音频")
+    parser.add_argument("path", help="录音文件路径，例如 recordings/ring.f32")
+    parser.add_argument("--list", action="store_true", help="列出可回放的分段")
+    parser.add_argument("--segment", type=int, help="回放指定序号的分段")
+    parser.add_argument("--start", type=int, help="回放起始样本（绝对位置）")
+    parser.add_argument("--end", type=int, help="回放结束样本（绝对位置）")
+    args = parser.parse_args()
+
+    segments = FileAudioSource.list_segments(args.path)
+    if args.list:
+        for idx, seg in enumerate(segments):
+            print(f"[{idx}] {seg['start_sample']}-{seg['end_sample']} "
+                  f"{seg['duration']:.1f}s {seg['label']}: {seg['text']}")
+        return
+
+    start, end = args.start, args.end
+    if args.segment is not None:
+        start = segments[args.segment]['start_sample']
+        end = segments[args.segment]['end_sample']
+
+    from asr_manager import ASRManager
+    asr_manager = ASRManager()
+    asr_manager.set_result_callback(lambda text, label: print(f"识别结果({label}): {text}"))
+    source = FileAudioSource(args.path, start, end, replay_endpoints=asr_manager.endpoint is None)
+    source.set_callback(asr_manager.process_audio)
+    source.set_silence_callback(asr_manager.handle_silence)
+    source.set_quiet_callback(asr_manager.process_silence)
+    source.set_force_callback(asr_manager.force_generate)
+    asr_manager.start()
+    source.start()
+    asr_manager.force_generate()
+    asr_manager.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
+import asyncio
+import concurrent.futures
 import json
 import logging
 import time
-import requests
+import httpx
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, AsyncIterator
 from config_manager import ConfigManager
+from async_runtime import AsyncRuntime
+from answer_budget import SentenceBudget
+from rate_limiter import parse_retry_after, update_limiter
 
 class BaiduAIManager:
+    KEEPALIVE_EXPIRY = 120.0  # 空闲连接保留时间，预热建立的连接才能留给第一个问题
+    WARM_TTL = 30.0  # 预热有效期，到期前重新预热以保持连接
+
     def __init__(self, app_key: Optional[str] = None, app_id: Optional[str] = None):
         # 配置日志
         try:
@@ -24,7 +32,6 @@ class BaiduAIManager:
         self.app_key = app_key or config['app_key']
         self.app_id = app_id or config['app_id']
         self.base_url = config['base_url']
-        self.system_prompt = config['system_prompt']
         
         # 会话相关
         self.conversation_id = None
@@ -32,12 +39,71 @@ class BaiduAIManager:
         self.request_id = None
         self.run_id = None
         self._should_stop = False
+        self._tasks = set()  # 进行中的请求任务，stop() 时取消
+        self._http = None  # 异步HTTP客户端
+        self.last_usage = None  # 该服务不返回token用量
+        self.answer_first = None  # 答案优先截断配置
+        self.last_truncation = None  # 最近一次回复的截断位置（对话历史保存在服务端）
         self._max_attempts = 5
         self._initial_retry_delay = 1.0
         self._max_retry_delay = 16.0
         self._timeout = 60.0
+        self.limiter = None  # 并发数和请求速率限制，由配置 limits 启用
+        self.last_wait = 0.0  # 最近一次请求在准入控制中排队的秒数
+        
+        # 应用可热更新的配置，并在配置文件变化时重新应用
+        self.apply_config(config)
+        ConfigManager().add_reload_listener(self._on_config_reload)
+
+    def apply_config(self, config) -> None:
+        """应用可热更新的配置项（提示词、超时、答案优先截断）"""
+        self.system_prompt = config['system_prompt']
+        self._timeout = max(1.0, float(config.get('timeout', 60.0)))
+        self.answer_first = config.get('answer_first')
+        self.limiter = update_limiter(self.limiter, "Baidu", config.get('limits'))
+
+    def _on_config_reload(self, config_manager: ConfigManager) -> None:
+        self.apply_config(config_manager.get_service_config('baidu'))
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.app_key}'
+        }
+
+    def _get_http(self) -> httpx.AsyncClient:
+        """获取异步HTTP客户端（在事件循环线程中懒创建，复用连接）"""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=httpx.Limits(keepalive_expiry=self.KEEPALIVE_EXPIRY)
+            )
+        return self._http
+
+    def _track_current_task(self):
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _admit(self, input: str):
+        """通过准入控制，返回 (限流器, 排队秒数)；超时抛出 asyncio.TimeoutError"""
+        limiter = self.limiter
+        if limiter is None:
+            return None, 0.0
+        return limiter, await limiter.acquire(int(len(input) * 1.5), timeout=self._timeout)
 
-    def _create_conversation(self) -> bool:
+    @staticmethod
+    def _release(limiter) -> None:
+        if limiter is not None:
+            limiter.release()
+
+    def _on_rate_limited(self, response: httpx.Response) -> None:
+        """收到 429 时按 Retry-After 暂停后续请求的准入"""
+        if self.limiter is not None:
+            self.limiter.on_rate_limited(parse_retry_after(response.headers.get('retry-after')))
+
+    async def _create_conversation(self) -> bool:
         """创建新的对话"""
         try:
             url = f"{self.base_url}/conversation"
@@ -46,12 +112,9 @@ class BaiduAIManager:
                 "app_id": self.app_id
             }, ensure_ascii=False)
             
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.app_key}'
-            }
-            
-            response = requests.post(url, headers=headers, data=payload.encode("utf-8"))
+            response = await self._get_http().post(url, headers=self._headers(),
+                                                   content=payload.encode("utf-8"),
+                                                   timeout=self._timeout)
             response_data = response.json()
             
             if response.status_code == 200 and 'conversation_id' in response_data:
@@ -62,42 +125,49 @@ class BaiduAIManager:
                 self.logger.error(f"Failed to create conversation: {response_data}")
                 return False
                 
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             self.logger.error(f"Error creating conversation: {e}")
             return False
 
-    def _create_run(self, input: str) -> Optional[str]:
+    def _run_payload(self, input: str, stream: bool, context: Optional[str] = None) -> bytes:
+        # 检索到的背景资料只随本轮发送
+        if context:
+            input = f"候选人背景资料（与当前问题相关的片段）：\n{context}\n\n问题：{input}"
+        # 如果是第一次对话（message_id为None），添加角色设定
+        if not self.message_id:
+            input = (self.system_prompt + "\n\n" + input)
+        
+        return json.dumps({
+            "app_id": self.app_id,
+            "conversation_id": self.conversation_id,
+            "stream": stream,
+            "query": input
+        }, ensure_ascii=False).encode("utf-8")
+
+    def _update_run_state(self, response_data: Dict) -> None:
+        # 更新 conversation_id（如果返回了新的）
+        if response_data.get('conversation_id'):
+            self.conversation_id = response_data['conversation_id']
+        
+        # 更新其他重要字段
+        if response_data.get('message_id'):
+            self.message_id = response_data['message_id']
+        if response_data.get('request_id'):
+            self.request_id = response_data['request_id']
+
+    async def _create_run(self, input: str, context: Optional[str] = None) -> Optional[str]:
         """创建新的对话轮次"""
         try:
             url = f"{self.base_url}/conversation/runs"
-            
-            # 如果是第一次对话（message_id为None），添加角色设定
-            if not self.message_id:
-                input = (self.system_prompt + "\n\n" + input)
-            
-            payload = json.dumps({
-                "app_id": self.app_id,
-                "conversation_id": self.conversation_id,
-                "stream": False,
-                "query": input
-            }, ensure_ascii=False)
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.app_key}'
-            }
-            
-            response = requests.post(url, headers=headers, data=payload.encode("utf-8"))
+            response = await self._get_http().post(url, headers=self._headers(),
+                                                   content=self._run_payload(input, False, context),
+                                                   timeout=self._timeout)
             response_data = response.json()
             
             if response.status_code == 200:
-                # 更新 conversation_id（如果返回了新的）
-                if 'conversation_id' in response_data:
-                    self.conversation_id = response_data['conversation_id']
-                
-                # 更新其他重要字段并打印
-                self.message_id = response_data.get('message_id')
-                self.request_id = response_data.get('request_id')
+                self._update_run_state(response_data)
                 
                 # 打印 message_id
                 self.logger.info(f"Message ID: {self.message_id}")
@@ -108,23 +178,52 @@ class BaiduAIManager:
                 return response_data.get('answer')
             else:
                 self.logger.error(f"Failed to get answer: {response_data}")
+                if response.status_code == 429:
+                    self._on_rate_limited(response)
                 return None
                 
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             self.logger.error(f"Error in conversation run: {e}")
             return None
 
-    def chat(self, input: str) -> str:
-        """主要的对话接口"""
+    async def _ensure_conversation(self) -> bool:
+        if self.conversation_id:
+            return True
+        # 第一次对话，先创建会话
+        return await self._create_conversation()
+
+    async def warm(self) -> bool:
+        """预热：提前创建会话，并建立（或保持）到服务端的连接"""
+        if self.conversation_id:
+            # 会话已存在，发一个轻量请求保持连接不被回收，返回状态码无关紧要
+            await self._get_http().head(self.base_url, timeout=self._timeout)
+            return True
+        if not await self._create_conversation():
+            raise RuntimeError("创建对话失败")
+        return True
+
+    async def achat(self, input: str, context: Optional[str] = None) -> str:
+        """异步对话接口"""
+        self._track_current_task()
+        self._should_stop = False
+        self.last_truncation = None
+        budget = SentenceBudget.from_config(self.answer_first)
         try:
-            if not self.conversation_id:
-                # 第一次对话，先创建会话
-                if not self._create_conversation():
+            if budget is not None:
+                # 答案优先：流式接收，达到预算后关闭连接
+                return "".join([piece async for piece in self.astream(input, budget=budget, context=context)])
+
+            limiter, self.last_wait = await self._admit(input)
+            try:
+                if not await self._ensure_conversation():
                     return "创建对话失败"
-                # 创建成功后立即发送第一条消息
-            
-            # 发送消息并获取响应
-            response = self._create_run(input)
+                
+                # 发送消息并获取响应
+                response = await self._create_run(input, context)
+            finally:
+                self._release(limiter)
             if response is None:
                 return "获取回复失败"
             
@@ -134,16 +233,88 @@ class BaiduAIManager:
             
             return response
 
+        except asyncio.CancelledError:
+            self.logger.info("Request cancelled due to exit request")
+            raise
+        except RuntimeError as e:
+            return str(e)
         except Exception as e:
             self.logger.error(f"对话出错: {e}")
             return f"对话出错: {str(e)}"
 
+    async def astream(self, input: str, budget: Optional[SentenceBudget] = None,
+                      context: Optional[str] = None) -> AsyncIterator[str]:
+        """异步流式对话接口，逐段产出回复文本（服务端以 SSE 返回）
+
+        传入 budget 时，达到句子数或字符预算后立即关闭连接。
+        """
+        self._track_current_task()
+        self._should_stop = False
+        self.last_truncation = None
+        limiter, self.last_wait = await self._admit(input)
+        try:
+            if not await self._ensure_conversation():
+                raise RuntimeError("创建对话失败")
+
+            url = f"{self.base_url}/conversation/runs"
+            parts = []
+            async with self._get_http().stream("POST", url, headers=self._headers(),
+                                               content=self._run_payload(input, True, context),
+                                               timeout=self._timeout) as response:
+                if response.status_code != 200:
+                    if response.status_code == 429:
+                        self._on_rate_limited(response)
+                    body = await response.aread()
+                    raise RuntimeError(f"获取回复失败: {body.decode('utf-8', 'replace')}")
+                async for line in response.aiter_lines():
+                    if self._should_stop:
+                        return
+                    if not line.startswith("data:"):
+                        continue
+                    try:
+                        data = json.loads(line[5:].strip())
+                    except json.JSONDecodeError:
+                        continue
+                    self._update_run_state(data)
+                    piece = data.get('answer')
+                    if piece and budget is not None:
+                        piece, _ = budget.feed(piece)
+                    if piece:
+                        parts.append(piece)
+                        yield piece
+                    if budget is not None and budget.done:
+                        # 退出 async with 时关闭响应，不再等待剩余的生成
+                        self.last_truncation = budget.truncation
+                        self.logger.info(f"✂️ 答案优先截断: {budget.truncation}")
+                        break
+        finally:
+            self._release(limiter)
+
+        self.logger.info(f"\n📥 Baidu AI Response:")
+        self.logger.info(f"     {''.join(parts)}")
+        self.logger.info("="*80 + "\n")
+
+    def chat(self, input: str, context: Optional[str] = None) -> str:
+        """主要的对话接口，在共享事件循环上运行 achat"""
+        try:
+            return AsyncRuntime().run(self.achat(input, context))
+        except (asyncio.CancelledError, concurrent.futures.CancelledError):
+            return "操作已取消"
+
     def stop(self):
-        """停止所有操作"""
+        """停止所有操作，并取消进行中的请求"""
         self._should_stop = True
+        AsyncRuntime().cancel(self._tasks)
         
     def reset(self):
         """重置停止标志和会话状态"""
         self._should_stop = False
         self.conversation_id = None
-        self.run_id = None 
\ No newline at end of file
+        self.message_id = None  # 新对话的第一轮重新带上角色设定
+        self.request_id = None
+        self.run_id = None
+
+    def reset_conversation(self):
+        """开始新的对话（对话历史保存在服务端，换一个 conversation_id 即可）"""
+        self.reset()
+        self.last_truncation = None
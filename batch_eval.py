@@ -0,0 +1,290 @@
+"""批量评测：把问题集或会话日志回放给各个AI服务，对比延迟、首字时间、token用量和回答
+
+输入为 JSONL，每行可以是：
+  - 问题：{"question": "...", "session": "可选的会话ID"}，同一会话的问题按顺序在同一段对话历史中提问，
+    没有 session 的问题各自独立提问；
+  - 会话日志（journal/sessions.jsonl）中的记录：按 session_id 分组，取 response 记录中的问题
+    （同一问题被多个服务回答只取一次），没有 response 记录的会话取 transcript 记录。
+
+用法：
+    python batch_eval.py questions.jsonl -o eval/results.jsonl
+    python batch_eval.py journal/sessions.jsonl --providers Kimi,BaiduAI --concurrency 8
+    python batch_eval.py questions.jsonl -o eval/results.jsonl --summary-only
+
+结果按问题逐条追加写入输出文件；中断后用同样的命令重新运行，已完成的会话会被跳过，
+未完成的会话从第一个问题重新回放（以便重建对话历史），同一问题以最后一条记录为准。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai_service_manager import AIServiceManager
+from async_runtime import AsyncRuntime
+from config_manager import ConfigManager
+from notes_index import NotesIndex
+
+
+def load_sessions(path: str) -> "OrderedDict[str, List[str]]":
+    """读取问题集或会话日志，返回 {会话ID: [问题, ...]}"""
+    asked: "OrderedDict[str, List[str]]" = OrderedDict()
+    transcripts: "OrderedDict[str, List[str]]" = OrderedDict()
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"第 {line_no} 行不是有效的 JSON，已跳过: {e}")
+                continue
+            if isinstance(record, str):
+                record = {'question': record}
+            record_type = record.get('type')
+            if record_type == 'response':
+                session, text = record.get('session_id', 'journal'), record.get('question')
+            elif record_type == 'transcript':
+                transcripts.setdefault(record.get('session_id', 'journal'), []).append(record.get('text', ''))
+                continue
+            elif record_type is None:
+                text = record.get('question') or record.get('text')
+                session = str(record['session']) if record.get('session') is not None else f"line{line_no}"
+            else:
+                continue
+            if not text or not text.strip():
+                continue
+            questions = asked.setdefault(session, [])
+            if text not in questions:
+                questions.append(text)
+    for session, texts in transcripts.items():
+        if session not in asked:
+            asked[session] = [t for t in texts if t.strip()]
+    return asked
+
+
+def load_results(path: str) -> Dict[Tuple[str, str, int], Dict[str, Any]]:
+    """读取已有结果，同一 (服务, 会话, 序号) 以最后一条为准"""
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                results[(record['provider'], record['session'], record['index'])] = record
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue  # 中断时可能留下写了一半的行
+    return results
+
+
+def session_done(results, provider: str, session: str, count: int, retry_errors: bool) -> bool:
+    records = [results.get((provider, session, i)) for i in range(count)]
+    if any(r is None for r in records):
+        return False
+    return not (retry_errors and any(r.get('error') for r in records))
+
+
+class BatchEvaluator:
+    """在共享事件循环上并发回放会话
+
+    每个服务最多同时回放 per_provider 个会话，每个会话独占一个服务实例（各自的对话历史），
+    同一服务的实例共用一个准入限流器；所有服务合计的进行中请求数不超过 concurrency。
+    """
+    def __init__(self, services: Dict[str, List[Any]], output_path: str, concurrency: int = 4,
+                 notes_index: Optional[NotesIndex] = None):
+        self.services = services
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.notes_index = notes_index
+        self._contexts: Dict[str, Optional[str]] = {}
+        self._file = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.completed = 0
+        self.total = 0
+
+    def _context_for(self, question: str) -> Optional[str]:
+        # 同一问题对所有服务注入相同的背景资料
+        if self.notes_index is None:
+            return None
+        if question not in self._contexts:
+            self._contexts[question] = self.notes_index.context_for(question)
+        return self._contexts[question]
+
+    async def run(self, pending: List[Tuple[str, str, List[str]]]):
+        """pending: [(服务名, 会话ID, 问题列表)]"""
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.total = sum(len(questions) for _, _, questions in pending)
+        pools = {}
+        for name, instances in self.services.items():
+            pools[name] = asyncio.Queue()
+            for service in instances:
+                pools[name].put_nowait(service)
+        directory = os.path.dirname(self.output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.output_path, 'a', encoding='utf-8') as self._file:
+            await asyncio.gather(*(self._replay(pools[name], name, session, questions)
+                                   for name, session, questions in pending))
+
+    async def _replay(self, pool: asyncio.Queue, name: str, session: str, questions: List[str]):
+        service = await pool.get()
+        try:
+            # 清空全部对话状态（历史、角色设定标记、token计数、摘要），每个会话从头回放
+            service.reset_conversation()
+            for index, question in enumerate(questions):
+                async with self._semaphore:
+                    record = await self._ask(service, question)
+                record.update(provider=name, session=session, index=index, question=question,
+                              time=round(time.time(), 3))
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+                self.completed += 1
+                status = f"出错: {record['error']}" if record['error'] else \
+                    f"{record['latency']:.2f}s，首字 {record['ttft'] or 0:.2f}s"
+                print(f"[{self.completed}/{self.total}] {name} {session}#{index} {status}")
+        finally:
+            pool.put_nowait(service)
+
+    async def _ask(self, service, question: str) -> Dict[str, Any]:
+        context = self._context_for(question)
+        start = time.perf_counter()
+        ttft, parts, error = None, [], None
+        try:
+            async for delta in service.astream(question, context=context):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(delta)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        return {
+            'answer': "".join(parts),
+            'error': error,
+            'latency': round(time.perf_counter() - start, 4),
+            'ttft': round(ttft, 4) if ttft is not None else None,
+            'wait': round(getattr(service, 'last_wait', 0.0) or 0.0, 4),
+            'usage': getattr(service, 'last_usage', None),
+            'model': getattr(service, 'last_model', None),
+            'context_chars': len(context) if context else 0,
+        }
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def format_summary(results: Dict[Tuple[str, str, int], Dict[str, Any]]) -> str:
+    """按服务汇总：问题数、出错数、延迟和首字时间的中位数/P90、token用量"""
+    by_provider: Dict[str, List[Dict[str, Any]]] = OrderedDict()
+    for (provider, _, _), record in sorted(results.items()):
+        by_provider.setdefault(provider, []).append(record)
+    lines = [f"{'服务':<12}{'问题':>6}{'出错':>6}{'延迟中位':>10}{'延迟P90':>10}"
+             f"{'首字中位':>10}{'首字P90':>10}{'总token':>10}"]
+    for provider, records in by_provider.items():
+        ok = [r for r in records if not r.get('error')]
+        latency = [r['latency'] for r in ok]
+        ttft = [r['ttft'] for r in ok if r.get('ttft') is not None]
+        tokens = sum((r.get('usage') or {}).get('total_tokens', 0) for r in ok)
+        lines.append(f"{provider:<12}{len(records):>6}{len(records) - len(ok):>6}"
+                     f"{_seconds(statistics.median(latency) if latency else None):>10}"
+                     f"{_seconds(_percentile(latency, 0.9) if latency else None):>10}"
+                     f"{_seconds(statistics.median(ttft) if ttft else None):>10}"
+                     f"{_seconds(_percentile(ttft, 0.9) if ttft else None):>10}{tokens or '-':>10}")
+    return "\n".join(lines)
+
+
+def create_services(manager: AIServiceManager, names: List[str], per_provider: int) -> Dict[str, List[Any]]:
+    """为每个服务构造 per_provider 个独立实例，构造失败的服务被跳过"""
+    services = {}
+    for name in names:
+        primary = manager.get_service(name)
+        if primary is None:
+            continue
+        if not hasattr(primary, 'reset_conversation'):
+            print(f"AI服务 {name} 没有实现 reset_conversation()，无法回放多轮会话，已跳过")
+            continue
+        instances = [primary]
+        for _ in range(per_provider - 1):
+            extra = manager.create_instance(name)
+            if extra is None:
+                break
+            if hasattr(primary, 'limiter'):
+                extra.limiter = primary.limiter  # 限流按服务计，不按实例
+            instances.append(extra)
+        services[name] = instances
+    return services
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把问题集或会话日志回放给各AI服务并记录延迟和回答")
+    parser.add_argument("input", help="问题集或会话日志 JSONL 文件")
+    parser.add_argument("-o", "--output", default="eval/results.jsonl", help="结果文件（追加写入，可断点续跑）")
+    parser.add_argument("--providers", help="逗号分隔的服务名，默认为配置中启用的服务")
+    parser.add_argument("--concurrency", type=int, default=4, help="所有服务合计的最大并发请求数")
+    parser.add_argument("--per-provider", type=int, default=2, help="每个服务同时回放的最大会话数")
+    parser.add_argument("--limit", type=int, help="只回放前若干个会话")
+    parser.add_argument("--retry-errors", action="store_true", help="重新回放含有出错问题的会话")
+    parser.add_argument("--no-notes", action="store_true", help="不注入笔记检索的背景资料")
+    parser.add_argument("--summary-only", action="store_true", help="只汇总已有结果，不发送请求")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出各服务的详细日志")
+    args = parser.parse_args()
+
+    if args.summary_only:
+        print(format_summary(load_results(args.output)))
+        return
+
+    # 先于各服务配置日志，默认只保留警告以上，避免刷屏
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    sessions = load_sessions(args.input)
+    if args.limit:
+        sessions = OrderedDict(list(sessions.items())[:args.limit])
+    manager = AIServiceManager()
+    names = [n.strip() for n in args.providers.split(",")] if args.providers else \
+        [n for n in manager.get_available_services() if manager.is_enabled(n)]
+    unknown = [n for n in names if n not in manager.get_available_services()]
+    if unknown:
+        parser.error(f"未声明的服务: {', '.join(unknown)}")
+
+    results = load_results(args.output)
+    pending = [(name, session, questions) for name in names for session, questions in sessions.items()
+               if not session_done(results, name, session, len(questions), args.retry_errors)]
+    skipped = len(names) * len(sessions) - len(pending)
+    print(f"{len(sessions)} 个会话，{sum(len(q) for q in sessions.values())} 个问题，"
+          f"服务: {', '.join(names)}；待回放 {len(pending)} 个（已完成 {skipped} 个）")
+    if not pending:
+        print(format_summary(results))
+        return
+
+    services = create_services(manager, sorted({name for name, _, _ in pending}),
+                               max(1, min(args.per_provider, args.concurrency)))
+    pending = [p for p in pending if p[0] in services]
+    notes_index = None if args.no_notes else NotesIndex.from_config(ConfigManager().get_optional_config('notes'))
+    evaluator = BatchEvaluator(services, args.output, max(1, args.concurrency), notes_index)
+
+    start = time.time()
+    try:
+        AsyncRuntime().run(evaluator.run(pending))
+    except KeyboardInterrupt:
+        print(f"\n已中断（完成 {evaluator.completed}/{evaluator.total}），重新运行同样的命令可继续")
+    finally:
+        AsyncRuntime().shutdown()
+    print(f"耗时 {time.time() - start:.1f}s，结果已写入 {args.output}")
+    print(format_summary(load_results(args.output)))
+
+
+if __name__ == "__main__":
+    main()
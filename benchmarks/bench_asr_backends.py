@@ -0,0 +1,171 @@
+"""ASR推理后端对比基准
+
+用法（在项目根目录下）:
+    python -m benchmarks.bench_asr_backends --audio clip.wav --reference clip.txt
+
+对参考音频分别用 PyTorch、ONNX（fp32）和 ONNX（int8量化）后端运行流式识别和标点，
+并像 asr.streaming_punc 一样把每个识别片段送入实时标点模型（出错时该后端直接失败），
+输出模型加载耗时、内存占用、实时率（RTF）、字错误率（CER）和实时标点切出的句子数。每个后端在独立的子进程中运行，
+互不影响内存统计。参考文本中的标点和空白在计算CER时会被忽略。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import unicodedata
+import wave
+from typing import Optional
+
+import numpy as np
+
+VARIANTS = {
+    'torch': {'backend': 'torch'},
+    'onnx': {'backend': 'onnx', 'onnx': {'quantize': False}},
+    'onnx-int8': {'backend': 'onnx', 'onnx': {'quantize': True}},
+}
+RATE = 16000
+CHUNK = 9600  # 与采集线程的块大小一致（600ms）
+CHUNK_SIZE = [0, 10, 5]
+
+
+def load_wav(path: str) -> np.ndarray:
+    """读取 16 位 PCM wav，下混并重采样为 16kHz 单声道 float32"""
+    from resampler import PolyphaseResampler
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2:
+            raise ValueError("仅支持16位PCM wav文件")
+        rate, channels = f.getframerate(), f.getnchannels()
+        data = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    audio = data.astype(np.float32) / 32768.0
+    resampler = PolyphaseResampler(rate, RATE, channels, max_input_frames=len(audio) // channels)
+    if resampler.passthrough:
+        return audio
+    return resampler.process(audio).copy()
+
+
+def normalize(text: str) -> str:
+    """去掉标点和空白，只保留用于计算CER的字符"""
+    return "".join(ch for ch in text if not ch.isspace()
+                   and not unicodedata.category(ch).startswith('P'))
+
+
+def cer(hypothesis: str, reference: str) -> float:
+    """字错误率：编辑距离 / 参考文本长度"""
+    hyp, ref = normalize(hypothesis), normalize(reference)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def rss_mb() -> Optional[float]:
+    """当前进程的常驻内存（MB），无法获取时返回 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def run_variant(name: str, audio_path: str) -> dict:
+    """在当前进程中测量一个后端"""
+    from asr_backend import load_model
+    config = VARIANTS[name]
+    audio = load_wav(audio_path)
+    duration = len(audio) / RATE
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    model = load_model('streaming', config, chunk_size=CHUNK_SIZE)
+    punc_model = load_model('punc', config)
+    punc_rt_model = load_model('punc_realtime', config)
+    startup = time.perf_counter() - start
+    rss_loaded = rss_mb()
+
+    cache = {}
+    pieces = []
+    punc_cache = {}
+    punctuated = []
+    start = time.perf_counter()
+    for offset in range(0, len(audio), CHUNK):
+        chunk = audio[offset:offset + CHUNK]
+        is_final = offset + CHUNK >= len(audio)
+        if len(chunk) < CHUNK:
+            chunk = np.pad(chunk, (0, CHUNK - len(chunk)))
+        res = model.generate(input=chunk, cache=cache, is_final=is_final, chunk_size=CHUNK_SIZE,
+                             encoder_chunk_look_back=4, decoder_chunk_look_back=1)
+        if res and res[0]["text"]:
+            pieces.append(res[0]["text"])
+            # 与 ASRManager._punctuate_fragment 相同的调用方式，不捕获异常
+            punc_res = punc_rt_model.generate(input=res[0]["text"], cache=punc_cache)
+            punctuated.append(punc_res[0]["text"] if punc_res else res[0]["text"])
+    raw_text = "".join(pieces)
+    text = punc_model.generate(input=raw_text)[0]["text"] if raw_text else ""
+    elapsed = time.perf_counter() - start
+
+    return {
+        'variant': name,
+        'startup_s': startup,
+        'rss_mb': rss_loaded,
+        'model_mb': rss_loaded - rss_before if rss_before is not None and rss_loaded is not None else None,
+        'peak_rss_mb': rss_mb(),
+        'rtf': elapsed / duration if duration else 0.0,
+        'text': text,
+        'realtime_text': "".join(punctuated),
+        'realtime_sentences': sum(ch in "。！？!?；;" for ch in "".join(punctuated)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR推理后端对比基准")
+    parser.add_argument("--audio", required=True, help="参考音频（16位PCM wav）")
+    parser.add_argument("--reference", help="参考文本文件，用于计算CER")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--worker", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_variant(args.worker, args.audio), ensure_ascii=False))
+        return
+
+    reference = None
+    if args.reference:
+        with open(args.reference, encoding='utf-8') as f:
+            reference = f.read()
+
+    print(f"{'后端':<12}{'加载(s)':>10}{'内存(MB)':>10}{'模型(MB)':>10}{'RTF':>8}{'CER':>8}{'实时标点句数':>14}")
+    for name in args.variants:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_asr_backends",
+             "--audio", args.audio, "--worker", name],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "未知错误"
+            print(f"{name:<12}失败: {error}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        error_rate = f"{cer(result['text'], reference):.3f}" if reference is not None else "-"
+        memory = f"{result['rss_mb']:.0f}" if result['rss_mb'] is not None else "-"
+        model_memory = f"{result['model_mb']:.0f}" if result['model_mb'] is not None else "-"
+        print(f"{name:<12}{result['startup_s']:>10.2f}{memory:>10}{model_memory:>10}"
+              f"{result['rtf']:>8.3f}{error_rate:>8}{result['realtime_sentences']:>14}")
+        if reference is None:
+            print(f"  识别结果: {result['text']}")
+            print(f"  实时标点: {result['realtime_text']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""降噪开销与效果基准
+
+用法（在项目根目录下）:
+    python -m benchmarks.bench_denoiser [--seconds 60]
+    python -m benchmarks.bench_denoiser --speech clip.wav --reference clip.txt --noise noise.wav [--snr 10 5 0]
+
+始终输出：
+  - 按采集线程的块大小（600ms）流式处理合成音频时，每秒音频消耗的CPU时间和实时率（RTF）；
+  - 不同强度的纯噪声中，通过音量门限（会被送入ASR）的块所占比例，降噪前后对比。
+提供 --speech 时还会加载流式识别模型（需要 funasr），模拟采集线程的音量门限和3秒静音断句：
+  - 语音按各个信噪比混入噪声（--noise 未提供时用白噪声），输出降噪前后的字错误率（CER）和ASR调用次数；
+  - 单独回放 --noise-seconds 秒纯噪声（平均幅度 --noise-level），输出每分钟产生的误识别片段数（非空识别结果即计为一个）。
+"""
+import argparse
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from noise_suppressor import NoiseSuppressor
+
+RATE = 16000
+CHUNK = 9600  # 与采集线程的块大小一致（600ms）
+CHUNK_SIZE = [0, 10, 5]
+VOLUME_GATE = 0.001  # 与 SystemAudioCapture 的音量门限一致
+SILENCE_SECONDS = 3.0  # 与 SystemAudioCapture 的静音断句时长一致
+FRAME_MS = (20, 32)
+NOISE_LEVELS = (0.002, 0.005, 0.01)
+
+
+def synthetic_speech(seconds: float, rng: np.random.Generator) -> np.ndarray:
+    """谐波加音节包络的语音替身，约一半时间为停顿"""
+    t = np.arange(int(seconds * RATE)) / RATE
+    pitch = 150 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = (np.sin(2 * np.pi * 3.0 * t) > 0.1) * ((t % 5) < 3)
+    return (0.08 * voiced * envelope + 0.002 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def stream(audio: np.ndarray, denoiser: Optional[NoiseSuppressor]) -> List[np.ndarray]:
+    """按采集块大小切分（不足一块补零），可选地经过降噪"""
+    chunks = []
+    for offset in range(0, len(audio), CHUNK):
+        chunk = audio[offset:offset + CHUNK]
+        if len(chunk) < CHUNK:
+            chunk = np.pad(chunk, (0, CHUNK - len(chunk)))
+        chunks.append(denoiser.process(chunk) if denoiser is not None else chunk)
+    return chunks
+
+
+def bench_cost(frame_ms: float, seconds: float) -> float:
+    """返回处理 seconds 秒音频所用的CPU时间（秒）"""
+    rng = np.random.default_rng(0)
+    audio = synthetic_speech(seconds, rng) + (0.005 * rng.standard_normal(int(seconds * RATE))).astype(np.float32)
+    denoiser = NoiseSuppressor(RATE, frame_ms=frame_ms, max_input_frames=CHUNK)
+    denoiser.process(audio[:CHUNK])  # 预热一次，排除首次调用的开销
+    start = time.process_time()
+    for offset in range(0, len(audio) - CHUNK + 1, CHUNK):
+        denoiser.process(audio[offset:offset + CHUNK])
+    return time.process_time() - start
+
+
+def gate_pass_rate(chunks: List[np.ndarray]) -> float:
+    return sum(np.abs(c).mean() > VOLUME_GATE for c in chunks) / len(chunks)
+
+
+def mix(speech: np.ndarray, noise: np.ndarray, snr_db: float) -> np.ndarray:
+    """把噪声（循环补齐）按信噪比混入语音"""
+    noise = np.resize(noise, len(speech))
+    speech_rms = np.sqrt(np.mean(speech ** 2)) or 1e-9
+    noise_rms = np.sqrt(np.mean(noise ** 2)) or 1e-9
+    return (speech + noise * speech_rms / noise_rms / 10 ** (snr_db / 20)).astype(np.float32)
+
+
+def transcribe(model, chunks: List[np.ndarray]) -> Tuple[List[str], int]:
+    """模拟采集线程：音量门限以上的块送入流式识别，连续静音达到3秒时断句
+
+    返回 (识别片段列表, ASR调用次数)。
+    """
+    cache, pieces, segments = {}, [], []
+    calls, quiet = 0, 0.0
+    for chunk in chunks:
+        if np.abs(chunk).mean() > VOLUME_GATE:
+            calls += 1
+            quiet = 0.0
+            res = model.generate(input=chunk, cache=cache, is_final=False, chunk_size=CHUNK_SIZE,
+                                 encoder_chunk_look_back=4, decoder_chunk_look_back=1)
+            if res and res[0]["text"]:
+                pieces.append(res[0]["text"])
+            continue
+        quiet += CHUNK / RATE
+        if quiet >= SILENCE_SECONDS and pieces:
+            segments.append("".join(pieces))
+            pieces, cache = [], {}
+    if pieces:
+        segments.append("".join(pieces))
+    return segments, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="降噪开销与效果基准")
+    parser.add_argument("--seconds", type=float, default=60.0, help="测量CPU开销时处理的音频时长")
+    parser.add_argument("--speech", help="语音（16位PCM wav），用于测量CER")
+    parser.add_argument("--reference", help="语音的参考文本文件")
+    parser.add_argument("--noise", help="噪声（16位PCM wav），默认使用白噪声")
+    parser.add_argument("--snr", type=float, nargs="+", default=[10.0, 5.0, 0.0], help="混入噪声的信噪比（dB）")
+    parser.add_argument("--noise-seconds", type=float, default=60.0, help="测量误识别片段时回放的纯噪声时长")
+    parser.add_argument("--noise-level", type=float, default=0.005, help="纯噪声的平均幅度（音量门限为 0.001）")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx"], help="ASR推理后端")
+    args = parser.parse_args()
+
+    print(f"{'帧长':<10}{'CPU毫秒/秒音频':>16}{'RTF':>12}")
+    for frame_ms in FRAME_MS:
+        cpu = bench_cost(frame_ms, args.seconds)
+        print(f"{f'{frame_ms}ms':<10}{cpu / args.seconds * 1000:>16.2f}{cpu / args.seconds:>12.5f}")
+
+    rng = np.random.default_rng(1)
+    print(f"\n{'纯噪声强度':<12}{'原始通过率':>12}{'降噪后通过率':>14}")
+    for level in NOISE_LEVELS:
+        noise = (level * rng.standard_normal(int(30 * RATE))).astype(np.float32)
+        raw = gate_pass_rate(stream(noise, None))
+        denoised = gate_pass_rate(stream(noise, NoiseSuppressor(RATE, max_input_frames=CHUNK)))
+        print(f"{f'白噪声 {level}':<12}{raw:>12.0%}{denoised:>14.0%}")
+
+    if not args.speech:
+        return
+
+    from asr_backend import load_model
+    from benchmarks.bench_asr_backends import cer, load_wav
+    model = load_model('streaming', {'backend': args.backend}, chunk_size=CHUNK_SIZE)
+    speech = load_wav(args.speech)
+    noise = load_wav(args.noise) if args.noise else rng.standard_normal(len(speech)).astype(np.float32)
+    reference = None
+    if args.reference:
+        with open(args.reference, encoding='utf-8') as f:
+            reference = f.read()
+
+    print(f"\n{'信噪比':<10}{'原始CER':>10}{'降噪CER':>10}{'原始ASR调用':>14}{'降噪ASR调用':>14}")
+    for snr in args.snr:
+        noisy = mix(speech, noise, snr)
+        raw_segments, raw_calls = transcribe(model, stream(noisy, None))
+        den_segments, den_calls = transcribe(model, stream(noisy, NoiseSuppressor(RATE, max_input_frames=CHUNK)))
+        if reference is not None:
+            raw_cer = f"{cer(''.join(raw_segments), reference):.3f}"
+            den_cer = f"{cer(''.join(den_segments), reference):.3f}"
+        else:
+            raw_cer = den_cer = "-"
+        print(f"{f'{snr:g}dB':<10}{raw_cer:>10}{den_cer:>10}{raw_calls:>14}{den_calls:>14}")
+
+    # 纯噪声不应产生任何识别片段，统计每分钟的误识别片段数
+    noise_only = np.resize(noise, int(args.noise_seconds * RATE))
+    noise_only = (noise_only * args.noise_level / (np.abs(noise_only).mean() or 1e-9)).astype(np.float32)
+    minutes = args.noise_seconds / 60
+    print(f"\n{'纯噪声':<10}{'误识别片段/分钟':>16}{'ASR调用/分钟':>14}")
+    for label, denoiser in (("原始", None), ("降噪", NoiseSuppressor(RATE, max_input_frames=CHUNK))):
+        segments, calls = transcribe(model, stream(noise_only, denoiser))
+        print(f"{label:<10}{len(segments) / minutes:>16.1f}{calls / minutes:>14.1f}")
+        for text in segments[:5]:
+            print(f"  误识别: {text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""每个问题都会经过的 Python 热路径微基准
+
+用法（在项目根目录下）:
+    python -m benchmarks.bench_hot_paths [--filter make_messages] [--save baseline.json]
+    python -m benchmarks.bench_hot_paths --compare baseline.json [--threshold 1.2]
+
+用固定的合成输入（固定随机种子）测量:
+  - AIManager.make_messages / estimate_tokens / _trim_history，历史长度取多个档位；
+  - 腾讯 socket.io 回复帧解析（正则 + json.loads），按帧计时；
+  - ASRApp._process_ai_responses 分发循环，从入队到渲染回调的单任务耗时；
+  - UIRenderer 追加文本并刷新 Tk 文本控件（需要图形界面，没有时跳过）；
+  - NotesIndex 笔记检索（检索并拼接背景资料），笔记片段数取多个档位。
+--save 把结果写入 JSON 作为基线，--compare 与基线对比，任一项变慢超过阈值时以非零状态退出。
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import queue
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import types
+from typing import Callable, Dict, List, Tuple
+
+import yaml
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+HISTORY_SIZES = (10, 50, 200, 500)  # 历史轮数，200 轮以上会触发历史裁剪
+SERVICE_COUNTS = (1, 3)
+PANEL_LINES = (100, 2000)
+NOTE_CHUNKS = (500, 5000)
+SEED = 0
+BENCH_CONFIG = {
+    'kimi': {
+        'api_key': 'bench',
+        'base_url': 'http://bench.invalid/v1',
+        'system_prompt': '你是一位应聘者，应聘的岗位是Java开发，现在所有问题都是由面试官提出，你来作答。',
+    },
+    'journal': {'enabled': True, 'path': 'journal/bench.jsonl'},
+}
+WORDS = list("你我他们这个那为什么怎么项目经验公司团队技术问题解决方案系统架构性能优化数据库缓存线程进程")
+
+# 基准用例: 名称 -> 构造函数，返回 (单次调用的函数, 每次调用包含的操作数)
+Case = Callable[[], Tuple[Callable[[], None], int]]
+
+
+def synthetic_text(rng: random.Random, chars: int) -> str:
+    return "".join(rng.choice(WORDS) for _ in range(chars))
+
+
+def synthetic_history(turns: int) -> List[Dict[str, str]]:
+    """固定种子的面试对话历史：每轮一个问题和一段约180字的回答"""
+    rng = random.Random(SEED)
+    history = []
+    for _ in range(turns):
+        history.append({"role": "user", "content": synthetic_text(rng, rng.randint(10, 30)) + "？"})
+        history.append({"role": "assistant", "content": synthetic_text(rng, rng.randint(150, 210)) + "。"})
+    return history
+
+
+def tencent_frames(chars: int = 300, step: int = 3) -> List[str]:
+    """一次回复的帧序列：回复内容是累计的全文，每帧多出 step 个字"""
+    rng = random.Random(SEED)
+    answer = synthetic_text(rng, chars)
+    frames = []
+    for end in range(step, chars + 1, step):
+        payload = {"payload": {"content": answer[:end], "is_from_self": False, "is_final": end >= chars,
+                               "request_id": "bench", "session_id": "bench", "record_id": "bench",
+                               "can_rating": True, "timestamp": 1700000000}}
+        frames.append("42" + json.dumps(["reply", payload], ensure_ascii=False))
+    return frames
+
+
+def _ai_manager():
+    from kimi_manager import AIManager
+    return AIManager()
+
+
+def case_make_messages(turns: int) -> Case:
+    def setup():
+        manager = _ai_manager()
+        history = synthetic_history(turns)
+
+        def run():
+            manager.messages = list(history)
+            manager.make_messages("你在上一个项目里是怎么做性能优化的？")
+        return run, 1
+    return setup
+
+
+def case_estimate_tokens(turns: int) -> Case:
+    def setup():
+        manager = _ai_manager()
+        messages = manager.system_messages + synthetic_history(turns)
+        return lambda: manager.estimate_tokens(messages), 1
+    return setup
+
+
+def case_trim_history(turns: int) -> Case:
+    def setup():
+        manager = _ai_manager()
+        history = synthetic_history(turns)
+        total = manager.estimate_tokens(history)
+
+        def run():
+            manager.messages = list(history)
+            manager.current_total_tokens = total
+            manager._trim_history(manager.DEFAULT_MAX_TOKENS)
+        return run, 1
+    return setup
+
+
+def case_tencent_frames() -> Tuple[Callable[[], None], int]:
+    from tencent_manager import parse_frame
+    frames = tencent_frames()
+
+    def run():
+        for frame in frames:
+            parse_frame(frame)
+    return run, len(frames)
+
+
+class _Checked:
+    """复选框变量替身，服务始终处于选中状态"""
+    def get(self):
+        return True
+
+
+class _StandInService:
+    def __init__(self):
+        self.last_usage = {'prompt_tokens': 100, 'completion_tokens': 50, 'total_tokens': 150}
+        self.last_truncation = None
+        self.last_model = "bench"
+
+    def chat(self, text, context=None):
+        return "这是一个用于基准测试的回答。" * 4
+
+
+class _StandInServices:
+    def __init__(self, names):
+        self.services = {name: _StandInService() for name in names}
+
+    def get_service(self, name):
+        return self.services.get(name)
+
+
+def case_dispatch(services: int) -> Case:
+    def setup():
+        from main import ASRApp
+        from session_journal import SessionJournal
+
+        names = [f"bench-{i}" for i in range(services)]
+        done = threading.Semaphore(0)
+        app = types.SimpleNamespace(
+            ai_queue=queue.Queue(),
+            ai_vars={name: _Checked() for name in names},
+            ai_service_manager=_StandInServices(names),
+            journal=SessionJournal(path=BENCH_CONFIG['journal']['path']),
+            notes_index=None,
+            session_id=SessionJournal.new_session_id(),
+            _update_ai_text=lambda name, response: done.release(),
+        )
+        threading.Thread(target=ASRApp._process_ai_responses, args=(app,),
+                         name="bench-ai-worker", daemon=True).start()
+
+        def run():
+            app.ai_queue.put({'text': "你在上一个项目里是怎么做性能优化的？", 'timestamp': time.time()})
+            for _ in names:
+                done.acquire()
+        return run, 1
+    return setup
+
+
+def case_renderer(lines: int) -> Case:
+    def setup():
+        import tkinter as tk
+        from ui_renderer import UIRenderer
+
+        root = tk.Tk()
+        root.withdraw()
+        widget = tk.Text(root)
+        renderer = UIRenderer(root, max_lines=lines, session_log_dir=None)
+        renderer.register('bench', widget)
+        line = synthetic_text(random.Random(SEED), 40) + "\n"
+        # 先填满到行数上限，之后每次追加都会触发旧内容裁剪
+        for _ in range(lines):
+            renderer.append('bench', line)
+        renderer.flush()
+
+        def run():
+            renderer.append('bench', line)
+            renderer.flush()
+            root.update_idletasks()
+        return run, 1
+    return setup
+
+
+def case_notes_search(chunks: int) -> Case:
+    def setup():
+        from notes_index import NotesIndex
+
+        # 每个文件一个标题和若干约280字的段落，总计 chunks 个片段
+        rng = random.Random(SEED)
+        notes_dir = f"notes_{chunks}"
+        os.makedirs(notes_dir, exist_ok=True)
+        for file_index in range(0, chunks, 50):
+            with open(os.path.join(notes_dir, f"note_{file_index}.md"), "w", encoding="utf-8") as f:
+                f.write(f"# 项目 {file_index}\n\n")
+                for _ in range(min(50, chunks - file_index)):
+                    f.write(synthetic_text(rng, 280) + "。\n\n")
+        NotesIndex.build_if_stale(notes_dir, os.path.join(notes_dir, ".index"))
+        index = NotesIndex(os.path.join(notes_dir, ".index"), min_score=0.0)
+        return lambda: index.context_for("你在上一个项目里是怎么做数据库性能优化的？"), 1
+    return setup
+
+
+def build_cases() -> Dict[str, Case]:
+    cases: Dict[str, Case] = {}
+    for turns in HISTORY_SIZES:
+        cases[f"make_messages[{turns}]"] = case_make_messages(turns)
+        cases[f"estimate_tokens[{turns}]"] = case_estimate_tokens(turns)
+        cases[f"trim_history[{turns}]"] = case_trim_history(turns)
+    cases["tencent_parse_frame"] = case_tencent_frames
+    for services in SERVICE_COUNTS:
+        cases[f"dispatch[{services}]"] = case_dispatch(services)
+    for lines in PANEL_LINES:
+        cases[f"tk_append_flush[{lines}]"] = case_renderer(lines)
+    for chunks in NOTE_CHUNKS:
+        cases[f"notes_search[{chunks}]"] = case_notes_search(chunks)
+    return cases
+
+
+def measure(run: Callable[[], None], ops: int, repeat: int) -> Dict[str, float]:
+    """自动确定每轮调用次数（每轮至少0.2秒），返回单次操作的中位数和最小耗时（微秒）"""
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    times = [t / number / ops * 1e6 for t in timer.repeat(repeat, number)]
+    return {'median_us': statistics.median(times), 'min_us': min(times)}
+
+
+def run_cases(pattern: str, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, setup in build_cases().items():
+        if pattern and pattern not in name:
+            continue
+        try:
+            run, ops = setup()
+        except Exception as e:
+            # 例如没有图形界面时无法创建 Tk 窗口
+            print(f"{name:<28}跳过: {e}")
+            continue
+        results[name] = measure(run, ops, repeat)
+        print(f"{name:<28}{results[name]['median_us']:>14.2f}{results[name]['min_us']:>14.2f}", flush=True)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, threshold: float) -> bool:
+    """与基线对比，返回是否所有用例都没有超过阈值的变慢"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\n与基线对比: {baseline_path} ({baseline['meta']['time']}, {baseline['meta']['python']})")
+    print(f"{'用例':<28}{'基线(us)':>14}{'本次(us)':>14}{'比值':>10}")
+    ok = True
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<28}{'-':>14}{result['median_us']:>14.2f}{'新增':>10}")
+            continue
+        ratio = result['median_us'] / base['median_us'] if base['median_us'] else 1.0
+        flag = "  变慢" if ratio > threshold else ""
+        ok = ok and ratio <= threshold
+        print(f"{name:<28}{base['median_us']:>14.2f}{result['median_us']:>14.2f}{ratio:>10.2f}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Python 热路径微基准")
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeat", type=int, default=7, help="每个用例的测量轮数")
+    parser.add_argument("--save", help="把结果保存为基线 JSON")
+    parser.add_argument("--compare", help="与基线 JSON 对比")
+    parser.add_argument("--threshold", type=float, default=1.2, help="中位数变慢超过该倍数视为回退")
+    args = parser.parse_args()
+    save_path = os.path.abspath(args.save) if args.save else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+
+    # 在临时目录中运行，使用基准专用的配置，会话日志也写在这里
+    workdir = tempfile.mkdtemp(prefix="bench_hot_paths_")
+    os.chdir(workdir)
+    with open("config.yaml", "w", encoding="utf-8") as f:
+        yaml.safe_dump(BENCH_CONFIG, f, allow_unicode=True)
+    # 日志照常格式化（这也是热路径的一部分），但不输出到终端
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        handlers=[logging.StreamHandler(open(os.devnull, "w"))])
+
+    print(f"Python {platform.python_version()}，{platform.machine()}，CPU核心数 {os.cpu_count()}")
+    print(f"{'用例':<28}{'中位数(us)':>14}{'最小(us)':>14}")
+    results = run_cases(args.filter, args.repeat)
+
+    if save_path:
+        meta = {'time': time.strftime("%Y-%m-%d %H:%M:%S"), 'python': platform.python_version(),
+                'machine': platform.machine(), 'cpus': os.cpu_count()}
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {save_path}")
+    if compare_path and not compare(results, compare_path, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
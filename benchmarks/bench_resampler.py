@@ -0,0 +1,53 @@
+"""重采样器CPU开销基准
+
+用法（在项目根目录下）:
+    python -m benchmarks.bench_resampler [--seconds 60]
+
+对常见的设备格式，按采集线程的实际块大小（600ms）流式送入一分钟合成音频，
+输出每分钟音频消耗的CPU时间和实时率（RTF）。
+"""
+import argparse
+import time
+import numpy as np
+from resampler import PolyphaseResampler
+
+DEVICE_FORMATS = [
+    (44100, 1),
+    (44100, 2),
+    (48000, 1),
+    (48000, 2),
+    (96000, 2),
+]
+
+
+def bench_format(rate: int, channels: int, seconds: float, out_rate: int = 16000,
+                 chunk_seconds: float = 0.6) -> float:
+    """返回处理 seconds 秒音频所用的CPU时间（秒）"""
+    rng = np.random.default_rng(0)
+    frames = int(rate * chunk_seconds)
+    chunk = (rng.standard_normal(frames * channels) * 0.1).astype(np.float32)
+    resampler = PolyphaseResampler(rate, out_rate, channels, max_input_frames=frames)
+    n_chunks = int(seconds / chunk_seconds)
+
+    # 预热一次，排除首次分配的开销
+    resampler.process(chunk)
+    start = time.process_time()
+    for _ in range(n_chunks):
+        resampler.process(chunk)
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重采样器CPU开销基准")
+    parser.add_argument("--seconds", type=float, default=60.0, help="每种格式处理的音频时长")
+    args = parser.parse_args()
+
+    print(f"{'设备格式':<16}{'CPU毫秒/分钟音频':>18}{'RTF':>12}")
+    for rate, channels in DEVICE_FORMATS:
+        cpu = bench_format(rate, channels, args.seconds)
+        per_minute_ms = cpu * 60.0 / args.seconds * 1000
+        print(f"{f'{rate}Hz x{channels}':<16}{per_minute_ms:>18.1f}{cpu / args.seconds:>12.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""线程预算校准
+
+用法（在项目根目录下）:
+    python -m benchmarks.calibrate_threads [--audio clip.wav] [--chunks 30] [--dry-run]
+
+在本机上对不同的线程分配组合，让流式识别和标点模型在两个线程中同时推理（模拟断句时
+标点与识别重叠的情况），测量两者的单次推理延迟，选出 P95 延迟之和最小的组合，
+并把结果写入 config.yaml 的 threads 段（只改写线程数，注释和 affinity 等设置保持不变）。
+"""
+import argparse
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import yaml
+
+from asr_backend import load_model
+from config_manager import ConfigManager
+from thread_budget import set_torch_threads
+
+CHUNK = 9600
+CHUNK_SIZE = [0, 10, 5]
+PUNC_TEXT = "请你简单介绍一下你自己然后说说你在上一家公司主要负责哪些工作遇到过什么技术难题是怎么解决的"
+
+
+def candidate_counts(cpus: int) -> List[int]:
+    counts, n = [], 1
+    while n <= cpus:
+        counts.append(n)
+        n *= 2
+    return counts
+
+
+def candidate_pairs(cpus: int) -> List[Tuple[int, int]]:
+    """(识别线程数, 标点线程数) 的组合，总数不超过核心数"""
+    counts = candidate_counts(cpus)
+    pairs = [(a, b) for a in counts for b in counts if a + b <= max(2, cpus)]
+    return pairs or [(1, 1)]
+
+
+def percentile_ms(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+class ModelCache:
+    """按 (模型类型, 线程数) 缓存模型；torch 后端与线程数无关，只加载一次"""
+    def __init__(self, asr_config):
+        self.asr_config = asr_config
+        self.per_session = asr_config.get('backend', 'torch') == 'onnx'
+        self._models: Dict[Tuple[str, int], object] = {}
+
+    def get(self, kind: str, threads: int):
+        key = (kind, threads if self.per_session else 0)
+        if key not in self._models:
+            self._models[key] = load_model(kind, self.asr_config, chunk_size=CHUNK_SIZE,
+                                           threads=threads if self.per_session else None)
+        return self._models[key]
+
+
+def measure(models: ModelCache, audio: np.ndarray, asr_threads: int, punc_threads: int,
+            chunks: int) -> Dict[str, float]:
+    """识别和标点同时运行，返回两者的延迟统计"""
+    asr_model = models.get('streaming', asr_threads)
+    punc_model = models.get('punc', punc_threads)
+    asr_latencies: List[float] = []
+    punc_latencies: List[float] = []
+    done = threading.Event()
+
+    def run_asr():
+        set_torch_threads(asr_threads)
+        cache = {}
+        for i in range(chunks + 2):
+            offset = (i * CHUNK) % max(CHUNK, len(audio) - CHUNK)
+            start = time.perf_counter()
+            asr_model.generate(input=audio[offset:offset + CHUNK], cache=cache, is_final=False,
+                               chunk_size=CHUNK_SIZE, encoder_chunk_look_back=4,
+                               decoder_chunk_look_back=1)
+            if i >= 2:  # 前两次作为预热
+                asr_latencies.append(time.perf_counter() - start)
+        done.set()
+
+    def run_punc():
+        set_torch_threads(punc_threads)
+        punc_model.generate(input=PUNC_TEXT)
+        while not done.is_set():
+            start = time.perf_counter()
+            punc_model.generate(input=PUNC_TEXT)
+            punc_latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=run_asr), threading.Thread(target=run_punc)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {
+        'asr_p50': percentile_ms(asr_latencies, 50),
+        'asr_p95': percentile_ms(asr_latencies, 95),
+        'punc_p50': percentile_ms(punc_latencies, 50),
+        'punc_p95': percentile_ms(punc_latencies, 95),
+    }
+
+
+def _is_key_line(line: str) -> bool:
+    stripped = line.strip()
+    return bool(stripped) and not stripped.startswith('#')
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(' '))
+
+
+def _block_end(lines: List[str], start: int, indent: int) -> int:
+    """返回 start 行所在映射块之后第一个缩进不超过 indent 的键所在行"""
+    for i in range(start + 1, len(lines)):
+        if _is_key_line(lines[i]) and _indent(lines[i]) <= indent:
+            return i
+    return len(lines)
+
+
+def _set_values(lines: List[str], indent: int, values: Dict[str, Any]) -> List[str]:
+    """在缩进为 indent 的映射块 lines 中逐行更新键值，保留注释和其它键，缺少的键追加在最后一个键之后"""
+    key_re = re.compile(r"^( *)([^\s#][^:#]*):(\s*)([^#\n]*?)(\s*#.*)?(\n?)$")
+    lines = list(lines)
+    for key, value in values.items():
+        found = None
+        for i, line in enumerate(lines):
+            m = key_re.match(line)
+            if m and len(m.group(1)) == indent and m.group(2).strip() == key:
+                found = (i, m)
+                break
+        if found is None:
+            dumped = yaml.safe_dump({key: value}, sort_keys=False, allow_unicode=True)
+            keys = [i for i, line in enumerate(lines) if _is_key_line(line) and _indent(line) >= indent]
+            at = keys[-1] + 1 if keys else 0
+            lines[at:at] = [" " * indent + row + "\n" for row in dumped.splitlines()]
+            continue
+        i, m = found
+        if isinstance(value, dict) and m.group(4):
+            # 行内写法（如 models: {}）整行替换为展开的映射
+            existing = yaml.safe_load(m.group(4)) or {}
+            merged = {**existing, **value} if isinstance(existing, dict) else value
+            dumped = yaml.safe_dump({key: merged}, sort_keys=False, allow_unicode=True)
+            lines[i:i + 1] = [" " * indent + row + "\n" for row in dumped.splitlines()]
+        elif isinstance(value, dict):
+            child_end = _block_end(lines, i, indent)
+            children = [j for j in range(i + 1, child_end) if _is_key_line(lines[j])]
+            child_indent = _indent(lines[children[0]]) if children else indent + 2
+            lines[i + 1:child_end] = _set_values(lines[i + 1:child_end], child_indent, value)
+        else:
+            rendered = yaml.safe_dump(value, default_flow_style=True).split("\n")[0]
+            lines[i] = f"{m.group(1)}{m.group(2)}:{m.group(3) or ' '}{rendered}{m.group(5) or ''}{m.group(6)}"
+    return lines
+
+
+def write_threads_config(path: str, best: Tuple[int, int]):
+    """把校准结果写入配置文件的 threads 段
+
+    只逐行改写 enabled、torch_intra_op 和 models 下的线程数，其余内容（包括注释、
+    注释掉的示例和 affinity 等设置）保持不变；没有 threads 段时追加到文件末尾。
+    """
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    asr_threads, punc_threads = best
+    values = {
+        'enabled': True,
+        'torch_intra_op': max(asr_threads, punc_threads),
+        'models': {
+            'streaming': asr_threads,
+            'offline': asr_threads,
+            'punc': punc_threads,
+            'punc_realtime': punc_threads,
+        },
+    }
+
+    header = next((i for i, line in enumerate(lines) if re.match(r"^threads:", line)), None)
+    if header is None:
+        text = "".join(lines).rstrip("\n")
+        block = yaml.safe_dump({'threads': values}, sort_keys=False, allow_unicode=True)
+        lines = [(text + "\n\n" if text else "") + block]
+    elif not re.match(r"^threads:\s*(#.*)?$", lines[header]):
+        # 行内写法整行替换
+        lines = _set_values(lines, 0, {'threads': values})
+    else:
+        end = _block_end(lines, header, 0)
+        children = [i for i in range(header + 1, end) if _is_key_line(lines[i])]
+        indent = _indent(lines[children[0]]) if children else 2
+        lines[header + 1:end] = _set_values(lines[header + 1:end], indent, values)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="线程预算校准")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--audio", help="用于测量的音频（16位PCM wav），默认使用合成噪声")
+    parser.add_argument("--chunks", type=int, default=30, help="每个组合测量的识别块数")
+    parser.add_argument("--dry-run", action="store_true", help="只输出结果，不写入配置")
+    args = parser.parse_args()
+
+    asr_config = ConfigManager(args.config).get_optional_config('asr')
+    if args.audio:
+        from benchmarks.bench_asr_backends import load_wav
+        audio = load_wav(args.audio)
+    else:
+        audio = (np.random.default_rng(0).standard_normal(CHUNK * 20) * 0.05).astype(np.float32)
+    if len(audio) < CHUNK * 2:
+        audio = np.pad(audio, (0, CHUNK * 2 - len(audio)))
+
+    cpus = os.cpu_count() or 1
+    models = ModelCache(asr_config)
+    print(f"CPU核心数: {cpus}，推理后端: {asr_config.get('backend', 'torch')}，"
+          f"识别块时长: {CHUNK / 16000 * 1000:.0f}ms")
+    print(f"{'识别线程':>8}{'标点线程':>8}{'识别P50':>10}{'识别P95':>10}{'标点P50':>10}{'标点P95':>10}")
+
+    results = []
+    for asr_threads, punc_threads in candidate_pairs(cpus):
+        stats = measure(models, audio, asr_threads, punc_threads, args.chunks)
+        results.append(((asr_threads, punc_threads), stats))
+        print(f"{asr_threads:>8}{punc_threads:>8}{stats['asr_p50']:>10.1f}{stats['asr_p95']:>10.1f}"
+              f"{stats['punc_p50']:>10.1f}{stats['punc_p95']:>10.1f}")
+
+    best, stats = min(results, key=lambda r: r[1]['asr_p95'] + r[1]['punc_p95'])
+    print(f"最佳组合: 识别 {best[0]} 线程，标点 {best[1]} 线程 "
+          f"(识别P95 {stats['asr_p95']:.1f}ms，标点P95 {stats['punc_p95']:.1f}ms)")
+    if args.dry_run:
+        return
+    write_threads_config(args.config, best)
+    print(f"已写入 {args.config} 的 threads 段")
+
+
+if __name__ == "__main__":
+    main()
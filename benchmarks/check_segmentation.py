@@ -0,0 +1,119 @@
+"""两遍识别与流式标点同时启用时的断句回归检查
+
+用法（在项目根目录下）:
+    python -m benchmarks.check_segmentation
+
+用脚本化的替身模型（每个音频块对应固定的识别文本）驱动 ASRManager，检查：
+  - 流式标点在音频块中间断句后，剩余部分不会被第二遍识别重复输出已经输出过的句子结尾；
+  - 第二遍识别较慢时，之后由流式标点断出的句子不会越过仍在解码的前一句。
+任一检查失败时以非零状态退出。
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import yaml
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+CHUNK = 9600
+CHECK_CONFIG = {
+    'asr': {
+        'two_pass': {'enabled': True, 'budget_ms': 5000},
+        'streaming_punc': {'enabled': True, 'min_chars': 4},
+    },
+}
+# 每个音频块（用块内的常数值编号）的识别文本，流式和离线模型给出相同的文字
+CHUNK_TEXTS = {1: "你做过什么", 2: "项目吗为什么", 3: "离职", 4: "自我介绍一下", 5: "为什么离职吗"}
+
+
+def chunk(index: int) -> np.ndarray:
+    return np.full(CHUNK, index, dtype=np.float32)
+
+
+class StandInStreamingModel:
+    def generate(self, input, cache=None, **kwargs):
+        return [{"text": CHUNK_TEXTS[int(input[0])]}]
+
+
+class StandInOfflineModel:
+    """整段解码：按音频中包含的块依次拼接文字，可设置解码耗时"""
+    def __init__(self):
+        self.delay = 0.0
+
+    def generate(self, input, **kwargs):
+        time.sleep(self.delay)
+        return [{"text": "".join(CHUNK_TEXTS[int(v)] for v in input[::CHUNK])}]
+
+
+class StandInRealtimePuncModel:
+    def generate(self, input, cache=None, **kwargs):
+        return [{"text": input.replace("吗", "吗？")}]
+
+
+class StandInPuncModel:
+    def generate(self, input, **kwargs):
+        return [{"text": input if input[-1] in "。？" else input + "。"}]
+
+
+OFFLINE_MODEL = StandInOfflineModel()
+
+
+def stand_in_load_model(kind, config=None, model=None, chunk_size=None, threads=None):
+    return {
+        'streaming': StandInStreamingModel(),
+        'offline': OFFLINE_MODEL,
+        'punc_realtime': StandInRealtimePuncModel(),
+    }.get(kind) or StandInPuncModel()
+
+
+def run_case(asr, chunks, expected, offline_delay=0.0):
+    results = []
+    asr.set_result_callback(lambda text, label: results.append((text, label)))
+    OFFLINE_MODEL.delay = offline_delay
+    asr.start()
+    for step in chunks:
+        if step == 'force':
+            asr.force_generate()
+        else:
+            asr.process_audio(chunk(step))
+    deadline = time.time() + 10
+    while len(results) < len(expected) and time.time() < deadline:
+        time.sleep(0.01)
+    asr.stop()
+    return results
+
+
+def main():
+    import asr_manager as asr_module
+    from asr_manager import ASRManager
+
+    os.chdir(tempfile.mkdtemp(prefix="segmentation_"))
+    with open("config.yaml", "w", encoding="utf-8") as f:
+        yaml.safe_dump(CHECK_CONFIG, f, allow_unicode=True)
+    asr_module.load_model = stand_in_load_model
+    asr = ASRManager()
+
+    cases = [
+        ("块中间断句后剩余部分不重复", [1, 2, 3, 'force'], 0.0,
+         [('你做过什么项目吗？', 'sentence'), ('为什么离职。', 'force')]),
+        ("第二遍识别较慢时保持断句顺序", [4, 'force', 5], 0.5,
+         [('自我介绍一下。', 'force'), ('为什么离职吗？', 'sentence')]),
+    ]
+    failed = 0
+    for name, steps, delay, expected in cases:
+        results = run_case(asr, steps, expected, delay)
+        ok = results == expected
+        failed += not ok
+        print(f"{'通过' if ok else '失败'}: {name}")
+        if not ok:
+            print(f"  期望 {expected}\n  实际 {results}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
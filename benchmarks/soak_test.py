@@ -0,0 +1,290 @@
+"""长时间运行的内存浸泡测试
+
+用法（在项目根目录下）:
+    python -m benchmarks.soak_test [--hours 3] [--max-growth-mb-per-hour 5]
+
+用本地替身代替识别模型和AI服务接口，按音频时间（不等待真实时长）回放数小时的
+说话/静音交替音频和AI请求，经过完整的识别、断句、问题检测、AI队列、会话日志和
+界面渲染流程；识别结果之后直接调用 main.ASRApp 的 handle_result、_enqueue_task 和
+_process_ai_responses（作用在替身对象上），覆盖实际发布的代码，包括有界队列的丢弃逻辑。定期采样进程RSS和 tracemalloc，结束时输出增长最多的分配位置；
+后半程内存仍在持续增长（斜率超过阈值）时以非零状态退出。
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+CHUNK = 9600
+RATE = 16000
+SOAK_CONFIG = {
+    'kimi': {
+        'api_key': 'soak-test',
+        'base_url': 'http://soak-test.invalid/v1',
+        'system_prompt': '你是一个面试助手',
+        'summary': {'enabled': True, 'threshold_tokens': 2000, 'keep_turns': 2},
+    },
+    'asr': {'endpoint': {'enabled': True, 'report_every': 0}},
+    'question_filter': {'enabled': True},
+    'journal': {'enabled': True, 'path': 'journal/soak.jsonl'},
+}
+WORDS = list("你我他们这个那为什么怎么项目经验公司团队技术问题解决方案系统架构性能优化数据库缓存")
+
+
+class StandInStreamingModel:
+    """流式识别替身：有声音时输出随机片段，缓存像真实模型一样随调用增长"""
+    def __init__(self, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+
+    def generate(self, input, cache=None, **kwargs):
+        if cache is not None:
+            cache.setdefault('frames', []).append(np.zeros(64, dtype=np.float32))
+        if self.rng.random() < 0.7:
+            n = int(self.rng.integers(2, 8))
+            text = "".join(self.rng.choice(WORDS, n))
+            if self.rng.random() < 0.3:
+                text += "吗"
+            return [{"text": text}]
+        return [{"text": ""}]
+
+
+class StandInPuncModel:
+    def generate(self, input, **kwargs):
+        return [{"text": input + "？" if input.endswith("吗") else input + "。"}]
+
+
+def stand_in_load_model(kind, config=None, model=None, chunk_size=None, threads=None):
+    return StandInStreamingModel() if kind in ('streaming', 'offline') else StandInPuncModel()
+
+
+class StandInRoot:
+    """Tk 根窗口替身，渲染由测试循环手动驱动"""
+    def after(self, ms, callback):
+        return None
+
+    def after_cancel(self, after_id):
+        pass
+
+
+class StandInText:
+    """Text 控件替身，支持 UIRenderer 用到的索引形式"""
+    def __init__(self):
+        self.text = ""
+
+    def _index(self, index: str) -> int:
+        if index in ("end", "end-1c"):
+            return len(self.text)
+        if index == "1.0":
+            return 0
+        return int(index.split("+")[1].split()[0])
+
+    def insert(self, index, text):
+        pos = self._index(index)
+        self.text = self.text[:pos] + text + self.text[pos:]
+
+    def delete(self, start, end):
+        self.text = self.text[:self._index(start)] + self.text[self._index(end):]
+
+    def see(self, index):
+        pass
+
+
+class StandInChecked:
+    """复选框变量替身，服务始终处于选中状态"""
+    def get(self):
+        return True
+
+
+class StandInServices:
+    def __init__(self, services):
+        self.services = services
+
+    def get_service(self, name):
+        return self.services.get(name)
+
+
+def chat_completion_handler(request):
+    """AI接口替身，返回固定长度的回复和用量"""
+    import httpx
+    body = json.loads(request.content)
+    prompt_chars = sum(len(m['content']) for m in body['messages'])
+    answer = "这是一个用于浸泡测试的回答。" * 8
+    return httpx.Response(200, json={
+        'id': 'soak', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': answer}}],
+        'usage': {'prompt_tokens': prompt_chars, 'completion_tokens': len(answer),
+                  'total_tokens': prompt_chars + len(answer)},
+    })
+
+
+def rss_mb():
+    from benchmarks.bench_asr_backends import rss_mb as _rss_mb
+    return _rss_mb()
+
+
+def slope_per_hour(samples, key):
+    """后半程采样的线性增长斜率（MB/小时）"""
+    half = samples[len(samples) // 2:]
+    values = [s[key] for s in half if s[key] is not None]
+    if len(values) < 3:
+        return 0.0
+    hours = np.array([s['hours'] for s in half if s[key] is not None])
+    return float(np.polyfit(hours, np.array(values), 1)[0])
+
+
+def run(args):
+    import httpx
+    import yaml
+    from openai import AsyncOpenAI
+    import asr_manager as asr_module
+    from asr_manager import ASRManager
+    from async_runtime import AsyncRuntime
+    from kimi_manager import AIManager
+    from main import ASRApp
+    from question_filter import QuestionFilter
+    from session_journal import SessionJournal
+    from ui_renderer import UIRenderer
+
+    with open("config.yaml", "w", encoding="utf-8") as f:
+        yaml.safe_dump(SOAK_CONFIG, f, allow_unicode=True)
+    asr_module.load_model = stand_in_load_model
+
+    # 流水线：识别 -> 问题检测 -> 有界AI队列 -> AI服务 -> 渲染/日志，直接调用 ASRApp 的方法
+    renderer = UIRenderer(StandInRoot(), max_lines=200, max_chars=20000, session_log_dir="logs")
+    renderer.register('transcript', StandInText())
+    renderer.register('Kimi', StandInText())
+    stats = {'segments': 0, 'requests': 0}
+
+    manager = AIManager()
+    logging.getLogger().setLevel(logging.WARNING)
+    manager.client = AsyncOpenAI(api_key='soak-test', base_url=SOAK_CONFIG['kimi']['base_url'],
+                                 http_client=httpx.AsyncClient(transport=httpx.MockTransport(chat_completion_handler)))
+
+    def update_ai_text(service_name, ai_response):
+        stats['requests'] += 1
+        ASRApp._update_ai_text(app, service_name, ai_response)
+
+    app = types.SimpleNamespace(
+        is_paused=False,
+        renderer=renderer,
+        journal=SessionJournal(path=SOAK_CONFIG['journal']['path']),
+        session_id=SessionJournal.new_session_id(),
+        question_filter=QuestionFilter.from_config(SOAK_CONFIG['question_filter']),
+        notes_index=None,
+        ai_queue=queue.Queue(maxsize=16),
+        dropped_tasks=0,
+        ai_vars={'Kimi': StandInChecked()},
+        ai_service_manager=StandInServices({'Kimi': manager}),
+        _update_ai_text=update_ai_text,
+    )
+    app._enqueue_task = lambda task: ASRApp._enqueue_task(app, task)
+
+    def handle_result(text, label=''):
+        stats['segments'] += 1
+        ASRApp.handle_result(app, text, label)
+
+    asr = ASRManager()
+    asr.set_result_callback(handle_result)
+    asr.start()
+    threading.Thread(target=ASRApp._process_ai_responses, args=(app,),
+                     name="soak-ai-worker", daemon=True).start()
+
+    rng = np.random.default_rng(1)
+    voice = (rng.standard_normal(CHUNK) * 0.05).astype(np.float32)
+    total_chunks = int(args.hours * 3600 * RATE / CHUNK)
+    sample_every = max(1, int(args.sample_minutes * 60 * RATE / CHUNK))
+
+    # 识别流程逐块打印的日志在这里没有意义，只输出采样结果
+    out = sys.stdout
+    quiet = contextlib.redirect_stdout(open(os.devnull, "w"))
+    quiet.__enter__()
+    tracemalloc.start(10)
+    baseline = None
+    samples = []
+    started = time.time()
+    speaking = 0
+    for i in range(total_chunks):
+        # 说话 2~15 秒，停顿 1~4 秒，交替进行
+        if speaking <= 0:
+            for _ in range(int(rng.integers(2, 7))):
+                asr.process_silence(CHUNK / RATE)
+            speaking = int(rng.integers(4, 25))
+        asr.process_audio(voice.copy())
+        speaking -= 1
+        if i % 4 == 0:
+            renderer.flush()
+        # AI替身很快，但仍要给工作线程留出处理时间，避免队列溢出成为常态
+        while app.ai_queue.qsize() > 8:
+            time.sleep(0.001)
+
+        if i % sample_every == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            sample = {'hours': i * CHUNK / RATE / 3600, 'rss_mb': rss_mb(),
+                      'traced_mb': current / 1024 / 1024}
+            samples.append(sample)
+            if baseline is None and i >= total_chunks // 4:
+                baseline = tracemalloc.take_snapshot()
+            print(f"[{sample['hours']:.2f}h] RSS {sample['rss_mb'] or 0:.1f}MB, "
+                  f"tracemalloc {sample['traced_mb']:.2f}MB, 句子 {stats['segments']}, "
+                  f"请求 {stats['requests']}, 历史消息 {len(manager.messages)}", file=out, flush=True)
+
+    # 工作线程没有退出信号，等队列排空后随进程结束
+    deadline = time.time() + 10
+    while not app.ai_queue.empty() and time.time() < deadline:
+        time.sleep(0.01)
+    final = tracemalloc.take_snapshot()
+    asr.stop()
+    app.journal.close()
+    renderer.stop()
+    AsyncRuntime().shutdown()
+    quiet.__exit__(None, None, None)
+
+    print(f"\n模拟 {args.hours:.1f} 小时音频，耗时 {time.time() - started:.0f}s，"
+          f"句子 {stats['segments']}，AI请求 {stats['requests']}，队列丢弃 {app.dropped_tasks}")
+    print(app.question_filter.format_stats())
+    if baseline is not None:
+        print("\n增长最多的分配位置:")
+        for stat in final.compare_to(baseline, 'lineno')[:args.top]:
+            print(f"  {stat}")
+
+    rss_slope = slope_per_hour(samples, 'rss_mb')
+    traced_slope = slope_per_hour(samples, 'traced_mb')
+    print(f"\n后半程增长斜率: RSS {rss_slope:.2f} MB/小时，tracemalloc {traced_slope:.2f} MB/小时 "
+          f"(阈值 {args.max_growth_mb_per_hour} MB/小时)")
+    if max(rss_slope, traced_slope) > args.max_growth_mb_per_hour:
+        print("失败: 内存持续增长")
+        return 1
+    print("通过")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长时间运行的内存浸泡测试")
+    parser.add_argument("--hours", type=float, default=3.0, help="模拟的音频时长（小时）")
+    parser.add_argument("--sample-minutes", type=float, default=5.0, help="采样间隔（模拟分钟）")
+    parser.add_argument("--max-growth-mb-per-hour", type=float, default=5.0)
+    parser.add_argument("--top", type=int, default=10, help="输出增长最多的分配位置数")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="soak_")
+    os.chdir(workdir)
+    print(f"工作目录: {workdir}")
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
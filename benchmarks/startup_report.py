@@ -0,0 +1,59 @@
+"""AI服务启动耗时报告
+
+用法（在项目根目录下）:
+    python -m benchmarks.startup_report
+
+在独立的子进程中用 python -X importtime 分别测量:
+  - 注册表本身（ai_service_manager）的导入耗时，即懒加载时启动要付出的代价；
+  - 每个服务模块及其SDK的导入耗时，即过去在启动时一次性付出的代价。
+"""
+import re
+import subprocess
+import sys
+
+PROVIDER_MODULES = ["kimi_manager", "tencent_manager", "baidu_manager", "chatgpt_manager"]
+
+
+def import_time_ms(statement: str) -> float:
+    """返回在全新解释器中执行 statement 的累计导入耗时（毫秒）"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        # 格式: import time: self [us] | cumulative | imported package
+        match = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s(\S.*)$", line)
+        if match and not match.group(2).startswith(" "):
+            total_us += int(match.group(1))
+    return total_us / 1000
+
+
+def main():
+    print(f"{'模块':<24}{'导入耗时(ms)':>14}")
+    lazy_ms = import_time_ms("import ai_service_manager")
+    print(f"{'ai_service_manager':<24}{lazy_ms:>14.1f}")
+
+    for module in PROVIDER_MODULES:
+        try:
+            ms = import_time_ms(f"import {module}")
+        except RuntimeError as e:
+            print(f"{module:<24}{'失败':>14}  {e}")
+            continue
+        print(f"{module:<24}{ms:>14.1f}")
+
+    # 逐个模块测量会重复计入共享依赖，合在一起再测一次
+    try:
+        eager_ms = import_time_ms("import " + ", ".join(PROVIDER_MODULES))
+    except RuntimeError as e:
+        print(f"无法一次导入全部服务模块，请先安装依赖: {e}")
+        return
+    print("-" * 38)
+    print(f"{'启动时全部导入':<18}{eager_ms:>14.1f}")
+    print(f"{'懒加载注册表':<18}{lazy_ms:>14.1f}")
+    print(f"{'节省':<20}{eager_ms - lazy_ms:>14.1f}")
+
+if __name__ == "__main__":
+    main()
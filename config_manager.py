@@ -1,25 +1,169 @@
 import yaml
 import os
-from typing import Dict, Any
+import threading
+import weakref
+from types import MappingProxyType
+from typing import Dict, Any, Callable, Mapping
+
+
+def _freeze(value):
+    """递归地把配置转换为只读结构"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _coerce(raw: str, current):
+    """按原配置值的类型转换环境变量字符串"""
+    if isinstance(current, bool):
+        return raw.strip().lower() in ('1', 'true', 'yes', 'on')
+    if isinstance(current, int):
+        return int(raw)
+    if isinstance(current, float):
+        return float(raw)
+    return raw
+
 
 class ConfigManager:
+    """配置管理器
+
+    同一路径的配置只加载一次，所有实例共享同一个只读快照。环境变量
+    SERVICE_KEY_NAME（例如 BAIDU_APP_KEY、KIMI_API_KEY）会覆盖对应的配置项。
+    启动文件监视后，配置文件修改时间变化会触发重新加载并通知已注册的监听者。
+    """
+    _instances: Dict[str, "ConfigManager"] = {}
+    _instances_lock = threading.Lock()
+
+    def __new__(cls, config_path: str = "config.yaml"):
+        key = os.path.abspath(config_path)
+        with cls._instances_lock:
+            instance = cls._instances.get(key)
+            if instance is None:
+                instance = super(ConfigManager, cls).__new__(cls)
+                instance._initialized = False
+                cls._instances[key] = instance
+        return instance
+
     def __init__(self, config_path: str = "config.yaml"):
+        if self._initialized:
+            return
         self.config_path = config_path
-        self.config = self._load_config()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._mtime = None
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self._config = self._load_config()
+        self._initialized = True
+
+    @property
+    def config(self) -> Mapping[str, Any]:
+        """当前配置快照（只读）"""
+        return self._config
 
-    def _load_config(self) -> Dict[str, Any]:
+    def _load_config(self) -> Mapping[str, Any]:
         """加载配置文件"""
         try:
             if not os.path.exists(self.config_path):
                 raise FileNotFoundError(f"Configuration file not found: {self.config_path}")
-            
+
+            mtime = os.path.getmtime(self.config_path)
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+                config = yaml.safe_load(f) or {}
+            self._mtime = mtime
+            self._apply_env_overrides(config)
+            return _freeze(config)
         except Exception as e:
             raise RuntimeError(f"Failed to load configuration: {str(e)}")
 
-    def get_service_config(self, service: str) -> Dict[str, Any]:
+    @staticmethod
+    def _apply_env_overrides(config: Dict[str, Any]):
+        """用 SERVICE_KEY_NAME 形式的环境变量覆盖配置项"""
+        for service, section in config.items():
+            if not isinstance(section, dict):
+                continue
+            for key, value in section.items():
+                if isinstance(value, (dict, list)):
+                    continue
+                env_name = f"{service}_{key}".upper()
+                raw = os.environ.get(env_name)
+                if raw is None:
+                    continue
+                try:
+                    section[key] = _coerce(raw, value)
+                except ValueError:
+                    raise ValueError(f"Invalid value for environment variable {env_name}: {raw}")
+
+    def get_service_config(self, service: str) -> Mapping[str, Any]:
         """获取指定服务的配置"""
-        if not self.config or service not in self.config:
+        config = self._config
+        if not config or service not in config:
             raise ValueError(f"Configuration for service '{service}' not found")
-        return self.config[service] 
\ No newline at end of file
+        return config[service]
+
+    def get_optional_config(self, section: str) -> Mapping[str, Any]:
+        """获取可选配置段，不存在时返回空字典"""
+        if not self._config:
+            return {}
+        return self._config.get(section) or {}
+
+    def add_reload_listener(self, callback: Callable[["ConfigManager"], None]):
+        """注册配置重新加载后的回调，绑定方法只保存弱引用"""
+        if hasattr(callback, '__self__'):
+            ref = weakref.WeakMethod(callback)
+        else:
+            ref = lambda: callback
+        with self._lock:
+            self._listeners.append(ref)
+
+    def reload_if_changed(self) -> bool:
+        """配置文件修改时间变化时重新加载，返回是否发生了重新加载"""
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+
+        try:
+            new_config = self._load_config()
+        except RuntimeError as e:
+            # 保留旧配置，等待文件被修正
+            self._mtime = mtime
+            print(f"重新加载配置失败，继续使用旧配置: {e}")
+            return False
+        self._config = new_config
+        print(f"配置文件已更新，重新加载: {self.config_path}")
+
+        with self._lock:
+            # 顺便清理已被回收的监听者
+            self._listeners = [ref for ref in self._listeners if ref() is not None]
+            listeners = list(self._listeners)
+        for ref in listeners:
+            callback = ref()
+            if callback is None:
+                continue
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"应用新配置时出错: {e}")
+        return True
+
+    def start_watching(self, interval: float = 2.0):
+        """启动后台线程监视配置文件的修改时间"""
+        if self._watch_thread and self._watch_thread.is_alive():
+            return
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(
+            target=self._watch_loop, args=(interval,), name="config-watcher", daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        """停止监视配置文件"""
+        self._watch_stop.set()
+
+    def _watch_loop(self, interval: float):
+        while not self._watch_stop.wait(interval):
+            self.reload_if_changed()
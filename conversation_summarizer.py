@@ -0,0 +1,149 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+
+class ConversationSummarizer:
+    """滚动对话摘要
+
+    当历史消息估算的 token 数超过阈值时，在事件循环上后台调用同一个模型，
+    把较早的轮次压缩成一条摘要消息，最近的若干轮保持原文。摘要不在请求路径上，
+    完成后才替换历史；替换前会确认被摘要的那段历史没有被改动过。
+    """
+    SUMMARY_PREFIX = "此前对话摘要："
+    SUMMARY_PROMPT = ("请把下面的面试对话压缩成一段简洁的摘要，保留面试官问过的问题要点、"
+                      "回答中的关键结论以及应聘者提到的事实信息，不超过{max_chars}字。")
+
+    def __init__(self, manager, threshold_tokens: int = 6000, keep_turns: int = 3,
+                 max_summary_chars: int = 400, max_summary_tokens: int = 600):
+        self.manager = manager
+        self.threshold_tokens = threshold_tokens
+        self.keep_turns = max(1, keep_turns)
+        self.max_summary_chars = max_summary_chars
+        self.max_summary_tokens = max_summary_tokens
+
+        self._task: Optional[asyncio.Task] = None
+        self.saved_tokens = 0  # 当前历史中因摘要而少发送的 token 数
+        self.summary_count = 0
+        self.turn_stats: List[Dict[str, float]] = []
+
+    @property
+    def logger(self):
+        return self.manager.logger
+
+    def _is_summary(self, message: Dict[str, str]) -> bool:
+        return message["role"] == "system" and message["content"].startswith(self.SUMMARY_PREFIX)
+
+    def reset(self) -> None:
+        """开始新的对话：取消进行中的摘要并清空统计（在事件循环线程中调用）"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self.saved_tokens = 0
+        self.summary_count = 0
+        self.turn_stats = []
+
+    def maybe_schedule(self) -> None:
+        """历史超过阈值时在后台启动一次摘要（在事件循环线程中调用）"""
+        if self._task is not None and not self._task.done():
+            return
+        messages = self.manager.messages
+        if self.manager.estimate_tokens(messages) <= self.threshold_tokens:
+            return
+
+        # 保留最近 keep_turns 轮原文，从后往前数用户消息找到这些轮的起点；
+        # 请求失败或被取消时会留下没有回答的用户消息，不能假设严格一问一答
+        split, turns = len(messages), 0
+        while split > 0 and turns < self.keep_turns:
+            split -= 1
+            if messages[split]["role"] == "user":
+                turns += 1
+        if turns < self.keep_turns or split <= 1:
+            return
+        prefix = list(messages[:split])
+        if len(prefix) == 1 and self._is_summary(prefix[0]):
+            return
+        self._task = asyncio.ensure_future(self._summarize(prefix))
+
+    async def _summarize(self, prefix: List[Dict[str, str]]) -> None:
+        start_time = time.time()
+        lines = []
+        for msg in prefix:
+            if self._is_summary(msg):
+                lines.append(msg["content"])
+            else:
+                speaker = "面试官" if msg["role"] == "user" else "应聘者"
+                lines.append(f"{speaker}：{msg['content']}")
+        request = [
+            {"role": "system", "content": self.SUMMARY_PROMPT.format(max_chars=self.max_summary_chars)},
+            {"role": "user", "content": "\n".join(lines)},
+        ]
+        try:
+            completion = await self.manager.client.chat.completions.create(
+                model=self.manager.model,
+                messages=request,
+                temperature=0.1,
+                max_tokens=self.max_summary_tokens,
+                timeout=self.manager._timeout
+            )
+            summary_text = (completion.choices[0].message.content or "").strip()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"⚠️ 历史摘要失败，保留原始历史: {e}")
+            return
+        if not summary_text:
+            return
+
+        # 只有被摘要的那段历史仍然原样位于开头时才替换
+        messages = self.manager.messages
+        if len(messages) < len(prefix) or any(a is not b for a, b in zip(messages, prefix)):
+            self.logger.info("历史在摘要期间被修改，放弃本次摘要")
+            return
+
+        summary = {"role": "system", "content": self.SUMMARY_PREFIX + summary_text}
+        before = self.manager.estimate_tokens(prefix)
+        after = self.manager.estimate_tokens([summary])
+        self.manager.messages = [summary] + messages[len(prefix):]
+        self.saved_tokens += max(0, before - after)
+        self.summary_count += 1
+        self.logger.info(
+            f"🗜️ 已将 {len(prefix)} 条历史消息压缩为摘要: {before} → {after} tokens，"
+            f"耗时 {time.time() - start_time:.2f}s"
+        )
+
+    def record_turn(self, prompt_tokens: int, latency: float) -> None:
+        """记录一轮请求的提示词大小和耗时，并输出摘要带来的节省"""
+        unsummarized = prompt_tokens + self.saved_tokens
+        stat = {
+            'prompt_tokens': prompt_tokens,
+            'unsummarized_tokens': unsummarized,
+            'saved_tokens': self.saved_tokens,
+            'latency': latency,
+        }
+        self.turn_stats.append(stat)
+        if len(self.turn_stats) > 1000:
+            del self.turn_stats[:len(self.turn_stats) - 1000]
+
+        ms_per_token = self.latency_per_token()
+        saved_ms = ms_per_token * self.saved_tokens if ms_per_token else 0.0
+        ratio = self.saved_tokens / unsummarized * 100 if unsummarized else 0.0
+        self.logger.info(
+            f"📉 本轮提示词 {prompt_tokens} tokens，摘要节省 {self.saved_tokens} tokens ({ratio:.0f}%)，"
+            f"耗时 {latency:.2f}s，估算节省 {saved_ms:.0f}ms"
+        )
+
+    def latency_per_token(self) -> float:
+        """用最小二乘拟合每个提示词 token 对应的耗时（毫秒），样本不足时返回0"""
+        stats = self.turn_stats
+        if len(stats) < 5:
+            return 0.0
+        xs = [s['prompt_tokens'] for s in stats]
+        ys = [s['latency'] * 1000 for s in stats]
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if var_x == 0:
+            return 0.0
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+        return max(0.0, slope)
@@ -0,0 +1,150 @@
+from collections import deque
+from typing import Any, Dict, List, Mapping, Optional
+
+import numpy as np
+
+# 句末标点，出现在结尾时基本可以确定一句话已经结束
+FINAL_PUNCTUATION = "。！？!?；;"
+# 句末语气词，中文问句常以这些字结尾
+FINAL_PARTICLES = "吗呢吧么嘛啊呀"
+# 以这些词结尾时说话人大概率还没说完
+CONTINUATION_ENDINGS = ("的", "和", "跟", "与", "或", "就", "把", "被", "在", "是", "然后", "因为",
+                        "所以", "但是", "而且", "如果", "还有", "就是", "那个", "这个", "比如")
+
+
+class EndpointDetector:
+    """自适应断句检测
+
+    综合三类信号判断一句话是否结束：VAD 给出的尾部静音时长、ASR 识别结果保持不变的时长，
+    以及当前文本以句末结尾的概率。静音阈值取说话人句内停顿分布的高分位数，
+    会随着说话人的语速自动调整。时间全部按音频时长计算，回放录音时行为一致。
+    """
+    def __init__(self, initial_silence: float = 0.8, min_silence: float = 0.3,
+                 max_silence: float = 2.0, pause_percentile: float = 90.0,
+                 pause_margin: float = 1.25, min_chars: int = 2, max_chars: int = 120,
+                 min_pause_samples: int = 20, report_every: int = 20):
+        self.initial_silence = initial_silence
+        self.min_silence = min_silence
+        self.max_silence = max_silence
+        self.pause_percentile = pause_percentile
+        self.pause_margin = pause_margin
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.min_pause_samples = min_pause_samples
+        self.report_every = report_every
+
+        self._pauses = deque(maxlen=200)  # 句内停顿时长（停顿后说话人继续说下去）
+        self._delays: List[float] = []  # 最后一次文本变化到判定断句的时长
+        self._reasons: Dict[str, int] = {}
+        self.reset_segment()
+
+    @classmethod
+    def from_config(cls, config: Optional[Mapping[str, Any]]) -> Optional["EndpointDetector"]:
+        """根据 asr.endpoint 配置创建检测器，未启用时返回 None"""
+        if not config or not config.get('enabled', False):
+            return None
+        keys = ('initial_silence', 'min_silence', 'max_silence', 'pause_percentile',
+                'pause_margin', 'min_chars', 'max_chars', 'min_pause_samples', 'report_every')
+        return cls(**{k: config[k] for k in keys if k in config})
+
+    def reset_segment(self):
+        """断句后重置当前句子的状态"""
+        self.silence = 0.0  # 尾部连续静音时长
+        self.stable = 0.0  # 识别结果保持不变的时长
+
+    def silence_threshold(self) -> float:
+        """根据说话人句内停顿分布计算静音阈值"""
+        if len(self._pauses) < self.min_pause_samples:
+            threshold = self.initial_silence
+        else:
+            threshold = float(np.percentile(self._pauses, self.pause_percentile)) * self.pause_margin
+        return min(self.max_silence, max(self.min_silence, threshold))
+
+    @staticmethod
+    def final_probability(text: str) -> float:
+        """估计文本在此处结束一句话的概率"""
+        text = text.rstrip()
+        if not text:
+            return 0.0
+        if text[-1] in FINAL_PUNCTUATION:
+            return 1.0
+        stripped = text.rstrip("，,、")
+        if stripped != text:
+            return 0.1
+        if text[-1] in FINAL_PARTICLES:
+            return 0.8
+        if text.endswith(CONTINUATION_ENDINGS):
+            return 0.1
+        return 0.4
+
+    def observe(self, duration: float, voice: bool, text_changed: bool, text: str) -> Optional[str]:
+        """送入一个音频块的观测，返回断句原因，未到断句点时返回 None
+
+        duration: 音频块时长（秒）；voice: VAD 是否判为有声；
+        text_changed: 这一块是否产生了新的识别文本；text: 当前句子尚未输出的文本。
+        """
+        if text_changed:
+            if self.silence > 0:
+                self._pauses.append(self.silence)
+            self.silence = 0.0
+            self.stable = 0.0
+        else:
+            self.stable += duration
+            self.silence = 0.0 if voice else self.silence + duration
+
+        chars = len("".join(text.split()))
+        if chars < self.min_chars or text_changed:
+            return None
+
+        # 越像句末，需要等待的静音越短
+        p_final = self.final_probability(text)
+        threshold = self.silence_threshold() * (1.0 - 0.5 * p_final)
+        reason = None
+        if self.silence >= threshold:
+            reason = 'silence'
+        elif chars >= self.max_chars and self.silence >= self.min_silence:
+            reason = 'length'
+        elif self.stable >= self.max_silence:
+            # 有声音但识别结果长时间不变（背景噪声、音乐等）
+            reason = 'stable'
+        if reason:
+            self._record(reason)
+        return reason
+
+    def _record(self, reason: str):
+        self._delays.append(self.stable)
+        if len(self._delays) > 1000:
+            del self._delays[:len(self._delays) - 1000]
+        self._reasons[reason] = self._reasons.get(reason, 0) + 1
+        self.reset_segment()
+        total = sum(self._reasons.values())
+        if self.report_every and total % self.report_every == 0:
+            print(self.format_report())
+
+    def report(self) -> Dict[str, Any]:
+        """断句延迟分布（秒）与各判定原因的次数"""
+        result: Dict[str, Any] = {
+            'count': len(self._delays),
+            'reasons': dict(self._reasons),
+            'silence_threshold': self.silence_threshold(),
+            'pause_samples': len(self._pauses),
+        }
+        if self._delays:
+            delays = np.asarray(self._delays)
+            result.update({
+                'mean': float(delays.mean()),
+                'p50': float(np.percentile(delays, 50)),
+                'p90': float(np.percentile(delays, 90)),
+                'p99': float(np.percentile(delays, 99)),
+                'max': float(delays.max()),
+            })
+        return result
+
+    def format_report(self) -> str:
+        stats = self.report()
+        if not stats['count']:
+            return "断句延迟统计: 暂无数据"
+        return (f"断句延迟统计({stats['count']}次): 平均 {stats['mean']*1000:.0f}ms, "
+                f"P50 {stats['p50']*1000:.0f}ms, P90 {stats['p90']*1000:.0f}ms, "
+                f"P99 {stats['p99']*1000:.0f}ms, 最大 {stats['max']*1000:.0f}ms; "
+                f"当前静音阈值 {stats['silence_threshold']*1000:.0f}ms, 原因 {stats['reasons']}")
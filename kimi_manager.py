@@ -1,10 +1,17 @@
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, BadRequestError, DefaultAsyncHttpxClient, RateLimitError
+import asyncio
+import concurrent.futures
 import json
 from datetime import datetime
 import time
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 from config_manager import ConfigManager
+from async_runtime import AsyncRuntime
+from conversation_summarizer import ConversationSummarizer
+from answer_budget import SentenceBudget
+from rate_limiter import parse_retry_after, update_limiter
 
 class AIManager:
     # 常量定义
@@ -13,12 +20,26 @@ class AIManager:
         "32k": 32000,
         "128k": 128000
     }
+    # 按上下文大小路由时各档位对应的模型，可在配置 routing.tiers 中覆盖
+    TIER_MODELS = {
+        "8k": "moonshot-v1-8k",
+        "32k": "moonshot-v1-32k",
+        "128k": "moonshot-v1-128k"
+    }
     MAX_HISTORY_TOKENS = 30000  # 设置历史消息的token上限
     DEFAULT_MAX_TOKENS = 1024
     MIN_MAX_TOKENS = 1
     MAX_MAX_TOKENS = 128000  # 128k模型的最大限制
     MIN_RETRY_DELAY = 0.1
     DEFAULT_TIMEOUT = 60.0
+    DEFAULT_MODEL = "moonshot-v1-auto"
+    TEMPERATURE = 0.3
+    STREAM_OPTIONS: Dict[str, Any] = {}  # 流式请求的额外参数
+    # 兼容 OpenAI 接口的服务可以继承本类，只需覆盖下面两个属性和上面的常量
+    CONFIG_SECTION = "kimi"
+    SERVICE_NAME = "Kimi"
+    KEEPALIVE_EXPIRY = 120.0  # 空闲连接保留时间，预热建立的连接才能留给第一个问题
+    WARM_TTL = 30.0  # 预热有效期，到期前重新预热以保持连接
     
     def __init__(self, api_key: Optional[str] = None):
         # 配置日志
@@ -33,23 +54,25 @@ class AIManager:
             self.logger = None
 
         # 获取配置
-        config = ConfigManager().get_service_config('kimi')
+        config = ConfigManager().get_service_config(self.CONFIG_SECTION)
         if not api_key:
             api_key = config['api_key']
         
         try:
-            self.client = OpenAI(
+            # 异步客户端，所有请求都在共享的事件循环线程上执行
+            self.client = AsyncOpenAI(
                 api_key=api_key,
-                base_url=config['base_url']
+                base_url=config['base_url'],
+                max_retries=0,  # 重试（包括 429）统一由下面的重试循环和准入控制处理
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20,
+                                        keepalive_expiry=self.KEEPALIVE_EXPIRY)
+                )
             )
         except Exception as e:
             self.logger.error(f"Failed to initialize OpenAI client: {e}")
             raise RuntimeError("OpenAI client initialization failed")
         
-        self.system_messages = [
-            {"role": "system", "content": config['system_prompt']}
-        ]
-        
         self.messages = []
         
         # 重试相关配置（添加参数验证）
@@ -60,10 +83,134 @@ class AIManager:
         
         # 模型配置
         self._default_max_tokens = self._validate_max_tokens(self.DEFAULT_MAX_TOKENS)
-        self.model = "moonshot-v1-auto"
+        self.model = self.DEFAULT_MODEL
         
         self.current_total_tokens = 0  # 添加token计数器
         self._should_stop = False  # 添加停止标志
+        self._tasks = set()  # 进行中的请求任务，stop() 时取消
+        self.last_usage = None  # 最近一次请求的token用量
+        self._last_prompt_tokens = 0  # 最近一次请求的提示词token估算
+        self.summarizer = None  # 滚动历史摘要，由配置启用
+        self.answer_first = None  # 答案优先截断配置
+        self.last_truncation = None  # 最近一次回复的截断位置
+        self.routing_tiers: List[Tuple[str, str, int]] = []  # (档位, 模型, 上下文上限)，从小到大
+        self.routing_fallback = None
+        self.routing_headroom = 1.0
+        self.last_model = None  # 最近一次请求实际使用的模型
+        self.tier_latency: Dict[str, Dict[str, float]] = {}  # 各档位的请求次数和累计延迟
+        self.limiter = None  # 并发数和请求/token速率限制，由配置 limits 启用
+        self.last_wait = 0.0  # 最近一次请求在准入控制中排队的秒数
+        
+        # 应用可热更新的配置，并在配置文件变化时重新应用
+        self.apply_config(config)
+        ConfigManager().add_reload_listener(self._on_config_reload)
+
+    def apply_config(self, config) -> None:
+        """应用可热更新的配置项（提示词、超时、模型、max_tokens）"""
+        self.system_messages = [
+            {"role": "system", "content": config['system_prompt']}
+        ]
+        self._timeout = max(1.0, float(config.get('timeout', self.DEFAULT_TIMEOUT)))
+        self.model = config.get('model', self.DEFAULT_MODEL)
+        self._default_max_tokens = self._validate_max_tokens(
+            config.get('max_tokens', self.DEFAULT_MAX_TOKENS))
+
+        self._apply_routing(config.get('routing') or {})
+        self.limiter = update_limiter(self.limiter, self.SERVICE_NAME, config.get('limits'))
+
+        # 答案优先：流式生成到前 N 句或字符预算后即停止
+        self.answer_first = config.get('answer_first')
+
+        # 滚动历史摘要
+        summary_config = config.get('summary') or {}
+        if summary_config.get('enabled', False):
+            if self.summarizer is None:
+                self.summarizer = ConversationSummarizer(self)
+            self.summarizer.threshold_tokens = summary_config.get('threshold_tokens', 6000)
+            self.summarizer.keep_turns = max(1, summary_config.get('keep_turns', 3))
+            self.summarizer.max_summary_chars = summary_config.get('max_chars', 400)
+        else:
+            self.summarizer = None
+
+    def _apply_routing(self, routing) -> None:
+        """按上下文大小路由：未启用时所有请求使用 self.model"""
+        self.routing_tiers = []
+        if not routing.get('enabled', False):
+            return
+        tiers = routing.get('tiers')
+        if tiers:
+            tiers = [(t.get('name', t['model']), t['model'], int(t['context'])) for t in tiers]
+        else:
+            tiers = [(name, self.TIER_MODELS[name], limit)
+                     for name, limit in self.TOKEN_LIMITS.items() if name in self.TIER_MODELS]
+        self.routing_tiers = sorted(tiers, key=lambda t: t[2])
+        self.routing_fallback = routing.get('fallback') or self.model
+        self.routing_headroom = max(1.0, float(routing.get('headroom', 1.0)))
+
+    def _route(self, floor: int = 0) -> Tuple[Optional[str], str, int]:
+        """选择能容纳提示词和 max_tokens 的最小档位，返回 (档位, 模型, 档位序号)
+
+        floor 为允许的最小档位序号，某个档位因上下文超限被拒绝后从下一档重新选择；
+        没有档位能容纳时使用 fallback 模型。
+        """
+        if not self.routing_tiers:
+            return None, self.model, 0
+        needed = int((self._last_prompt_tokens + self._default_max_tokens) * self.routing_headroom)
+        for index in range(floor, len(self.routing_tiers)):
+            name, model, context = self.routing_tiers[index]
+            if context >= needed:
+                break
+        else:
+            name, model, index = 'fallback', self.routing_fallback, len(self.routing_tiers)
+        self.logger.info(f"🧭 Routing to {name} ({model}), estimated {needed} tokens")
+        return name, model, index
+
+    @staticmethod
+    def _context_exceeded(error: Exception) -> bool:
+        """服务端是否因为超出模型上下文长度而拒绝请求"""
+        if not isinstance(error, BadRequestError):
+            return False
+        message = str(error).lower()
+        return any(key in message for key in ("token limit", "context length", "context_length", "maximum context"))
+
+    def _record_tier_latency(self, tier: Optional[str], model: str, elapsed: float,
+                             first_token: Optional[float] = None) -> None:
+        """记录并打印所选档位的延迟，用于确认小档位的提速效果"""
+        self.last_model = model
+        if tier is None:
+            return
+        stats = self.tier_latency.setdefault(tier, {'requests': 0, 'total': 0.0})
+        stats['requests'] += 1
+        stats['total'] += elapsed
+        first = f", first token {first_token:.2f}s" if first_token is not None else ""
+        self.logger.info(f"⏱️ Tier {tier} ({model}): {elapsed:.2f}s{first}, "
+                         f"avg {stats['total'] / stats['requests']:.2f}s over {stats['requests']} requests")
+
+    async def _admit(self, tokens: int, start_time: float):
+        """通过准入控制，返回 (限流器, 排队秒数)；总超时内仍未获准时抛出 asyncio.TimeoutError"""
+        limiter = self.limiter
+        if limiter is None:
+            return None, 0.0
+        remaining = max(0.0, self._timeout - (time.time() - start_time))
+        return limiter, await limiter.acquire(tokens, timeout=remaining)
+
+    def _release(self, limiter, tokens: int) -> None:
+        if limiter is not None:
+            limiter.release(tokens, (self.last_usage or {}).get('total_tokens'))
+
+    def _retry_delay_for(self, error: Exception, retry_delay: float) -> float:
+        """429 时遵守 Retry-After：有准入控制时由准入层暂停，否则直接等待"""
+        if not isinstance(error, RateLimitError):
+            return retry_delay
+        retry_after = parse_retry_after(error.response.headers.get('retry-after'))
+        if self.limiter is not None:
+            self.limiter.on_rate_limited(retry_after)
+            return 0.0
+        self.logger.warning(f"🚦 {self.SERVICE_NAME} rate limited (429), Retry-After: {retry_after}")
+        return max(retry_delay, retry_after or 0.0)
+
+    def _on_config_reload(self, config_manager: ConfigManager) -> None:
+        self.apply_config(config_manager.get_service_config(self.CONFIG_SECTION))
 
     @property
     def max_attempts(self) -> int:
@@ -141,7 +288,8 @@ class AIManager:
         # 重建消息列表
         self.messages = system_messages + history_messages
 
-    def make_messages(self, input: str, n: int = 20) -> list[dict]:
+    def make_messages(self, input: str, n: int = 20, context: Optional[str] = None) -> list[dict]:
+        """构建本次请求的消息列表；context 为检索到的背景资料，只随本次请求发送，不进入历史"""
         try:
             # 输入验证
             if not isinstance(input, str) or not input.strip():
@@ -162,8 +310,10 @@ class AIManager:
                 raise ValueError("Invalid message format")
             
             # 构建完整的消息列表（包括新消息）
+            context_messages = self._context_messages(context)
             new_messages = []
             new_messages.extend(self.system_messages)
+            new_messages.extend(context_messages)
             new_messages.extend(self.messages)
             new_messages.append(new_message)
             
@@ -188,11 +338,15 @@ class AIManager:
             # 重新构建最终的消息列表
             final_messages = []
             final_messages.extend(self.system_messages)
-            final_messages.extend(self.messages)
+            final_messages.extend(context_messages)
+            # 历史消息中可能带有截断记录等本地字段，只发送 role 和 content
+            final_messages.extend({"role": msg["role"], "content": msg["content"]}
+                                  for msg in self.messages)
             
             # 记录最终的token使用情况
             final_tokens = self.estimate_tokens(final_messages)
             self.logger.info(f"📊 Final conversation tokens: {final_tokens}")
+            self._last_prompt_tokens = final_tokens
             
             # 记录消息内容
             self._log_messages(final_messages)
@@ -204,10 +358,16 @@ class AIManager:
             # 返回最小可用的消息列表
             return self.system_messages + [new_message]
 
+    @staticmethod
+    def _context_messages(context: Optional[str]) -> List[Dict[str, str]]:
+        if not context:
+            return []
+        return [{"role": "system", "content": f"候选人背景资料（与当前问题相关的片段）：\n{context}"}]
+
     def _log_messages(self, messages: List[Dict[str, str]]) -> None:
         """安全地记录消息"""
         try:
-            self.logger.info("\n📤 Sending context to Kimi:")
+            self.logger.info(f"\n📤 Sending context to {self.SERVICE_NAME}:")
             for idx, msg in enumerate(messages):
                 if not self._validate_message(msg):
                     continue
@@ -227,95 +387,269 @@ class AIManager:
             self.logger.error(f"Message logging failed: {e}")
 
     def stop(self):
-        """停止所有操作"""
+        """停止所有操作，并取消进行中的请求"""
         self._should_stop = True
+        AsyncRuntime().cancel(self._tasks)
         
     def reset(self):
         """重置停止标志"""
         self._should_stop = False
 
-    def chat(self, input: str) -> str:
+    def reset_conversation(self):
+        """开始新的对话：清空历史、token计数和摘要状态"""
+        self.reset()
+        self.messages = []
+        self.current_total_tokens = 0
+        self._last_prompt_tokens = 0
+        self.last_usage = None
+        self.last_truncation = None
+        if self.summarizer:
+            self.summarizer.reset()
+
+    def _track_current_task(self):
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _record_usage(self, usage) -> None:
+        """记录并打印token用量，usage 可以是SDK对象或字典"""
+        if not usage:
+            return
+        if isinstance(usage, dict):
+            usage = {key: usage.get(key, 0) for key in ('prompt_tokens', 'completion_tokens', 'total_tokens')}
+        else:
+            usage = {
+                'prompt_tokens': usage.prompt_tokens,
+                'completion_tokens': usage.completion_tokens,
+                'total_tokens': usage.total_tokens,
+            }
+        self.last_usage = usage
+        self.current_total_tokens += usage['completion_tokens']
+        self.logger.info(f"📊 Updated total tokens: {self.current_total_tokens}")
+        self.logger.info(
+            f"📊 Token usage - Prompt: {usage['prompt_tokens']}, "
+            f"Completion: {usage['completion_tokens']}, "
+            f"Total: {usage['total_tokens']}"
+        )
+
+    def _record_answer(self, content: str, attempt: int, start_time: float,
+                       truncation: Optional[Dict[str, Any]] = None) -> None:
+        """把回复加入历史并打印，提前截断的回复会在历史中记录截断位置"""
+        assistant_message = {
+            "role": "assistant",
+            "content": content
+        }
+        self.last_truncation = truncation
+        if truncation:
+            assistant_message["truncated"] = truncation
+            self.logger.info(f"✂️ 答案优先截断: {truncation}")
+        if self._validate_message(assistant_message):
+            self.messages.append(assistant_message)
+
+        elapsed_time = time.time() - start_time
+        if self.summarizer:
+            self.summarizer.record_turn(self._last_prompt_tokens, elapsed_time)
+            # 历史过长时在后台压缩较早的轮次，不阻塞本次返回
+            self.summarizer.maybe_schedule()
+        self.logger.info(f"\n📥 {self.SERVICE_NAME}'s Response (attempt {attempt}, time: {elapsed_time:.2f}s):")
+        self.logger.info(f"     {content}")
+        self.logger.info("="*80 + "\n")
+
+    def _failure_message(self, attempt: int, last_error) -> str:
+        error_msg = f"{self.SERVICE_NAME} 响应失败 (尝试 {attempt} 次): {str(last_error)}"
+        self.logger.error(f"\n❌ Error: {error_msg}")
+        self.logger.error("="*80 + "\n")
+        return error_msg
+
+    async def _wait_before_retry(self, attempt: int, retry_delay: float, start_time: float, error) -> bool:
+        """记录失败并等待重试，返回是否应该继续重试"""
+        elapsed_time = time.time() - start_time
+        if elapsed_time >= self._timeout:
+            self.logger.error(f"\n❌ 总尝试时间超过 {self._timeout} 秒，停止重试")
+            return False
+
+        self.logger.warning(f"\n⚠️ 第 {attempt} 次尝试失败: {str(error)}")
+        if attempt < self._max_attempts and not self._should_stop:
+            self.logger.info(f"📡 等待 {retry_delay:.1f} 秒后重试...")
+            # 可被 stop() 取消的等待
+            await asyncio.sleep(retry_delay)
+        return True
+
+    async def achat(self, input: str, context: Optional[str] = None) -> str:
+        """异步对话接口，返回完整回复"""
+        self._track_current_task()
+        budget = SentenceBudget.from_config(self.answer_first)
+        if budget is not None:
+            return await self._achat_answer_first(input, budget, context)
         start_time = time.time()
         attempt = 0
         retry_delay = self._initial_retry_delay
         last_error = None
         self._should_stop = False  # 重置停止标志
+        self.last_usage = None
 
         try:
-            messages = self.make_messages(input)
+            messages = self.make_messages(input, context=context)
         except Exception as e:
             return f"消息准备失败: {str(e)}"
 
+        floor = 0
         while attempt < self._max_attempts and not self._should_stop:  # 添加停止条件
             attempt += 1
+            tier, model, tier_index = self._route(floor)
+            estimated = self._last_prompt_tokens + self._default_max_tokens
             try:
-                completion = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=0.3,
-                    max_tokens=self._default_max_tokens
-                )
-                
-                # 更新token计数
-                if hasattr(completion, 'usage'):
-                    new_tokens = completion.usage.total_tokens
-                    self.current_total_tokens += completion.usage.completion_tokens
-                    self.logger.info(f"📊 Updated total tokens: {self.current_total_tokens}")
-                
+                limiter, self.last_wait = await self._admit(estimated, start_time)
+                request_start = time.time()
                 try:
-                    # 获取使用信息
-                    used_model = getattr(completion, 'model', 'unknown')
-                    usage = getattr(completion, 'usage', None)
-                    
-                    if usage:
-                        self.logger.info(
-                            f"📊 Token usage - Prompt: {usage.prompt_tokens}, "
-                            f"Completion: {usage.completion_tokens}, "
-                            f"Total: {usage.total_tokens}"
-                        )
-                    self.logger.info(f"🤖 Selected model: {used_model}")
-                except Exception as e:
-                    self.logger.warning(f"Failed to log usage information: {e}")
+                    completion = await self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=self.TEMPERATURE,
+                        max_tokens=self._default_max_tokens,
+                        timeout=self._timeout
+                    )
+                    self._record_usage(getattr(completion, 'usage', None))
+                finally:
+                    self._release(limiter, estimated)
+                
+                self.logger.info(f"🤖 Selected model: {getattr(completion, 'model', 'unknown')}")
                 
                 # 验证响应格式
                 if not completion.choices or not completion.choices[0].message:
                     raise ValueError("Invalid response format from API")
                 
-                assistant_message = {
-                    "role": "assistant",
-                    "content": completion.choices[0].message.content
-                }
-                
-                if self._validate_message(assistant_message):
-                    self.messages.append(assistant_message)
-                
-                elapsed_time = time.time() - start_time
-                self.logger.info(f"\n📥 Kimi's Response (attempt {attempt}, time: {elapsed_time:.2f}s):")
-                self.logger.info(f"     {assistant_message['content']}")
-                self.logger.info("="*80 + "\n")
-                
-                return assistant_message['content']
+                content = completion.choices[0].message.content
+                self._record_tier_latency(tier, model, time.time() - request_start)
+                self._record_answer(content, attempt, start_time)
+                return content
 
+            except asyncio.CancelledError:
+                self.logger.info("Request cancelled due to exit request")
+                raise
             except Exception as e:
                 if self._should_stop:  # 检查是否需要立即停止
                     self.logger.info("Stopping retry loop due to exit request")
                     return "操作已取消"
-                    
                 last_error = e
-                elapsed_time = time.time() - start_time
-                
-                if elapsed_time >= self._timeout:
-                    self.logger.error(f"\n❌ 总尝试时间超过 {self._timeout} 秒，停止重试")
+                if tier is not None and tier_index < len(self.routing_tiers) and self._context_exceeded(e):
+                    # 估算偏小导致档位上下文不够，立即换下一档重试
+                    self.logger.warning(f"⚠️ {tier} ({model}) context exceeded, escalating")
+                    floor = tier_index + 1
+                    continue
+                retry_delay_used = self._retry_delay_for(e, retry_delay)
+                retry_delay = min(retry_delay * 2, self._max_retry_delay)
+                if not await self._wait_before_retry(attempt, retry_delay_used, start_time, e):
                     break
-                
-                self.logger.warning(f"\n⚠️ 第 {attempt} 次尝试失败: {str(e)}")
-                
-                if attempt < self._max_attempts and not self._should_stop:  # 添加停止条件
-                    self.logger.info(f"📡 等待 {retry_delay:.1f} 秒后重试...")
-                    time.sleep(retry_delay)
-                    retry_delay = min(retry_delay * 2, self._max_retry_delay)
         
-        error_msg = f"AI 响应失败 (尝试 {attempt} 次): {str(last_error)}"
-        self.logger.error(f"\n❌ Error: {error_msg}")
-        self.logger.error("="*80 + "\n")
-        return error_msg 
\ No newline at end of file
+        return self._failure_message(attempt, last_error)
+
+    async def _achat_answer_first(self, input: str, budget: SentenceBudget,
+                                  context: Optional[str] = None) -> str:
+        """流式请求并在达到预算时关闭流，返回截断后的回复"""
+        try:
+            return "".join([delta async for delta in self.astream(input, budget=budget, context=context)])
+        except asyncio.CancelledError:
+            raise
+        except RuntimeError as e:
+            return str(e)
+        except Exception as e:
+            return f"{self.SERVICE_NAME} 响应失败: {str(e)}"
+
+    async def astream(self, input: str, budget: Optional[SentenceBudget] = None,
+                      context: Optional[str] = None) -> AsyncIterator[str]:
+        """异步流式对话接口，逐段产出回复文本；只在收到第一段之前重试
+
+        传入 budget 时，达到句子数或字符预算后立即关闭流，历史中记录截断位置。
+        """
+        self._track_current_task()
+        self.last_truncation = None
+        start_time = time.time()
+        attempt = 0
+        retry_delay = self._initial_retry_delay
+        last_error = None
+        self._should_stop = False
+        self.last_usage = None
+
+        messages = self.make_messages(input, context=context)
+        floor = 0
+        while attempt < self._max_attempts and not self._should_stop:
+            attempt += 1
+            parts = []
+            tier, model, tier_index = self._route(floor)
+            estimated = self._last_prompt_tokens + self._default_max_tokens
+            first_token = None
+            try:
+                limiter, self.last_wait = await self._admit(estimated, start_time)
+                request_start = time.time()
+                try:
+                    stream = await self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=self.TEMPERATURE,
+                        max_tokens=self._default_max_tokens,
+                        timeout=self._timeout,
+                        stream=True,
+                        **self.STREAM_OPTIONS
+                    )
+                    async with stream:
+                        async for chunk in stream:
+                            usage = getattr(chunk, 'usage', None)
+                            if usage is None and chunk.choices:
+                                # Moonshot 把用量放在最后一个 choice 里
+                                usage = getattr(chunk.choices[0], 'usage', None)
+                            if usage:
+                                self._record_usage(usage)
+                            if not chunk.choices:
+                                continue
+                            delta = chunk.choices[0].delta.content
+                            if delta and budget is not None:
+                                delta, _ = budget.feed(delta)
+                            if delta:
+                                if first_token is None:
+                                    first_token = time.time() - request_start
+                                parts.append(delta)
+                                yield delta
+                            if budget is not None and budget.done:
+                                # 退出 async with 时关闭连接，服务端停止生成
+                                break
+                finally:
+                    # 流结束（包括提前截断和出错）时释放并发名额
+                    self._release(limiter, estimated)
+                self._record_tier_latency(tier, model, time.time() - request_start, first_token)
+                self._record_answer("".join(parts), attempt, start_time,
+                                    budget.truncation if budget is not None else None)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if parts:
+                    # 已经产出部分内容，不能再重试
+                    self._record_answer("".join(parts), attempt, start_time)
+                    raise
+                if self._should_stop:
+                    return
+                last_error = e
+                if tier is not None and tier_index < len(self.routing_tiers) and self._context_exceeded(e):
+                    self.logger.warning(f"⚠️ {tier} ({model}) context exceeded, escalating")
+                    floor = tier_index + 1
+                    continue
+                retry_delay_used = self._retry_delay_for(e, retry_delay)
+                retry_delay = min(retry_delay * 2, self._max_retry_delay)
+                if not await self._wait_before_retry(attempt, retry_delay_used, start_time, e):
+                    break
+        if last_error is not None:
+            raise RuntimeError(self._failure_message(attempt, last_error))
+
+    async def warm(self) -> bool:
+        """预热：完成 DNS 解析和 TLS 握手，连接留在连接池中供后续请求复用"""
+        await self.client.models.list(timeout=self._timeout)
+        return True
+
+    def chat(self, input: str, context: Optional[str] = None) -> str:
+        """同步对话接口，在共享事件循环上运行 achat"""
+        try:
+            return AsyncRuntime().run(self.achat(input, context))
+        except (asyncio.CancelledError, concurrent.futures.CancelledError):
+            return "操作已取消"
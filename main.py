@@ -3,9 +3,21 @@ from tkinter import scrolledtext, ttk
 import threading
 from asr_manager import ASRManager
 from audio_capture import SystemAudioCapture
+from noise_suppressor import NoiseSuppressor
 from ai_service_manager import AIServiceManager
+from config_manager import ConfigManager
+from ui_renderer import UIRenderer
+from audio_recorder import AudioRecorder
+from session_journal import SessionJournal
+from async_runtime import AsyncRuntime
+from thread_budget import ThreadBudget
+from question_filter import QuestionFilter
+from pipeline_profiler import PipelineProfiler
+from provider_warmup import ProviderWarmup
+from notes_index import NotesIndex
 import queue
 import time
+from collections import deque
 
 class ASRApp:
     def __init__(self, root):
@@ -15,26 +27,107 @@ class ASRApp:
         # 添加窗体关闭事件处理
         root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+        # 配置只加载一次，修改配置文件后自动热更新AI服务的提示词、超时和模型
+        ConfigManager().start_watching()
+        
+        # 线程预算需要在加载模型之前生效
+        ThreadBudget().apply_process()
+        
         # 初始化组件
         self.asr_manager = ASRManager()
-        self.audio_capture = SystemAudioCapture()
+        self.audio_capture = SystemAudioCapture(denoiser=NoiseSuppressor.from_config(
+            ConfigManager().get_optional_config('asr').get('denoise')))
         self.ai_service_manager = AIServiceManager()
         self.is_paused = False  # 添加暂停标志位
         
+        # 可选的滚动录音器
+        self.recorder = None
+        recorder_config = ConfigManager().get_optional_config('recorder')
+        if recorder_config.get('enabled', False):
+            self.recorder = AudioRecorder(
+                path=recorder_config.get('path', 'recordings/ring.f32'),
+                minutes=recorder_config.get('minutes', 10),
+                rate=self.audio_capture.rate
+            )
+            self.asr_manager.set_recorder(self.recorder)
+        
+        # 会话日志：记录识别文本和AI回复，后台批量写入
+        self.journal = None
+        journal_config = ConfigManager().get_optional_config('journal')
+        if journal_config.get('enabled', False):
+            self.journal = SessionJournal(
+                path=journal_config.get('path', 'journal/sessions.jsonl'),
+                fsync_interval=journal_config.get('fsync_interval', 5.0)
+            )
+        self.session_id = SessionJournal.new_session_id()
+        
+        # 问题检测：只把面试官的问题发给AI服务，寒暄、噪声和自己的回答不发送
+        self.question_filter = QuestionFilter.from_config(ConfigManager().get_optional_config('question_filter'))
+        
+        # 按需启用的性能采样：F9、配置中的 profiler.enabled 或本机控制接口
+        profiler_config = ConfigManager().get_optional_config('profiler')
+        self.profiler = PipelineProfiler.from_config(profiler_config)
+        self._profiler_flag = bool(profiler_config.get('enabled', False))
+        if self._profiler_flag:
+            self.profiler.start()
+        if profiler_config.get('http_port'):
+            self.profiler.serve(profiler_config['http_port'])
+        root.bind(profiler_config.get('hotkey', '<F9>'), lambda event: self.profiler.toggle())
+        ConfigManager().add_reload_listener(self._on_config_reload)
+        
+        # 简历和笔记的本地检索索引：每个问题只注入相关的片段，不再把全部资料塞进 system_prompt
+        self.notes_index = None
+        notes_config = ConfigManager().get_optional_config('notes')
+        if notes_config.get('enabled', False):
+            threading.Thread(target=self._load_notes_index, args=(notes_config,), daemon=True).start()
+        
+        # 后台预热AI服务的连接和会话，减少第一个问题的等待
+        self.warmup = ProviderWarmup.from_config(self.ai_service_manager,
+                                                 ConfigManager().get_optional_config('warmup'))
+        
         # 设置回调链
         self.asr_manager.set_result_callback(self.handle_result)
+        self.asr_manager.set_partial_callback(self.handle_partial)
         self.asr_manager.set_silence_callback(self.asr_manager.handle_silence)  # 设置空白检测回调
         self.audio_capture.set_callback(self.asr_manager.process_audio)
         self.audio_capture.set_silence_callback(self.asr_manager.handle_silence)  # 设置空白检测回调
+        self.audio_capture.set_quiet_callback(self.asr_manager.process_silence)  # 静音块用于自适应断句
+        
+        # 文本渲染层：批量、限长地在Tk线程中刷新文本框
+        ui_config = ConfigManager().get_optional_config('ui')
+        self.renderer = UIRenderer(
+            root,
+            fps=ui_config.get('render_fps', UIRenderer.DEFAULT_FPS),
+            max_lines=ui_config.get('max_lines', UIRenderer.DEFAULT_MAX_LINES),
+            max_chars=ui_config.get('max_chars', UIRenderer.DEFAULT_MAX_CHARS),
+            session_log_dir=ui_config.get('session_log_dir', 'logs')
+        )
+        # 实时行：尚未断句的识别文本原地显示，并统计从音频到首字可见的延迟
+        self.live_partials = ui_config.get('live_partials', True)
+        self._live_text = ""
+        self.first_text_latency = deque(maxlen=1000)
+        self.renderer.live_latency_callback = self._on_live_latency
         
         # 创建UI组件
         self._init_ui()
+        self.renderer.start()
+        ThreadBudget().enter_stage('ui')
+        
+        # AI服务列表随配置变化时同步界面
+        self.ai_service_manager.add_change_listener(lambda: self.root.after(0, self._sync_services))
+        # 后台预先加载默认启用的AI服务，未启用的服务在勾选时才加载
+        threading.Thread(target=self._load_checked_services, daemon=True).start()
+        if self.warmup:
+            self._refresh_warmup_status()
         
         # 音频采集线程
         self.capture_thread = None
         
-        self.ai_queue = queue.Queue()  # 添加AI处理队列
-        self.ai_thread = threading.Thread(target=self._process_ai_responses)
+        # AI处理队列有上限，积压时丢弃最旧的任务（反正会因超时被丢弃）
+        dispatch_config = ConfigManager().get_optional_config('dispatch')
+        self.ai_queue = queue.Queue(maxsize=dispatch_config.get('queue_size', 16))
+        self.dropped_tasks = 0
+        self.ai_thread = threading.Thread(target=self._process_ai_responses, name="ai-worker")
         self.ai_thread.daemon = True
         self.ai_thread.start()
     
@@ -50,6 +143,8 @@ class ASRApp:
         # 左侧文本显示区域
         self.text_area = scrolledtext.ScrolledText(self.left_frame, width=60, height=20, wrap=tk.WORD)
         self.text_area.pack(expand=True, fill='both')
+        self.renderer.register('transcript', self.text_area)
+        self.text_area.tag_configure(UIRenderer.LIVE_TAG, foreground='gray')
         
         # 创建按钮框架，放在左侧面板底部
         self.button_frame = tk.Frame(self.left_frame)
@@ -75,53 +170,168 @@ class ASRApp:
         self.ai_select_frame = tk.Frame(self.right_frame)
         self.ai_select_frame.pack(side=tk.BOTTOM, pady=5)
         
-        # 创建AI服务复选框
-        self.ai_checkboxes = {}
-        self.ai_vars = {}
-        for service_name in self.ai_service_manager.get_available_services():
-            var = tk.BooleanVar(value=True)  # 默认选中
-            self.ai_vars[service_name] = var
-            cb = tk.Checkbutton(self.ai_select_frame, text=service_name, variable=var)
-            cb.pack(side=tk.LEFT, padx=5)
-            self.ai_checkboxes[service_name] = cb
-        
         # 创建AI服务文本区域容器
         self.ai_container = tk.Frame(self.right_frame)
         self.ai_container.pack(expand=True, fill='both')
         
-        # 为每个AI服务创建一个带标题的文本区域
+        # 为每个AI服务创建复选框和带标题的文本区域
+        self.ai_checkboxes = {}
+        self.ai_vars = {}
+        self.ai_service_frames = {}
         self.ai_text_areas = {}
+        self.ai_title_labels = {}
         for service_name in self.ai_service_manager.get_available_services():
-            # 为每个服务创建一个Frame
-            service_frame = tk.Frame(self.ai_container)
-            service_frame.pack(expand=True, fill='both', pady=(0, 10))
-            
-            # 添加标题标签
-            title_label = tk.Label(service_frame, text=service_name, font=('Arial', 10, 'bold'))
-            title_label.pack(anchor='w', padx=5, pady=(5, 0))
-            
-            # 创建文本区域
-            text_area = scrolledtext.ScrolledText(service_frame, height=10, wrap=tk.WORD)
-            text_area.pack(expand=True, fill='both')
-            self.ai_text_areas[service_name] = text_area
+            self._add_service_widgets(service_name)
+    
+    def _add_service_widgets(self, service_name):
+        """为一个AI服务创建复选框和文本区域"""
+        var = tk.BooleanVar(value=self.ai_service_manager.is_enabled(service_name))
+        self.ai_vars[service_name] = var
+        cb = tk.Checkbutton(self.ai_select_frame, text=service_name, variable=var,
+                            command=lambda: self._on_service_toggled(service_name))
+        cb.pack(side=tk.LEFT, padx=5)
+        self.ai_checkboxes[service_name] = cb
+        
+        # 为每个服务创建一个Frame
+        service_frame = tk.Frame(self.ai_container)
+        service_frame.pack(expand=True, fill='both', pady=(0, 10))
+        self.ai_service_frames[service_name] = service_frame
+        
+        # 添加标题标签
+        title_label = tk.Label(service_frame, text=service_name, font=('Arial', 10, 'bold'))
+        title_label.pack(anchor='w', padx=5, pady=(5, 0))
+        self.ai_title_labels[service_name] = title_label
+        
+        # 创建文本区域
+        text_area = scrolledtext.ScrolledText(service_frame, height=10, wrap=tk.WORD)
+        text_area.pack(expand=True, fill='both')
+        self.ai_text_areas[service_name] = text_area
+        self.renderer.register(service_name, text_area, scroll_to="1.0")
+    
+    def _remove_service_widgets(self, service_name):
+        """移除一个AI服务的复选框和文本区域"""
+        self.ai_vars.pop(service_name, None)
+        self.ai_text_areas.pop(service_name, None)
+        self.ai_title_labels.pop(service_name, None)
+        self.renderer.unregister(service_name)
+        cb = self.ai_checkboxes.pop(service_name, None)
+        if cb:
+            cb.destroy()
+        frame = self.ai_service_frames.pop(service_name, None)
+        if frame:
+            frame.destroy()
+    
+    def _sync_services(self):
+        """在主线程中按注册表增删AI服务的界面组件"""
+        available = self.ai_service_manager.get_available_services()
+        for service_name in list(self.ai_vars.keys()):
+            if service_name not in available:
+                self._remove_service_widgets(service_name)
+        for service_name in available:
+            if service_name not in self.ai_vars:
+                self._add_service_widgets(service_name)
+                if self.ai_vars[service_name].get():
+                    self._on_service_toggled(service_name)
     
-    def handle_result(self, text: str):
-        """处理识别结果"""
+    def _on_service_toggled(self, service_name):
+        """勾选AI服务时在后台导入并构造该服务"""
+        var = self.ai_vars.get(service_name)
+        if var is not None and var.get():
+            threading.Thread(target=self.ai_service_manager.enable, args=(service_name,),
+                             daemon=True).start()
+    
+    def _on_config_reload(self, config_manager):
+        """配置中的 profiler.enabled 从 false 改为 true 时开始一次采样"""
+        enabled = bool(config_manager.get_optional_config('profiler').get('enabled', False))
+        if enabled and not self._profiler_flag:
+            self.profiler.start()
+        self._profiler_flag = enabled
+    
+    def _refresh_warmup_status(self):
+        """在服务标题后显示预热状态"""
+        for service_name, label in self.ai_title_labels.items():
+            status = self.warmup.status_text(service_name)
+            label.config(text=f"{service_name}（{status}）" if status else service_name)
+        self.root.after(1000, self._refresh_warmup_status)
+    
+    def _load_notes_index(self, notes_config):
+        try:
+            self.notes_index = NotesIndex.from_config(notes_config)
+        except Exception as e:
+            print(f"加载笔记索引出错: {e}")
+    
+    def _load_checked_services(self):
+        for service_name in self.ai_service_manager.get_available_services():
+            if self.ai_service_manager.is_enabled(service_name):
+                self.ai_service_manager.enable(service_name)
+    
+    def handle_partial(self, text: str, audio_time: float):
+        """在文本框末尾实时显示尚未断句的识别文本"""
+        if self.is_paused or not self.live_partials:
+            return
+        # 每句只统计第一段文本从送入识别到显示的延迟
+        first = bool(text) and not self._live_text
+        self._live_text = text
+        self.renderer.set_live('transcript', text, since=audio_time if first else None)
+    
+    def _on_live_latency(self, name, latency):
+        """渲染层在首字显示后回调（Tk线程）"""
+        self.first_text_latency.append(latency)
+        print(f"首字可见延迟: {latency*1000:.0f}ms")
+        if self.journal:
+            self.journal.record('latency', self.session_id, stage='first_text', seconds=round(latency, 4))
+    
+    def _format_latency_stats(self) -> str:
+        latencies = sorted(self.first_text_latency)
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return (f"首字可见延迟: {len(latencies)} 句，P50 {p50*1000:.0f}ms，"
+                f"P95 {p95*1000:.0f}ms，最大 {latencies[-1]*1000:.0f}ms")
+    
+    def handle_result(self, text: str, label: str = ''):
+        """处理识别结果，label 为断句原因；手动强制生成（force）的文本不经过问题检测"""
         if self.is_paused:  # 如果暂停状态，直接返回
             return
             
-        self.text_area.insert(tk.END, text + "\n")
-        self.text_area.see(tk.END)
+        # 可能在ASR线程中调用，交给渲染层在Tk线程中刷新
+        self.renderer.append('transcript', text + "\n")
+        if self.journal:
+            self.journal.record_transcript(self.session_id, text)
+        
+        if self.question_filter and label != 'force':
+            fanout = sum(1 for var in list(self.ai_vars.values()) if var.get())
+            question, score, action = self.question_filter.submit(text, fanout=fanout)
+            print(f"问题检测: {action} ({score:.2f}) {text}")
+            if self.journal:
+                self.journal.record('filter', self.session_id, text=text, score=round(score, 3), action=action)
+            if question is None:
+                return
+            text = question
         
         # 将AI处理任务放入队列
         task = {
             'text': text,
             'timestamp': time.time()
         }
-        self.ai_queue.put(task)
+        self._enqueue_task(task)
+    
+    def _enqueue_task(self, task):
+        """放入AI队列，队列满时丢弃最旧的任务"""
+        while True:
+            try:
+                self.ai_queue.put_nowait(task)
+                return
+            except queue.Full:
+                try:
+                    dropped = self.ai_queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self.dropped_tasks += 1
+                print(f"AI队列已满，丢弃最旧的任务: {dropped['text']}")
     
     def _process_ai_responses(self):
         """在单独的线程中处理AI响应"""
+        ThreadBudget().enter_stage('ai')
         while True:
             try:
                 task = self.ai_queue.get()
@@ -132,25 +342,40 @@ class ASRApp:
                 
                 # 处理未超时的任务
                 text = task['text']
+                # 所有服务共用同一次检索结果
+                context = None
+                if self.notes_index:
+                    context = self.notes_index.context_for(text)
+                    print(f"笔记检索耗时: {self.notes_index.last_latency*1000:.2f}ms，"
+                          f"注入 {len(context) if context else 0} 字")
                 # 对所有选中的AI服务进行处理
-                for service_name, var in self.ai_vars.items():
+                for service_name, var in list(self.ai_vars.items()):
                     if var.get():  # 如果该服务被选中
                         ai_service = self.ai_service_manager.get_service(service_name)
-                        ai_response = ai_service.chat(text)
+                        if ai_service is None:
+                            continue
+                        request_start = time.time()
+                        ai_response = ai_service.chat(text, context=context)
+                        if self.journal:
+                            self.journal.record_response(
+                                self.session_id, service_name, text, ai_response,
+                                latency=time.time() - request_start,
+                                usage=getattr(ai_service, 'last_usage', None),
+                                truncation=getattr(ai_service, 'last_truncation', None),
+                                model=getattr(ai_service, 'last_model', None),
+                                wait=getattr(ai_service, 'last_wait', None)
+                            )
                         
-                        # 使用after方法在主线程中更新UI
-                        self.root.after(0, self._update_ai_text, service_name, ai_response)
+                        # 由渲染层在主线程中更新UI
+                        self._update_ai_text(service_name, ai_response)
             except queue.Empty:
                 continue
             except Exception as e:
                 print(f"处理AI响应时出错: {e}")
 
     def _update_ai_text(self, service_name, ai_response):
-        """在主线程中更新AI文本框"""
-        text_area = self.ai_text_areas[service_name]
-        text_area.delete(1.0, tk.END)
-        text_area.insert(tk.END, f"{ai_response}\n")
-        text_area.see("1.0")
+        """更新AI文本框，实际刷新在主线程中按帧进行"""
+        self.renderer.replace(service_name, f"{ai_response}\n")
     
     def start_recognition(self):
         self.start_button.config(state=tk.DISABLED)
@@ -160,13 +385,23 @@ class ASRApp:
         # 启动ASR管理器
         self.asr_manager.start()
         
+        # 只在识别进行中预热，启动后立即检查一次，过期的连接在第一个问题之前补上
+        if self.warmup:
+            self.warmup.start()
+        
         # 启动音频采集
-        self.capture_thread = threading.Thread(target=self.audio_capture.start)
+        self.capture_thread = threading.Thread(target=self.audio_capture.start, name="audio-capture")
         self.capture_thread.start()
     
     def pause_recognition(self):
         self.is_paused = not self.is_paused  # 切换暂停状态
         self.stop_button.config(text="继续" if self.is_paused else "暂停")
+        # 暂停期间不再续期预热，避免空闲时持续占用服务配额
+        if self.warmup:
+            if self.is_paused:
+                self.warmup.stop()
+            else:
+                self.warmup.start()
     
     def on_closing(self):
         """窗体关闭时的处理函数"""
@@ -178,25 +413,49 @@ class ASRApp:
         if self.asr_manager:
             self.asr_manager.stop()
         
+        if self.question_filter:
+            print(self.question_filter.format_stats())
+        if self.first_text_latency:
+            print(self._format_latency_stats())
+        
         # 停止所有 AI 服务
-        for service_name in self.ai_service_manager.get_available_services():
-            service = self.ai_service_manager.get_service(service_name)
+        for service in self.ai_service_manager.get_active_services().values():
             if hasattr(service, 'stop'):
                 service.stop()
+            if getattr(service, 'limiter', None):
+                print(service.limiter.format_stats())
+            
+        self.profiler.shutdown()
+        if self.warmup:
+            self.warmup.stop()
+        
+        # 取消事件循环上剩余的请求并停止事件循环
+        AsyncRuntime().shutdown()
             
         # 等待音频采集线程结束
         if self.capture_thread and self.capture_thread.is_alive():
             self.capture_thread.join(timeout=2.0)  # 等待最多2秒
         
+        # 录音落盘
+        if self.recorder:
+            self.recorder.close()
+        
+        ConfigManager().stop_watching()
+        
+        # 写完会话日志
+        if self.journal:
+            self.journal.close()
+        
+        # 停止界面刷新并关闭会话日志
+        self.renderer.stop()
+        
         # 关闭窗口
         self.root.destroy()
         self.root.quit()
 
     def clear_text(self):
-        self.text_area.delete(1.0, tk.END)
-        # 清空所有AI对话框
-        for text_area in self.ai_text_areas.values():
-            text_area.delete(1.0, tk.END)
+        # 清空识别结果和所有AI对话框
+        self.renderer.clear()
 
     def force_generate(self):
         """强制生成当前文本"""
@@ -0,0 +1,174 @@
+import math
+import time
+from typing import Any, Mapping, Optional
+
+import numpy as np
+
+NOISE_BIAS = 1.5  # 低分位数估计的噪声功率偏低，乘以该系数近似噪声均值
+
+
+class NoiseSuppressor:
+    """流式谱门限降噪
+
+    按 50% 重叠的 sqrt-Hann 窗做短时傅里叶变换，一个音频块内的所有帧一次性完成 FFT、增益
+    计算和逆变换，再重叠相加输出，块与块之间保留窗口尾部，输出在块边界上连续。噪声谱取每块
+    各频点功率（相邻频点平滑后）的低分位数，噪声变小时立即跟随，变大时按 adapt_seconds 缓慢
+    上升，说话时不会被语音抬高。增益为谱减形式并限制在 floor_db 以上，再做频率平滑和一帧的
+    释放保持，减少音乐噪声和字头被削。
+
+    输出比输入延迟 latency 个样本（一帧减一个样本），输出长度总与输入相同。
+    """
+    def __init__(self, rate: int = 16000, frame_ms: float = 20.0, threshold: float = 4.0,
+                 floor_db: float = -20.0, adapt_seconds: float = 2.0, percentile: float = 0.2,
+                 release: float = 0.5, max_input_frames: int = 0):
+        self.rate = int(rate)
+        self.hop = max(16, int(rate * frame_ms / 1000) // 2)
+        self.frame = self.hop * 2
+        self.bins = self.frame // 2 + 1
+        self.threshold = threshold
+        self.floor = 10 ** (floor_db / 20)
+        self.adapt_seconds = adapt_seconds
+        self.percentile = percentile
+        self.release = release
+        self.latency = self.frame - 1
+        # 周期 Hann 窗开方，分析和合成各乘一次，50% 重叠时平方和恒为 1
+        k = np.arange(self.frame)
+        self.window = np.sqrt(0.5 - 0.5 * np.cos(2 * np.pi * k / self.frame))
+
+        self.noise: Optional[np.ndarray] = None
+        # 统计：处理的音频时长和耗时，用于估计每秒音频的开销
+        self.audio_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+        self._capacity = 0
+        self._in_len = self._out_len = 0
+        self._in = np.zeros(0, dtype=np.float64)
+        self._out = np.zeros(0, dtype=np.float32)
+        self._ola = np.zeros(self.frame, dtype=np.float64)
+        self._reserve(max_input_frames or self.rate)
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config: Optional[Mapping[str, Any]], rate: int = 16000) -> Optional["NoiseSuppressor"]:
+        """根据 asr.denoise 配置创建，未启用时返回 None"""
+        if not config or not config.get('enabled', False):
+            return None
+        keys = ('frame_ms', 'threshold', 'floor_db', 'adapt_seconds', 'percentile', 'release')
+        return cls(rate, **{k: config[k] for k in keys if k in config})
+
+    def _reserve(self, samples: int):
+        """按单次输入的最大样本数预分配缓冲区，遇到更大的输入块时才扩容"""
+        if samples <= self._capacity:
+            return
+        frames = samples // self.hop + 2
+        in_buf = np.zeros(self.frame + samples, dtype=np.float64)
+        in_buf[:self._in_len] = self._in[:self._in_len]
+        out_buf = np.zeros(self.hop + samples + self.frame, dtype=np.float32)
+        out_buf[:self._out_len] = self._out[:self._out_len]
+        ola = np.zeros((frames + 2) * self.hop, dtype=np.float64)
+        ola[:self.frame - self.hop] = self._ola[:self.frame - self.hop]
+        self._in, self._out, self._ola = in_buf, out_buf, ola
+        self._frames = np.empty((frames, self.frame), dtype=np.float64)
+        self._spec = np.empty((frames, self.bins), dtype=np.complex128)
+        self._power = np.empty((frames, self.bins), dtype=np.float64)
+        self._gain = np.empty((frames, self.bins), dtype=np.float64)
+        self._tmp = np.empty((frames, self.bins), dtype=np.float64)
+        self._capacity = samples
+
+    def reset(self):
+        """清空流式状态（保留噪声谱）"""
+        self._in[:] = 0.0
+        self._out[:] = 0.0
+        self._ola[:] = 0.0
+        # 输入前补半帧零，使第一个样本也落在两帧的重叠区；输出预留 hop-1 个零，
+        # 保证任意长度的输入块都能取满同样长度的输出
+        self._in_len = self.frame - self.hop
+        self._out_len = self.hop - 1
+        self._last_gain = np.ones(self.bins)
+
+    def _update_noise(self, power: np.ndarray, samples: int):
+        # 相邻三个频点平均后取各频点在本块内的低分位数
+        smoothed = self._tmp[:power.shape[0]]
+        smoothed[:] = power
+        smoothed[:, 1:] += power[:, :-1]
+        smoothed[:, :-1] += power[:, 1:]
+        k = int(self.percentile * (power.shape[0] - 1))
+        candidate = np.partition(smoothed, k, axis=0)[k] * (NOISE_BIAS / 3)
+        if self.noise is None:
+            self.noise = candidate
+            return
+        alpha = 1.0 - math.exp(-samples / self.rate / self.adapt_seconds)
+        self.noise = np.where(candidate > self.noise, self.noise + alpha * (candidate - self.noise), candidate)
+
+    def _gains(self, power: np.ndarray) -> np.ndarray:
+        gain, tmp = self._gain[:power.shape[0]], self._tmp[:power.shape[0]]
+        # 谱减增益 sqrt(1 - threshold * N / P)，下限 floor
+        np.add(power, 1e-12, out=tmp)
+        np.divide(self.noise, tmp, out=gain)
+        gain *= -self.threshold
+        gain += 1.0
+        np.maximum(gain, self.floor ** 2, out=gain)
+        np.sqrt(gain, out=gain)
+        # 频率方向 [1/4, 1/2, 1/4] 平滑
+        tmp[:] = gain
+        tmp *= 0.5
+        tmp[:, 1:] += 0.25 * gain[:, :-1]
+        tmp[:, :-1] += 0.25 * gain[:, 1:]
+        tmp[:, 0] += 0.25 * gain[:, 0]
+        tmp[:, -1] += 0.25 * gain[:, -1]
+        # 释放保持：增益下降时不低于上一帧的 release 倍
+        gain[1:] = np.maximum(tmp[1:], tmp[:-1] * self.release)
+        gain[0] = np.maximum(tmp[0], self._last_gain * self.release)
+        self._last_gain[:] = gain[-1]
+        return gain
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """处理一块单声道音频，返回同样长度的降噪结果（新数组）"""
+        start = time.perf_counter()
+        n = chunk.shape[0]
+        self._reserve(n)
+        hop, frame = self.hop, self.frame
+
+        self._in[self._in_len:self._in_len + n] = chunk
+        self._in_len += n
+        count = (self._in_len - frame) // hop + 1 if self._in_len >= frame else 0
+        if count:
+            frames = self._frames[:count]
+            windows = np.lib.stride_tricks.sliding_window_view(self._in[:self._in_len], frame)[::hop][:count]
+            np.multiply(windows, self.window, out=frames)
+            spec = np.fft.rfft(frames, axis=1, out=self._spec[:count])
+            power = self._power[:count]
+            np.abs(spec, out=power)
+            np.square(power, out=power)
+
+            self._update_noise(power, count * hop)
+            spec *= self._gains(power)
+            np.fft.irfft(spec, n=frame, axis=1, out=frames)
+            frames *= self.window
+
+            # 50% 重叠时偶数帧和奇数帧各自首尾相接，分两次整块相加
+            ola, tail = self._ola, frame - hop
+            ola[tail:count * hop + tail] = 0.0
+            even, odd = (count + 1) // 2, count // 2
+            ola[:even * frame].reshape(even, frame)[:] += frames[0::2]
+            ola[hop:hop + odd * frame].reshape(odd, frame)[:] += frames[1::2]
+
+            done = count * hop
+            self._out[self._out_len:self._out_len + done] = ola[:done]
+            self._out_len += done
+            ola[:tail] = ola[done:done + tail]
+            remaining = self._in_len - done
+            self._in[:remaining] = self._in[done:self._in_len]
+            self._in_len = remaining
+
+        result = self._out[:n].copy()
+        self._out_len -= n
+        self._out[:self._out_len] = self._out[n:n + self._out_len]
+        self.audio_seconds += n / self.rate
+        self.cpu_seconds += time.perf_counter() - start
+        return result
+
+    @property
+    def cost_ms_per_second(self) -> float:
+        """每秒音频的平均处理耗时（毫秒）"""
+        return self.cpu_seconds / self.audio_seconds * 1000 if self.audio_seconds else 0.0
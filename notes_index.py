@@ -0,0 +1,223 @@
+import hashlib
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+NOTE_EXTENSIONS = (".md", ".txt")
+INDEX_VERSION = 1
+# 英文单词、数字和常见技术名词（如 c++、node.js）整体作为一个词
+_WORD = re.compile(r"[a-z0-9][a-z0-9_+#.\-]*")
+_CJK = re.compile(r"[㐀-鿿]+")
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;])")
+
+
+def _terms(text: str) -> List[str]:
+    """检索用的词项：英文按单词，中文按相邻两个字（单字成段时取单字）"""
+    text = text.lower()
+    terms = [w.strip(".-") for w in _WORD.findall(text)]
+    for run in _CJK.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return [t for t in terms if t]
+
+
+def _split_long(paragraph: str, chunk_chars: int) -> List[str]:
+    """按句子切分过长的段落，单句仍超长时硬切"""
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > chunk_chars:
+            pieces.append(sentence[:chunk_chars])
+            sentence = sentence[chunk_chars:]
+        if current and len(current) + len(sentence) > chunk_chars:
+            pieces.append(current)
+            current = ""
+        current += sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, chunk_chars: int = 300) -> List[str]:
+    """把笔记按空行分段，再合并成不超过 chunk_chars 的片段；每个片段带上所属的 Markdown 标题"""
+    chunks, current, heading = [], "", ""
+
+    def flush():
+        nonlocal current
+        if current.strip():
+            body = current.strip()
+            chunks.append(f"{heading}\n{body}" if heading and not body.startswith(heading) else body)
+        current = ""
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if paragraph.startswith("#"):
+            flush()
+            first_line, _, rest = paragraph.partition("\n")
+            heading = first_line.lstrip("#").strip()
+            paragraph = rest.strip()
+            if not paragraph:
+                continue
+        for piece in _split_long(paragraph, chunk_chars):
+            if current and len(current) + len(piece) > chunk_chars:
+                flush()
+            current += piece + "\n"
+    flush()
+    return chunks
+
+
+class NotesIndex:
+    """候选人简历和笔记的本地检索索引
+
+    把笔记目录中的文本切成片段，用 BM25 计算每个(词项, 片段)的得分并按词项存成
+    CSR 形式的 npy 文件，查询时只需对问题中出现的词项累加得分。索引只在笔记变化时
+    重建，加载时以内存映射方式打开，不随笔记规模占用内存。
+    """
+    def __init__(self, index_dir: str, top_k: int = 3, min_score: float = 1.0, max_chars: int = 800):
+        self.index_dir = index_dir
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_chars = max_chars
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, "vocab.json"), encoding="utf-8") as f:
+            self.vocab: Dict[str, int] = json.load(f)
+        with open(os.path.join(index_dir, "chunks.json"), encoding="utf-8") as f:
+            self.chunks: List[Dict[str, str]] = json.load(f)
+        self.indptr = np.load(os.path.join(index_dir, "indptr.npy"), mmap_mode="r")
+        self.docs = np.load(os.path.join(index_dir, "docs.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(index_dir, "weights.npy"), mmap_mode="r")
+        self.last_latency = 0.0
+
+    @classmethod
+    def from_config(cls, config: Optional[Mapping[str, Any]]) -> Optional["NotesIndex"]:
+        """根据 notes 配置打开（必要时先构建）索引，未启用或没有笔记时返回 None"""
+        if not config or not config.get('enabled', False):
+            return None
+        notes_dir = config.get('dir', 'notes')
+        index_dir = config.get('index_dir') or os.path.join(notes_dir, ".index")
+        if not os.path.isdir(notes_dir):
+            print(f"笔记目录不存在: {notes_dir}")
+            return None
+        start = time.time()
+        built = cls.build_if_stale(notes_dir, index_dir, chunk_chars=config.get('chunk_chars', 300))
+        index = cls(index_dir, top_k=config.get('top_k', 3), min_score=config.get('min_score', 1.0),
+                    max_chars=config.get('max_chars', 800))
+        print(f"笔记索引{'已重建' if built else '已加载'}: {len(index.chunks)} 个片段，"
+              f"{len(index.vocab)} 个词项，耗时 {(time.time() - start)*1000:.0f}ms")
+        return index if index.chunks else None
+
+    @staticmethod
+    def _note_files(notes_dir: str) -> List[str]:
+        files = []
+        for root, dirs, names in os.walk(notes_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(NOTE_EXTENSIONS))
+        return files
+
+    @classmethod
+    def _fingerprint(cls, notes_dir: str, chunk_chars: int, k1: float, b: float) -> str:
+        digest = hashlib.sha1(f"{INDEX_VERSION}:{chunk_chars}:{k1}:{b}".encode())
+        for path in cls._note_files(notes_dir):
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, notes_dir)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def build_if_stale(cls, notes_dir: str, index_dir: str, chunk_chars: int = 300,
+                       k1: float = 1.2, b: float = 0.75) -> bool:
+        """笔记或参数有变化时重建索引，返回是否重建"""
+        fingerprint = cls._fingerprint(notes_dir, chunk_chars, k1, b)
+        try:
+            with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+                if json.load(f).get('fingerprint') == fingerprint:
+                    return False
+        except (OSError, ValueError):
+            pass
+        cls.build(notes_dir, index_dir, chunk_chars, k1, b, fingerprint)
+        return True
+
+    @classmethod
+    def build(cls, notes_dir: str, index_dir: str, chunk_chars: int = 300, k1: float = 1.2,
+              b: float = 0.75, fingerprint: Optional[str] = None):
+        """切分笔记并写出 BM25 索引"""
+        chunks = []
+        for path in cls._note_files(notes_dir):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                text = f.read()
+            source = os.path.relpath(path, notes_dir)
+            chunks.extend({'source': source, 'text': chunk} for chunk in chunk_text(text, chunk_chars))
+
+        term_counts = [Counter(_terms(chunk['text'])) for chunk in chunks]
+        lengths = np.array([sum(c.values()) for c in term_counts], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) else 1.0
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        # 预先算好每个(词项, 片段)的 BM25 得分，查询时只做加法
+        vocab, indptr, docs, weights = {}, [0], [], []
+        n = len(chunks)
+        for term_id, (term, plist) in enumerate(sorted(postings.items())):
+            vocab[term] = term_id
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for doc, tf in plist:
+                norm = tf + k1 * (1 - b + b * lengths[doc] / avg_length)
+                docs.append(doc)
+                weights.append(idf * tf * (k1 + 1) / norm)
+            indptr.append(len(docs))
+
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(os.path.join(index_dir, "indptr.npy"), np.array(indptr, dtype=np.int64))
+        np.save(os.path.join(index_dir, "docs.npy"), np.array(docs, dtype=np.int32))
+        np.save(os.path.join(index_dir, "weights.npy"), np.array(weights, dtype=np.float32))
+        with open(os.path.join(index_dir, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f, ensure_ascii=False)
+        with open(os.path.join(index_dir, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump(chunks, f, ensure_ascii=False)
+        # meta.json 最后写入，中途失败时下次会重新构建
+        with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({'fingerprint': fingerprint or cls._fingerprint(notes_dir, chunk_chars, k1, b),
+                       'chunks': n, 'terms': len(vocab), 'chunk_chars': chunk_chars,
+                       'k1': k1, 'b': b}, f)
+
+    def search(self, query: str, k: Optional[int] = None) -> List[Tuple[float, Dict[str, str]]]:
+        """返回与问题最相关的 k 个片段 [(得分, {'source', 'text'})]，得分低于 min_score 的不返回"""
+        k = k or self.top_k
+        term_ids = [self.vocab[t] for t in set(_terms(query)) if t in self.vocab]
+        if not term_ids or not self.chunks:
+            return []
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term_id in term_ids:
+            lo, hi = self.indptr[term_id], self.indptr[term_id + 1]
+            # 同一词项的倒排列表中片段不重复，可以直接按下标累加
+            scores[self.docs[lo:hi]] += self.weights[lo:hi]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.chunks[i]) for i in top
+                if scores[i] > 0 and scores[i] >= self.min_score]
+
+    def context_for(self, question: str) -> Optional[str]:
+        """检索并拼接成注入提示词的背景资料，没有相关片段时返回 None"""
+        start = time.perf_counter()
+        passages = self.search(question)
+        parts, total = [], 0
+        for _, chunk in passages:
+            text = f"[{chunk['source']}] {chunk['text']}"
+            if parts and total + len(text) > self.max_chars:
+                break
+            parts.append(text[:self.max_chars])
+            total += len(text)
+        self.last_latency = time.perf_counter() - start
+        return "\n\n".join(parts) if parts else None
@@ -0,0 +1,218 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import parse_qs, urlparse
+
+# 按源文件判断栈帧属于流水线的哪个阶段，越靠近栈顶的匹配越优先
+STAGE_FILES = {
+    'audio_capture.py': 'capture',
+    'resampler.py': 'capture',
+    'asr_manager.py': 'asr',
+    'asr_backend.py': 'asr',
+    'endpoint_detector.py': 'asr',
+    'question_filter.py': 'dispatch',
+    'kimi_manager.py': 'ai',
+    'chatgpt_manager.py': 'ai',
+    'baidu_manager.py': 'ai',
+    'tencent_manager.py': 'ai',
+    'conversation_summarizer.py': 'ai',
+    'ui_renderer.py': 'ui',
+}
+# 栈中没有匹配的源文件时按线程名判断
+STAGE_THREADS = {
+    'MainThread': 'ui',
+    'audio-capture': 'capture',
+    'asr-second-pass': 'asr',
+    'ai-worker': 'ai',
+    'async-runtime': 'ai',
+}
+
+
+class PipelineProfiler:
+    """按需启用的流水线采样分析器
+
+    启动后由一个采样线程定期读取所有线程的调用栈（sys._current_frames），在限定的时间窗口内
+    按"线程;阶段;调用栈"累计次数，结束时写出火焰图工具可直接读取的折叠栈文件，同时用
+    tracemalloc 记录窗口内增长最多的内存分配位置。未启动时不创建线程、不安装任何钩子。
+    """
+    def __init__(self, interval: float = 0.005, duration: float = 30.0,
+                 output_dir: str = "profiles", memory_frames: int = 10):
+        self.interval = interval
+        self.duration = duration
+        self.output_dir = output_dir
+        self.memory_frames = memory_frames
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._started_at = 0.0
+        self._owns_tracemalloc = False
+        self._memory_baseline = None
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.last_output: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "PipelineProfiler":
+        return cls(interval=config.get('interval_ms', 5) / 1000.0,
+                   duration=config.get('duration', 30.0),
+                   output_dir=config.get('output_dir', 'profiles'))
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: Optional[float] = None) -> bool:
+        """开始采样，duration 秒后自动停止；已在运行时返回 False"""
+        with self._lock:
+            if self.active:
+                return False
+            self._stacks = Counter()
+            self._samples = 0
+            self._started_at = time.time()
+            self._owns_tracemalloc = not tracemalloc.is_tracing()
+            if self._owns_tracemalloc:
+                tracemalloc.start(self.memory_frames)
+            self._memory_baseline = tracemalloc.take_snapshot()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration or self.duration,),
+                                            name="pipeline-profiler", daemon=True)
+            self._thread.start()
+        print(f"性能采样已开始，最长 {duration or self.duration:.1f} 秒")
+        return True
+
+    def stop(self, wait: bool = True) -> Optional[str]:
+        """停止采样并写出结果，返回折叠栈文件路径
+
+        wait=False 时只发出停止信号，结果由采样线程在后台写出，返回 None。
+        """
+        thread = self._thread
+        if thread is None:
+            return None
+        self._stop_event.set()
+        if not wait:
+            return None
+        if thread is not threading.current_thread():
+            thread.join()
+        return self.last_output
+
+    def toggle(self, duration: Optional[float] = None):
+        # 快捷键在 Tk 线程中调用，不等待采样线程写完结果
+        if self.active:
+            self.stop(wait=False)
+        else:
+            self.start(duration)
+
+    def _run(self, duration: float):
+        deadline = time.time() + duration
+        own_id = threading.get_ident()
+        while not self._stop_event.is_set() and time.time() < deadline:
+            self._sample(own_id)
+            self._stop_event.wait(self.interval)
+        self._finish()
+
+    def _sample(self, own_id: int):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            thread_name = names.get(thread_id, f"thread-{thread_id}")
+            if thread_name.startswith("profiler-"):
+                continue
+            stack = []
+            stage = None
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{filename}:{code.co_name}")
+                if stage is None:
+                    stage = STAGE_FILES.get(filename)
+                frame = frame.f_back
+            stage = stage or STAGE_THREADS.get(thread_name, 'other')
+            stack.reverse()
+            self._stacks[f"{thread_name};{stage};" + ";".join(stack)] += 1
+        self._samples += 1
+
+    def _finish(self):
+        elapsed = time.time() - self._started_at
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, datetime.now().strftime("profile_%Y%m%d_%H%M%S"))
+
+        # 折叠栈格式：每行 "帧;帧;帧 次数"，flamegraph.pl / speedscope 可直接读取
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        stage_counts: Dict[str, int] = Counter()
+        for stack, count in self._stacks.items():
+            thread_name, stage = stack.split(";", 2)[:2]
+            stage_counts[f"{stage} ({thread_name})"] += count
+        snapshot = tracemalloc.take_snapshot()
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"采样 {self._samples} 次，时长 {elapsed:.1f}s，间隔 {self.interval * 1000:.1f}ms\n\n")
+            f.write("各阶段采样占比:\n")
+            total = sum(stage_counts.values()) or 1
+            for name, count in sorted(stage_counts.items(), key=lambda x: -x[1]):
+                f.write(f"  {name:<40}{count:>8}  {count / total * 100:5.1f}%\n")
+            f.write("\n内存增长最多的位置:\n")
+            for stat in snapshot.compare_to(self._memory_baseline, 'lineno')[:20]:
+                f.write(f"  {stat}\n")
+        self._memory_baseline = None
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+        self.last_output = base + ".folded"
+        print(f"性能采样结束: {self._samples} 次采样，结果写入 {base}.folded / {base}.txt")
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """在本机端口上提供控制接口: /profile/start?seconds=N、/profile/stop、/profile/status"""
+        profiler = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def setup(self):
+                # 每个请求在单独的线程中处理，按名字前缀排除在采样之外
+                threading.current_thread().name = "profiler-http"
+                super().setup()
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/profile/start":
+                    seconds = parse_qs(url.query).get('seconds', [None])[0]
+                    started = profiler.start(float(seconds) if seconds else None)
+                    body = "started" if started else "already running"
+                elif url.path == "/profile/stop":
+                    body = profiler.stop() or "not running"
+                elif url.path == "/profile/status":
+                    body = "running" if profiler.active else f"idle, last output: {profiler.last_output}"
+                else:
+                    self.send_error(404)
+                    return
+                data = (body + "\n").encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="profiler-control", daemon=True).start()
+        print(f"性能采样控制接口: http://{host}:{port}/profile/start")
+
+    def shutdown(self):
+        """停止采样和控制接口"""
+        if self.active:
+            self.stop()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from async_runtime import AsyncRuntime
+
+logger = logging.getLogger(__name__)
+
+STATUS_TEXT = {
+    'cold': "未预热",
+    'warming': "预热中",
+    'warm': "已预热",
+    'failed': "预热失败",
+}
+
+
+class ProviderWarmup:
+    """AI服务连接预热
+
+    在共享事件循环上为每个已启用、实现了 warm() 的服务提前完成 DNS、TLS、token 获取和
+    会话创建，并在预热到期（服务的 WARM_TTL）之前重新预热。只在识别进行中运行：
+    开始识别时 start()，暂停时 stop()。服务可以实现 is_warm()，
+    在预热结果被一次对话用掉后报告未预热（例如腾讯的预建连接），以便尽快补上。
+
+    节省的首问延迟按两种方式估计：预热结果只能用一次的服务，节省的就是一次预热的耗时；
+    其余服务为首次（冷启动）预热与后续预热耗时之差，即握手和会话创建的开销。
+    """
+    def __init__(self, ai_service_manager, check_interval: float = 5.0,
+                 refresh_margin: float = 0.2, timeout: float = 15.0):
+        self.ai_service_manager = ai_service_manager
+        self.check_interval = check_interval
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+        self.status: Dict[str, Dict[str, Any]] = {}
+        self._future = None
+
+    @classmethod
+    def from_config(cls, ai_service_manager, config: Optional[Mapping[str, Any]]) -> Optional["ProviderWarmup"]:
+        """根据 warmup 配置创建，未启用时返回 None"""
+        config = config or {}
+        if not config.get('enabled', True):
+            return None
+        keys = ('check_interval', 'refresh_margin', 'timeout')
+        return cls(ai_service_manager, **{k: config[k] for k in keys if k in config})
+
+    def start(self):
+        """在事件循环上启动预热循环，启动时立即检查一次"""
+        if self._future is not None and not self._future.done():
+            return
+        self._future = AsyncRuntime().submit(self._run())
+
+    def stop(self):
+        """停止预热循环，进行中的预热被取消"""
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def status_text(self, name: str) -> str:
+        state = self.status.get(name, {}).get('state')
+        return STATUS_TEXT.get(state, "") if state else ""
+
+    def saved_ms(self, name: str) -> Optional[float]:
+        """估计预热为该服务的第一个问题节省的延迟（毫秒）"""
+        st = self.status.get(name)
+        if not st or st.get('cold_ms') is None:
+            return None
+        if st['consumable']:
+            return st['last_ms']
+        if st.get('rewarm_ms') is None:
+            return None
+        return max(0.0, st['cold_ms'] - st['rewarm_ms'])
+
+    async def _run(self):
+        while True:
+            await self._warm_due()
+            await asyncio.sleep(self.check_interval)
+
+    def _is_due(self, name: str, service, now: float) -> bool:
+        st = self.status.get(name)
+        if st is None:
+            return True
+        if st['state'] == 'warming':
+            return False
+        if st['state'] == 'failed':
+            return now >= st['retry_at']
+        is_warm = getattr(service, 'is_warm', None)
+        if is_warm is not None and not is_warm():
+            return True
+        ttl = getattr(service, 'WARM_TTL', 30.0)
+        return now >= st['warmed_at'] + ttl * (1.0 - self.refresh_margin)
+
+    async def _warm_due(self):
+        now = time.time()
+        due = [(name, service) for name, service in self.ai_service_manager.get_active_services().items()
+               if hasattr(service, 'warm') and self._is_due(name, service, now)]
+        if due:
+            await asyncio.gather(*(self._warm_one(name, service) for name, service in due))
+
+    async def _warm_one(self, name: str, service):
+        st = self.status.setdefault(name, {
+            'state': 'cold', 'cold_ms': None, 'rewarm_ms': None, 'last_ms': None,
+            'warmed_at': 0.0, 'failures': 0, 'retry_at': 0.0, 'error': None,
+            'consumable': hasattr(service, 'is_warm'),
+        })
+        st['state'] = 'warming'
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(service.warm(), self.timeout)
+        except asyncio.CancelledError:
+            st['state'] = 'cold'
+            raise
+        except Exception as e:
+            st['failures'] += 1
+            st.update(state='failed', error=str(e),
+                      retry_at=time.time() + min(60.0, 5.0 * 2 ** (st['failures'] - 1)))
+            logger.warning(f"⚠️ {name} 预热失败: {e}")
+            return
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        first = st['cold_ms'] is None
+        if first:
+            st['cold_ms'] = elapsed_ms
+        else:
+            previous = st['rewarm_ms']
+            st['rewarm_ms'] = elapsed_ms if previous is None else 0.8 * previous + 0.2 * elapsed_ms
+        st.update(state='warm', last_ms=elapsed_ms, warmed_at=time.time(), failures=0, error=None)
+
+        saved = self.saved_ms(name)
+        if first or saved is not None and st['rewarm_ms'] == elapsed_ms:
+            estimate = f"，首个问题预计节省约 {saved:.0f}ms" if saved is not None else ""
+            logger.info(f"🔥 {name} 预热完成，耗时 {elapsed_ms:.0f}ms{estimate}")
@@ -0,0 +1,223 @@
+import json
+import math
+import re
+import time
+from collections import Counter
+from typing import Any, Iterable, List, Mapping, Optional, Tuple
+
+# 疑问词和面试中常见的祈使句式
+QUESTION_WORDS = ("什么", "怎么", "为什么", "为何", "如何", "哪些", "哪个", "哪里", "哪儿", "谁",
+                  "多少", "几个", "多久", "是否", "能不能", "可不可以", "会不会", "有没有", "是不是",
+                  "对不对", "行不行")
+PROMPT_WORDS = ("请你", "请问", "介绍", "说说", "讲讲", "谈谈", "聊聊", "描述", "解释", "举例",
+                "举个例子", "分享", "展开", "区别", "原理", "理解", "说一下", "讲一下", "聊一下",
+                "谈一下", "介绍下", "你怎么看")
+FINAL_PARTICLES = ("吗", "呢", "么")
+# 寒暄、附和和口头语
+FILLERS = {"嗯", "啊", "哦", "呃", "额", "好", "好的", "对", "对的", "是的", "是", "行", "可以",
+           "谢谢", "没问题", "明白", "了解", "ok", "okay", "嗯嗯", "好好", "对对"}
+# 应聘者自己回答时常见的开头，立体声混音会把自己的声音也录进来
+ANSWER_OPENINGS = ("我觉得", "我认为", "我之前", "我们之前", "我在", "我负责", "我主要", "我的理解",
+                   "首先", "其次", "然后我", "当时我", "就是说")
+
+_PUNCTUATION = re.compile(r"[\s，。！？、；：,.!?;:\"'“”‘’（）()]+")
+
+# n-gram 打分器的种子语料，可用 training_file 补充
+SEED_QUESTIONS = [
+    "请你简单介绍一下你自己", "你为什么离开上一家公司", "说说你最有成就感的一个项目",
+    "你在项目中遇到的最大困难是什么", "你是怎么解决这个问题的", "讲讲进程和线程的区别",
+    "你对我们公司有什么了解", "你的职业规划是什么", "如果线上出现故障你会怎么排查",
+    "你平时是怎么学习新技术的", "谈谈你对微服务的理解", "你期望的薪资是多少",
+    "这个方案还有哪些可以优化的地方", "你能举个例子吗", "为什么选择这个技术栈",
+    "你最大的缺点是什么", "数据库索引的原理是什么", "有没有带团队的经验",
+    "你还有什么想问我们的吗", "介绍一下这个系统的整体架构",
+    "那你说一下Redis的持久化机制", "讲一下TCP三次握手", "线程池的核心参数有哪些",
+    "聊一下你对分布式事务的看法", "介绍下你做过的项目", "这个问题你怎么看",
+    "说一下HashMap的底层实现", "讲一下JVM的垃圾回收机制",
+]
+SEED_OTHERS = [
+    "嗯好的", "好的没问题", "那我们开始吧", "稍等一下我看一下", "能听到我说话吗",
+    "我觉得这个问题主要是", "我之前在公司负责后端开发", "首先我会看一下日志",
+    "然后我们用缓存解决了这个问题", "对对对是这样的", "好那今天就先到这里",
+    "谢谢你的时间", "我这边网络有点卡", "嗯嗯明白了", "当时我们团队一共五个人",
+    "就是说这个接口的性能不太好", "我们主要用的是Java", "这个我需要想一下",
+    "好的那我们继续", "声音有点小",
+]
+
+
+def _normalize(text: str) -> str:
+    return _PUNCTUATION.sub("", text).lower()
+
+
+def _bigrams(text: str) -> List[str]:
+    padded = "^" + _normalize(text) + "$"
+    return [padded[i:i + 2] for i in range(len(padded) - 1)]
+
+
+class BigramScorer:
+    """字二元组朴素贝叶斯打分器，返回"是问题"相对"不是问题"的对数几率"""
+    def __init__(self, questions: Iterable[str] = SEED_QUESTIONS, others: Iterable[str] = SEED_OTHERS):
+        self._counts = {True: Counter(), False: Counter()}
+        self._docs = {True: 0, False: 0}
+        for text in questions:
+            self.add(text, True)
+        for text in others:
+            self.add(text, False)
+
+    def add(self, text: str, is_question: bool):
+        self._counts[is_question].update(_bigrams(text))
+        self._docs[is_question] += 1
+
+    def load(self, path: str) -> int:
+        """从 JSONL 文件补充样本，每行 {"text": ..., "question": true/false}，返回样本数"""
+        count = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                self.add(item['text'], bool(item['question']))
+                count += 1
+        return count
+
+    def log_odds(self, text: str) -> float:
+        grams = _bigrams(text)
+        if not grams:
+            return 0.0
+        vocab = len(set(self._counts[True]) | set(self._counts[False])) + 1
+        totals = {label: sum(c.values()) for label, c in self._counts.items()}
+        score = math.log((self._docs[True] + 1) / (self._docs[False] + 1))
+        for gram in grams:
+            p_q = (self._counts[True][gram] + 1) / (totals[True] + vocab)
+            p_o = (self._counts[False][gram] + 1) / (totals[False] + vocab)
+            score += math.log(p_q / p_o)
+        # 按长度归一化，避免长句的得分被无限放大
+        return score / math.sqrt(len(grams))
+
+
+class QuestionFilter:
+    """AI 请求前的问题检测
+
+    用规则和字二元组打分器判断一段识别结果是否是面试官的问题：高置信度的直接发送，
+    中等置信度的暂存并与下一段合并后再判断，低置信度的（寒暄、噪声幻觉、应聘者自己的回答）
+    直接丢弃，并统计因此省下的AI请求次数。下一段像是应聘者的回答（以回答的常见开头开始，
+    或单独得分低于暂存的文本）时，暂存的文本就是问题，单独发送，回答本身丢弃。
+    """
+    def __init__(self, threshold: float = 0.5, hold_threshold: float = 0.2,
+                 hold_seconds: float = 8.0, min_chars: int = 4,
+                 training_file: Optional[str] = None):
+        self.threshold = threshold
+        self.hold_threshold = hold_threshold
+        self.hold_seconds = hold_seconds
+        self.min_chars = min_chars
+        self.scorer = BigramScorer()
+        if training_file:
+            try:
+                print(f"问题检测: 已加载 {self.scorer.load(training_file)} 条补充样本")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"问题检测: 加载样本文件失败 {training_file}: {e}")
+
+        self._held: List[str] = []
+        self._held_since = 0.0
+        self.stats = {'segments': 0, 'dispatched': 0, 'dropped': 0, 'merged': 0,
+                      'expired': 0, 'saved_calls': 0}
+
+    @classmethod
+    def from_config(cls, config: Optional[Mapping[str, Any]]) -> Optional["QuestionFilter"]:
+        """根据 question_filter 配置创建过滤器，未启用时返回 None"""
+        if not config or not config.get('enabled', False):
+            return None
+        keys = ('threshold', 'hold_threshold', 'hold_seconds', 'min_chars', 'training_file')
+        return cls(**{k: config[k] for k in keys if k in config})
+
+    def score(self, text: str) -> Tuple[float, str]:
+        """返回 (是问题的概率, 主要依据)"""
+        stripped = text.strip()
+        normalized = _normalize(stripped)
+        if len(normalized) < self.min_chars:
+            return (0.0, 'short') if normalized in FILLERS or len(normalized) <= 1 else (0.15, 'short')
+        if normalized in FILLERS:
+            return 0.0, 'filler'
+        # 识别模型在噪声上常产生重复字的幻觉
+        if len(set(normalized)) / len(normalized) < 0.3:
+            return 0.0, 'repetition'
+
+        logit = self.scorer.log_odds(stripped)
+        reason = 'ngram'
+        if stripped.endswith(("？", "?")):
+            logit += 3.0
+            reason = 'question_mark'
+        elif normalized.endswith(FINAL_PARTICLES):
+            logit += 2.0
+            reason = 'particle'
+        if any(word in normalized for word in QUESTION_WORDS):
+            logit += 1.5
+            reason = 'question_word' if reason == 'ngram' else reason
+        if any(word in normalized for word in PROMPT_WORDS):
+            logit += 1.0
+            reason = 'prompt' if reason == 'ngram' else reason
+        if normalized.startswith(ANSWER_OPENINGS):
+            logit -= 2.0
+            reason = 'answer' if reason == 'ngram' else reason
+        return 1.0 / (1.0 + math.exp(-logit)), reason
+
+    def submit(self, text: str, fanout: int = 1, now: Optional[float] = None) -> Tuple[Optional[str], float, str]:
+        """提交一段识别结果，返回 (需要发送的文本或 None, 得分, 决定)
+
+        fanout 为当前会收到这段文本的AI服务数量，用于统计省下的请求次数。
+        """
+        now = time.time() if now is None else now
+        self.stats['segments'] += 1
+        if self._held and now - self._held_since > self.hold_seconds:
+            # 暂存太久仍未凑成问题，视为丢弃
+            self.stats['expired'] += len(self._held)
+            self.stats['saved_calls'] += len(self._held) * fanout
+            self._held = []
+
+        candidate = "".join(self._held) + text
+        probability, reason = self.score(candidate)
+        if self._held and probability < self.threshold:
+            # 合并后仍不确定时，单独看这一段
+            alone, alone_reason = self.score(text)
+            held_text = "".join(self._held)
+            held, _ = self.score(held_text)
+            answer = _normalize(text).startswith(ANSWER_OPENINGS) or alone < held
+            if alone < self.threshold and answer and held >= self.hold_threshold:
+                # 面试官问完后通常紧接着应聘者的回答，不能等回答把得分抬过阈值
+                merged = len(self._held) - 1
+                self.stats['merged'] += merged
+                self.stats['dropped'] += 1
+                self.stats['saved_calls'] += (merged + 1) * fanout
+                self.stats['dispatched'] += 1
+                self._held = []
+                return held_text, held, 'dispatch_held'
+            if alone > probability:
+                probability, reason = alone, alone_reason
+                candidate = text
+
+        if probability >= self.threshold:
+            merged = len(self._held) if candidate != text else 0
+            self.stats['merged'] += merged
+            self.stats['saved_calls'] += merged * fanout
+            if candidate == text and self._held:
+                self.stats['dropped'] += len(self._held)
+                self.stats['saved_calls'] += len(self._held) * fanout
+            self._held = []
+            self.stats['dispatched'] += 1
+            return candidate, probability, 'dispatch'
+
+        if probability >= self.hold_threshold:
+            if not self._held:
+                self._held_since = now
+            self._held.append(text)
+            return None, probability, 'hold'
+
+        self.stats['dropped'] += 1
+        self.stats['saved_calls'] += fanout
+        return None, probability, 'drop'
+
+    def format_stats(self) -> str:
+        s = self.stats
+        return (f"问题检测统计: 共 {s['segments']} 段，发送 {s['dispatched']}，丢弃 {s['dropped']}，"
+                f"合并 {s['merged']}，过期 {s['expired']}，省下AI请求 {s['saved_calls']} 次")
@@ -0,0 +1,198 @@
+import asyncio
+import email.utils
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRY_AFTER = 5.0  # 429 响应没有 Retry-After 时的等待秒数
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class TokenBucket:
+    """令牌桶：每分钟补充 per_minute 个令牌，最多累积 burst 个（默认一分钟的量）"""
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """还需要等待多少秒才有 amount 个令牌；超过桶容量的请求在桶满时放行"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """按实际用量修正：正数退还多扣的令牌，负数补扣（允许暂时为负）"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderLimiter:
+    """单个AI服务的准入控制
+
+    限制同时进行的请求数，并用令牌桶限制每分钟请求数和每分钟token数。排不上的请求
+    按提交时间倒序排队，最新的问题最先获准。收到 429 后在 Retry-After 期间暂停准入。
+    只在共享事件循环上使用，不需要加锁。
+    """
+    def __init__(self, name: str, max_concurrency: int = 0, requests_per_minute: float = 0,
+                 tokens_per_minute: float = 0, burst_requests: Optional[float] = None,
+                 burst_tokens: Optional[float] = None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute, burst_requests) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, burst_tokens) if tokens_per_minute else None
+
+        self.in_flight = 0
+        self._waiters = []  # 堆: [-提交时间, 序号, future, token数]
+        self._seq = itertools.count()
+        self._blocked_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {'requests': 0, 'throttled': 0, 'rate_limited': 0, 'timeouts': 0,
+                      'wait_total': 0.0, 'wait_max': 0.0}
+
+    @classmethod
+    def from_config(cls, name: str, config: Optional[Mapping[str, Any]]) -> Optional["ProviderLimiter"]:
+        """根据服务配置中的 limits 段创建，未配置任何限制时返回 None"""
+        if not config or not config.get('enabled', True):
+            return None
+        keys = ('max_concurrency', 'requests_per_minute', 'tokens_per_minute', 'burst_requests', 'burst_tokens')
+        params = {k: config[k] for k in keys if config.get(k)}
+        if not any(k in params for k in keys[:3]):
+            return None
+        return cls(name, **params)
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for entry in self._waiters if not entry[2].done())
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            return float('inf')  # 等有请求完成时再检查
+        delay = max(0.0, self._blocked_until - now)
+        if self.requests is not None:
+            delay = max(delay, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.wait_time(tokens, now))
+        return delay
+
+    def _grant(self, tokens: int, now: float):
+        self.in_flight += 1
+        if self.requests is not None:
+            self.requests.take(1, now)
+        if self.tokens is not None:
+            self.tokens.take(tokens, now)
+
+    async def acquire(self, tokens: int = 0, timeout: Optional[float] = None) -> float:
+        """等待准入，返回排队的秒数；超时抛出 asyncio.TimeoutError。获准后必须调用 release()"""
+        now = time.monotonic()
+        self.stats['requests'] += 1
+        if not self._waiters and self._wait_time(tokens, now) == 0.0:
+            self._grant(tokens, now)
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [-now, next(self._seq), future, tokens])
+        self.stats['throttled'] += 1
+        self._pump()
+        try:
+            waited = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            logger.warning(f"⏳ {self.name} 排队超过 {timeout:.1f}s 仍未获准")
+            self._pump()
+            raise
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # 已获准入但调用方被取消
+            self._pump()
+            raise
+        if waited >= 0.5:
+            logger.info(f"⏳ {self.name} 限流排队 {waited:.2f}s")
+        return waited
+
+    def release(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None):
+        """请求结束，释放并发名额；提供实际用量时按差额修正token桶"""
+        self.in_flight = max(0, self.in_flight - 1)
+        if self.tokens is not None and actual_tokens is not None:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+        self._pump()
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """收到 429：在 Retry-After 期间暂停准入"""
+        delay = DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+        self.stats['rate_limited'] += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        logger.warning(f"🚦 {self.name} 被限流 (429)，暂停 {delay:.1f}s")
+        self._pump()
+
+    def _pump(self):
+        """按优先级放行排队的请求，放不了时在可以放行的时刻再检查"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        while self._waiters:
+            neg_enqueued, _, future, tokens = self._waiters[0]
+            if future.done():  # 已超时或取消
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._wait_time(tokens, now)
+            if delay > 0:
+                if delay != float('inf'):
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._pump)
+                return
+            heapq.heappop(self._waiters)
+            self._grant(tokens, now)
+            waited = now + neg_enqueued
+            self.stats['wait_total'] += waited
+            self.stats['wait_max'] = max(self.stats['wait_max'], waited)
+            future.set_result(waited)
+
+    def format_stats(self) -> str:
+        s = self.stats
+        average = s['wait_total'] / s['throttled'] if s['throttled'] else 0.0
+        return (f"{self.name} 准入统计: 请求 {s['requests']}，排队 {s['throttled']}，"
+                f"平均等待 {average:.2f}s，最长等待 {s['wait_max']:.2f}s，"
+                f"429 {s['rate_limited']} 次，排队超时 {s['timeouts']} 次")
+
+
+def update_limiter(current: Optional[ProviderLimiter], name: str,
+                   config: Optional[Mapping[str, Any]]) -> Optional[ProviderLimiter]:
+    """配置热更新：限制参数不变时保留原对象（以及其中的排队和统计），否则重新创建"""
+    new = ProviderLimiter.from_config(name, config)
+    if current is None or new is None:
+        return new
+    if (current.max_concurrency, _bucket_params(current.requests), _bucket_params(current.tokens)) == \
+            (new.max_concurrency, _bucket_params(new.requests), _bucket_params(new.tokens)):
+        return current
+    return new
+
+
+def _bucket_params(bucket: Optional[TokenBucket]):
+    return None if bucket is None else (bucket.rate, bucket.capacity)
@@ -0,0 +1,118 @@
+import numpy as np
+from math import gcd
+
+
+class PolyphaseResampler:
+    """流式多相重采样器
+
+    将设备原生采样率、多声道的 float32 交织数据下混为单声道并重采样到目标采样率。
+    滤波器按相位拆分后，每个相位的输出是输入滑动窗口与该相位系数的一次矩阵乘法，
+    全程向量化；块与块之间保留滤波器历史，输出在块边界上连续。
+    """
+    def __init__(self, in_rate: int, out_rate: int = 16000, channels: int = 1,
+                 taps_per_phase: int = 32, max_input_frames: int = 0):
+        if in_rate <= 0 or out_rate <= 0 or channels <= 0:
+            raise ValueError("采样率和声道数必须为正数")
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.channels = int(channels)
+
+        g = gcd(self.in_rate, self.out_rate)
+        self.up = self.out_rate // g
+        self.down = self.in_rate // g
+        self.taps = taps_per_phase if self.up != self.down else 1
+
+        # 设计低通滤波器（Kaiser 窗 sinc），截止频率取两侧奈奎斯特频率的较小者
+        if self.taps > 1:
+            n = self.taps * self.up
+            cutoff = 0.95 / max(self.up, self.down)
+            t = np.arange(n) - (n - 1) / 2.0
+            h = cutoff * np.sinc(cutoff * t) * np.kaiser(n, 8.0) * self.up
+        else:
+            h = np.ones(self.up, dtype=np.float64)
+        # h_poly[p, k] = h[p + k * up]，并按时间反转以便直接与输入窗口做点积
+        self._h_poly = np.ascontiguousarray(
+            h.reshape(self.taps, self.up).T[:, ::-1], dtype=np.float32)
+
+        # 流式状态：已消费的输入样本数和下一个输出样本的序号
+        self._consumed = 0
+        self._next_out = 0
+        self._history = self.taps - 1
+
+        # 预分配缓冲区，遇到更大的输入块时才扩容
+        self._mono = np.empty(0, dtype=np.float32)
+        self._ext = np.zeros(self._history, dtype=np.float32)
+        self._out = np.empty(0, dtype=np.float32)
+        if max_input_frames:
+            self._reserve(max_input_frames)
+
+    @property
+    def passthrough(self) -> bool:
+        """输入已是目标格式，无需任何处理"""
+        return self.up == self.down and self.channels == 1
+
+    def _reserve(self, frames: int):
+        if self._mono.shape[0] < frames:
+            self._mono = np.empty(frames, dtype=np.float32)
+            ext = np.zeros(self._history + frames, dtype=np.float32)
+            ext[:self._history] = self._ext[:self._history]
+            self._ext = ext
+            self._out = np.empty(frames * self.up // self.down + 2, dtype=np.float32)
+
+    def downmix(self, interleaved: np.ndarray) -> np.ndarray:
+        """将交织的多声道数据下混为单声道，返回内部缓冲区的视图"""
+        frames = interleaved.shape[0] // self.channels
+        self._reserve(frames)
+        mono = self._mono[:frames]
+        if self.channels == 1:
+            mono[:] = interleaved[:frames]
+        else:
+            np.mean(interleaved[:frames * self.channels].reshape(frames, self.channels),
+                    axis=1, out=mono)
+        return mono
+
+    def process(self, interleaved: np.ndarray) -> np.ndarray:
+        """处理一块输入数据，返回目标采样率的单声道数据（内部缓冲区视图，调用方需及时复制）"""
+        if self.passthrough:
+            return interleaved
+        mono = self.downmix(interleaved)
+        frames = mono.shape[0]
+        if frames == 0:
+            return self._out[:0]
+
+        hist = self._history
+        ext = self._ext
+        ext[hist:hist + frames] = mono
+        # ext[0] 对应的全局输入序号
+        base = self._consumed - hist
+        total_in = self._consumed + frames
+
+        # 本块可以产生的输出：其最新输入样本 (n * down) // up 必须已到达
+        start = self._next_out
+        end = (total_in * self.up - 1) // self.down + 1
+        count = end - start
+        if count > 0:
+            out = self._out[:count]
+            windows = np.lib.stride_tricks.sliding_window_view(ext[:hist + frames], self.taps)
+            # 同一相位的输出在输入上等间隔（步长 down），每个相位一次矩阵乘法
+            for j in range(min(self.up, count)):
+                m = (start + j) * self.down
+                phase = m % self.up
+                first = m // self.up - base - (self.taps - 1)
+                n_j = (count - j + self.up - 1) // self.up
+                out[j::self.up] = windows[first:first + n_j * self.down:self.down] @ self._h_poly[phase]
+            self._next_out = end
+        else:
+            out = self._out[:0]
+
+        # 保留滤波器历史
+        if hist:
+            ext[:hist] = ext[frames:frames + hist]
+        self._consumed = total_in
+        return out
+
+    def reset(self):
+        """清空流式状态"""
+        self._consumed = 0
+        self._next_out = 0
+        self._ext[:] = 0.0
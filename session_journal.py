@@ -0,0 +1,107 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Optional, Dict, Any
+
+
+class SessionJournal:
+    """只追加的会话日志
+
+    识别出的文本段和各AI服务的回复以 JSONL 形式记录。调用方只把记录放入队列，
+    序列化、批量写入和定期 fsync 都在后台线程中完成，不阻塞界面和识别线程。
+    一个实例可以同时服务多个会话，每条记录都带有 session_id。
+    """
+    def __init__(self, path: str = "journal/sessions.jsonl", batch_size: int = 256,
+                 flush_interval: float = 0.5, fsync_interval: float = 5.0,
+                 max_queue: int = 100000):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.dropped = 0  # 队列满时丢弃的记录数
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._writer_loop, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def new_session_id() -> str:
+        """生成新的会话ID"""
+        return uuid.uuid4().hex
+
+    def record(self, record_type: str, session_id: str, **fields):
+        """记录一条日志（非阻塞，线程安全）"""
+        fields['type'] = record_type
+        fields['session_id'] = session_id
+        fields.setdefault('time', time.time())
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+
+    def record_transcript(self, session_id: str, text: str):
+        """记录一段最终识别文本"""
+        self.record('transcript', session_id, text=text)
+
+    def record_response(self, session_id: str, provider: str, question: str, answer: str,
+                        latency: float, usage: Optional[Dict[str, Any]] = None, **extra):
+        """记录一次AI服务回复"""
+        self.record('response', session_id, provider=provider, question=question,
+                    answer=answer, latency=round(latency, 4), usage=usage, **extra)
+
+    def _writer_loop(self):
+        last_fsync = time.time()
+        pending_sync = False
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if batch:
+                lines = []
+                for item in batch:
+                    try:
+                        lines.append(json.dumps(item, ensure_ascii=False, default=str))
+                    except Exception as e:
+                        print(f"会话日志序列化出错: {e}")
+                try:
+                    self._file.write("\n".join(lines) + "\n")
+                    self._file.flush()
+                    pending_sync = True
+                except Exception as e:
+                    print(f"写入会话日志出错: {e}")
+
+            now = time.time()
+            if pending_sync and (now - last_fsync >= self.fsync_interval or self._stop_event.is_set()):
+                try:
+                    os.fsync(self._file.fileno())
+                except OSError as e:
+                    print(f"会话日志 fsync 出错: {e}")
+                last_fsync = now
+                pending_sync = False
+
+            if self._stop_event.is_set() and self._queue.empty():
+                break
+        # 文件只由写线程关闭，避免与仍在写入的批次竞争
+        self._file.close()
+
+    def close(self):
+        """写完队列中的全部记录并关闭文件
+
+        写线程是守护线程，进程退出时会被直接终止，所以这里一直等到队列写空，
+        之后进程可以安全退出。
+        """
+        self._stop_event.set()
+        self._thread.join()
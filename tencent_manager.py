@@ -1,4 +1,5 @@
 import asyncio
+import concurrent.futures
 import json
 import logging
 import re
@@ -7,15 +8,34 @@ import time
 import uuid
 import certifi
 import websockets
+from websockets.protocol import State
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 from tencentcloud.common import credential
 from tencentcloud.common.profile.client_profile import ClientProfile
 from tencentcloud.common.profile.http_profile import HttpProfile
 from tencentcloud.lke.v20231130 import lke_client, models
 from config_manager import ConfigManager
+from async_runtime import AsyncRuntime
+from answer_budget import SentenceBudget
+from rate_limiter import update_limiter
+
+# socket.io 消息帧："42" 等数字类型前缀加 JSON 数据
+FRAME_PATTERN = re.compile(r'\d+(.*)')
+
+
+def parse_frame(frame: str) -> Optional[list]:
+    """解析一个 socket.io 消息帧，没有数字前缀时返回 None"""
+    match = FRAME_PATTERN.search(frame)
+    if not match:
+        return None
+    return json.loads(match.group(1))
+
 
 class TencentAIManager:
+    WS_URL = "wss://wss.lke.cloud.tencent.com/v1/qbot/chat/conn/?EIO=4&transport=websocket"
+    WARM_TTL = 20.0  # 预先建立的连接在服务端心跳超时前被使用，否则重新建立
+
     def __init__(self, bot_app_key: Optional[str] = None, visitor_biz_id: Optional[str] = None,
                  secret_id: Optional[str] = None, secret_key: Optional[str] = None):
         # 配置日志
@@ -45,10 +65,31 @@ class TencentAIManager:
         # 会话相关
         self.messages = []
         self._should_stop = False
+        self._tasks = set()  # 进行中的请求任务，stop() 时取消
+        self.last_usage = None  # 该服务不返回token用量
+        self.answer_first = None  # 答案优先截断配置
+        self.last_truncation = None  # 最近一次回复的截断位置（对话历史保存在服务端）
         self._max_attempts = 5
         self._initial_retry_delay = 1.0
         self._max_retry_delay = 16.0
         self._timeout = 60.0
+        self._warm_ws = None  # 预热时建立并完成认证的连接，下一次对话直接使用
+        self._warm_ws_at = 0.0
+        self.limiter = None  # 并发数和请求速率限制，由配置 limits 启用
+        self.last_wait = 0.0  # 最近一次请求在准入控制中排队的秒数
+        
+        # 应用可热更新的配置，并在配置文件变化时重新应用
+        self.apply_config(config)
+        ConfigManager().add_reload_listener(self._on_config_reload)
+
+    def apply_config(self, config) -> None:
+        """应用可热更新的配置项（超时、答案优先截断）"""
+        self._timeout = max(1.0, float(config.get('timeout', 60.0)))
+        self.answer_first = config.get('answer_first')
+        self.limiter = update_limiter(self.limiter, "Tencent", config.get('limits'))
+
+    def _on_config_reload(self, config_manager: ConfigManager) -> None:
+        self.apply_config(config_manager.get_service_config('tencent'))
 
     def _get_session(self):
         return str(uuid.uuid1())
@@ -83,86 +124,191 @@ class TencentAIManager:
             self.logger.error(f"Failed to get API token: {e}")
             return None
 
-    async def _websocket_chat(self, token: str, message: str) -> str:
-        """通过WebSocket进行对话"""
-        url = f"wss://wss.lke.cloud.tencent.com/v1/qbot/chat/conn/?EIO=4&transport=websocket"
-        pattern = r'\d+(.*)'
+    async def _connect(self, token: str):
+        """建立WebSocket连接并完成认证"""
+        ws = await websockets.connect(self.WS_URL, ssl=self.ssl_context)
+        try:
+            # 建立连接
+            response = await ws.recv()
+            self.logger.info(f"Connection established: {response}")
+
+            # 发送认证
+            auth = {"token": token}
+            auth_message = f"40{json.dumps(auth)}"
+            await ws.send(auth_message)
+            
+            # 接收认证响应
+            response = await ws.recv()
+            self.logger.info(f"Authentication result: {response}")
+        except BaseException:
+            await ws.close()
+            raise
+        return ws
+
+    async def _take_connection(self):
+        """优先使用预热好的连接，没有或已过期时重新获取token并连接"""
+        ws, self._warm_ws = self._warm_ws, None
+        if ws is not None:
+            if time.time() - self._warm_ws_at < self.WARM_TTL and ws.state is State.OPEN:
+                self.logger.info("使用预热的WebSocket连接")
+                return ws
+            await ws.close()
+        token = await self._aget_api_token()
+        if not token:
+            raise RuntimeError("获取 API token 失败")
+        return await self._connect(token)
+
+    async def warm(self) -> bool:
+        """预热：提前获取token、完成握手和认证，连接留给下一次对话"""
+        token = await self._aget_api_token()
+        if not token:
+            raise RuntimeError("获取 API token 失败")
+        ws = await self._connect(token)
+        old, self._warm_ws, self._warm_ws_at = self._warm_ws, ws, time.time()
+        if old is not None:
+            await old.close()
+        return True
+
+    def is_warm(self) -> bool:
+        """预热的连接被对话取走后返回 False，提示需要重新预热"""
+        return self._warm_ws is not None
+
+    async def _admit(self, input: str):
+        """通过准入控制，返回 (限流器, 排队秒数)；超时抛出 asyncio.TimeoutError"""
+        limiter = self.limiter
+        if limiter is None:
+            return None, 0.0
+        return limiter, await limiter.acquire(int(len(input) * 1.5), timeout=self._timeout)
+
+    @staticmethod
+    def _release(limiter) -> None:
+        if limiter is not None:
+            limiter.release()
+
+    async def _websocket_stream(self, message: str) -> AsyncIterator[str]:
+        """通过WebSocket进行对话，逐段产出回复文本"""
         response_content = ""
 
+        limiter, self.last_wait = await self._admit(message)
+        ws = None
         try:
-            async with websockets.connect(url, ssl=self.ssl_context) as ws:
-                # 建立连接
-                response = await ws.recv()
-                self.logger.info(f"Connection established: {response}")
-
-                # 发送认证
-                auth = {"token": token}
-                auth_message = f"40{json.dumps(auth)}"
-                await ws.send(auth_message)
-                
-                # 接收认证响应
-                response = await ws.recv()
-                self.logger.info(f"Authentication result: {response}")
-
-                # 发送消息
-                session_id = self._get_session()
-                request_id = self._get_request_id()
-                payload = {
-                    "payload": {
-                        "request_id": request_id,
-                        "session_id": session_id,
-                        "content": message,
-                    }
+            ws = await self._take_connection()
+
+            # 发送消息
+            session_id = self._get_session()
+            request_id = self._get_request_id()
+            payload = {
+                "payload": {
+                    "request_id": request_id,
+                    "session_id": session_id,
+                    "content": message,
                 }
-                req_data = ["send", payload]
-                send_data = f"42{json.dumps(req_data, ensure_ascii=False)}"
-                await ws.send(send_data)
-
-                # 接收响应
-                while True:
-                    if self._should_stop:
-                        return "操作已取消"
-
-                    rsp = await ws.recv()
-                    if rsp == '2':
-                        await ws.send("3")  # 心跳响应
-                        continue
-                    
-                    rsp_re_result = re.search(pattern, rsp)
-                    if not rsp_re_result:
+            }
+            req_data = ["send", payload]
+            send_data = f"42{json.dumps(req_data, ensure_ascii=False)}"
+            await ws.send(send_data)
+
+            # 接收响应
+            while True:
+                if self._should_stop:
+                    return
+
+                rsp = await ws.recv()
+                if rsp == '2':
+                    await ws.send("3")  # 心跳响应
+                    continue
+                
+                rsp_dict = parse_frame(rsp)
+                if rsp_dict is None:
+                    continue
+                
+                if rsp_dict[0] == "error":
+                    self.logger.error(f"Error response: {rsp_dict}")
+                    raise RuntimeError(f"错误: {rsp_dict}")
+                
+                elif rsp_dict[0] == "reply":
+                    payload = rsp_dict[1]["payload"]
+                    if payload["is_from_self"]:
                         continue
+
+                    # 回复内容是累计的全文，只产出新增部分
+                    content = payload["content"]
+                    if content.startswith(response_content):
+                        delta = content[len(response_content):]
+                    else:
+                        delta = content
+                    response_content = content
+                    if delta:
+                        yield delta
                         
-                    rsp_dict = json.loads(rsp_re_result.group(1))
-                    
-                    if rsp_dict[0] == "error":
-                        self.logger.error(f"Error response: {rsp_dict}")
-                        return f"错误: {rsp_dict}"
-                    
-                    elif rsp_dict[0] == "reply":
-                        payload = rsp_dict[1]["payload"]
-                        if payload["is_from_self"]:
-                            continue
-                            
-                        if payload["is_final"]:
-                            response_content = payload["content"]
-                            break
-
-                return response_content
+                    if payload["is_final"]:
+                        break
+        finally:
+            if ws is not None:
+                await ws.close()
+            self._release(limiter)
 
+    async def _budgeted_stream(self, message: str,
+                               budget: Optional[SentenceBudget]) -> AsyncIterator[str]:
+        """按预算截断WebSocket回复，达到预算后关闭连接"""
+        ws_stream = self._websocket_stream(message)
+        try:
+            async for delta in ws_stream:
+                if budget is not None:
+                    delta, _ = budget.feed(delta)
+                if delta:
+                    yield delta
+                if budget is not None and budget.done:
+                    self.last_truncation = budget.truncation
+                    self.logger.info(f"✂️ 答案优先截断: {budget.truncation}")
+                    break
+        finally:
+            # 显式关闭内层生成器，以便立即关闭连接
+            await ws_stream.aclose()
+
+    async def _websocket_chat(self, message: str) -> str:
+        """通过WebSocket进行对话"""
+        budget = SentenceBudget.from_config(self.answer_first)
+        try:
+            parts = [delta async for delta in self._budgeted_stream(message, budget)]
+            if self._should_stop:
+                return "操作已取消"
+            return "".join(parts)
+        except asyncio.CancelledError:
+            raise
+        except RuntimeError as e:
+            return str(e)
         except Exception as e:
             self.logger.error(f"WebSocket chat failed: {e}")
             return f"对话失败: {str(e)}"
 
-    def chat(self, input: str) -> str:
-        """主要的对话接口"""
-        try:
-            # 获取token
-            token = self._get_api_token()
-            if not token:
-                return "获取 API token 失败"
+    def _track_current_task(self):
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _aget_api_token(self) -> Optional[str]:
+        """在线程池中调用同步SDK获取token，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._get_api_token)
 
-            # 执行异步WebSocket对话
-            response = asyncio.run(self._websocket_chat(token, input))
+    @staticmethod
+    def _with_context(message: str, context: Optional[str]) -> str:
+        """把检索到的背景资料放在问题前面，只随本轮发送"""
+        if not context:
+            return message
+        return f"候选人背景资料（与当前问题相关的片段）：\n{context}\n\n问题：{message}"
+
+    async def achat(self, input: str, context: Optional[str] = None) -> str:
+        """异步对话接口"""
+        self._track_current_task()
+        self._should_stop = False
+        self.last_truncation = None
+        try:
+            # WebSocket对话（使用预热的连接，或获取token后新建连接）
+            response = await asyncio.wait_for(self._websocket_chat(self._with_context(input, context)),
+                                              timeout=self._timeout)
             
             self.logger.info(f"\n📥 Tencent AI Response:")
             self.logger.info(f"     {response}")
@@ -170,14 +316,46 @@ class TencentAIManager:
             
             return response
 
+        except asyncio.CancelledError:
+            self.logger.info("Request cancelled due to exit request")
+            raise
         except Exception as e:
             self.logger.error(f"对话出错: {e}")
             return f"对话出错: {str(e)}"
 
+    async def astream(self, input: str, budget: Optional[SentenceBudget] = None,
+                      context: Optional[str] = None) -> AsyncIterator[str]:
+        """异步流式对话接口，逐段产出回复文本
+
+        传入 budget 时，达到句子数或字符预算后立即关闭连接。
+        """
+        self._track_current_task()
+        self._should_stop = False
+        self.last_truncation = None
+        stream = self._budgeted_stream(self._with_context(input, context), budget)
+        try:
+            async for delta in stream:
+                yield delta
+        finally:
+            await stream.aclose()
+
+    def chat(self, input: str, context: Optional[str] = None) -> str:
+        """主要的对话接口，在共享事件循环上运行 achat"""
+        try:
+            return AsyncRuntime().run(self.achat(input, context))
+        except (asyncio.CancelledError, concurrent.futures.CancelledError):
+            return "操作已取消"
+
     def stop(self):
-        """停止所有操作"""
+        """停止所有操作，并取消进行中的请求"""
         self._should_stop = True
+        AsyncRuntime().cancel(self._tasks)
         
     def reset(self):
         """重置停止标志"""
-        self._should_stop = False 
\ No newline at end of file
+        self._should_stop = False
+
+    def reset_conversation(self):
+        """开始新的对话（每次请求都使用新的 session_id，没有需要清除的历史）"""
+        self.reset()
+        self.last_truncation = None
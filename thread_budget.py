@@ -0,0 +1,117 @@
+import os
+import sys
+import threading
+from typing import Any, Iterable, Mapping, Optional
+
+from config_manager import ConfigManager
+
+# 流水线中各阶段线程的名称，用于核心绑定
+STAGES = ('asr', 'postprocess', 'ai', 'ui')
+
+
+def pin_current_thread(cores: Iterable[int]) -> bool:
+    """把调用线程绑定到指定的CPU核心，不支持的平台返回 False"""
+    cores = sorted(set(int(c) for c in cores))
+    if not cores:
+        return False
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            # Linux 上 pid 0 表示调用线程本身
+            os.sched_setaffinity(0, cores)
+            return True
+        if sys.platform == 'win32':
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetCurrentThread.restype = ctypes.c_void_p
+            kernel32.SetThreadAffinityMask.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+            kernel32.SetThreadAffinityMask.restype = ctypes.c_size_t
+            mask = sum(1 << c for c in cores)
+            return kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), mask) != 0
+    except (OSError, ValueError, AttributeError) as e:
+        print(f"绑定CPU核心失败 {cores}: {e}")
+    return False
+
+
+def set_torch_threads(threads: int):
+    """设置调用线程之后的 PyTorch 算子内线程数（只在 torch 已导入时生效）"""
+    torch = sys.modules.get('torch')
+    if torch is not None and threads and torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+
+
+class ThreadBudget:
+    """推理线程预算
+
+    根据 threads 配置限制 PyTorch / OpenMP / ONNX Runtime 的线程数，为每个模型单独指定
+    算子内线程数，并可把各阶段的线程绑定到指定核心，避免小机器上多个模型同时推理时
+    线程数超过核心数造成的延迟抖动。配置可由 benchmarks/calibrate_threads.py 在本机测得。
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(ThreadBudget, cls).__new__(cls)
+                cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._local = threading.local()
+        self._applied = False
+        self.config: Mapping[str, Any] = ConfigManager().get_optional_config('threads')
+        self.enabled = bool(self.config.get('enabled', False))
+        self._initialized = True
+
+    def model_threads(self, kind: str) -> Optional[int]:
+        """某类模型的算子内线程数，未配置时返回 None"""
+        if not self.enabled:
+            return None
+        models = self.config.get('models') or {}
+        return models.get(kind) or self.config.get('torch_intra_op')
+
+    def stage_cores(self, stage: str) -> Optional[list]:
+        if not self.enabled:
+            return None
+        affinity = self.config.get('affinity') or {}
+        cores = affinity.get(stage)
+        return list(cores) if cores else None
+
+    def apply_process(self):
+        """进程级设置，需要在加载任何模型之前调用"""
+        if not self.enabled or self._applied:
+            return
+        self._applied = True
+        intra = self.config.get('torch_intra_op')
+        if intra:
+            # OpenMP / MKL 在首次导入 torch 时读取这些环境变量
+            for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+                os.environ[name] = str(intra)
+        try:
+            import torch
+        except ImportError:
+            return
+        if intra:
+            torch.set_num_threads(intra)
+        inter = self.config.get('torch_inter_op')
+        if inter:
+            try:
+                torch.set_num_interop_threads(inter)
+            except RuntimeError as e:
+                # 算子间线程池一旦启动就不能再修改
+                print(f"设置 PyTorch 算子间线程数失败: {e}")
+        print(f"线程预算: 算子内 {torch.get_num_threads()}，算子间 {torch.get_num_interop_threads()}")
+
+    def enter_stage(self, stage: str):
+        """在阶段线程中调用（可重复调用），按配置绑定CPU核心"""
+        if not self.enabled or getattr(self._local, 'stage', None) == stage:
+            return
+        self._local.stage = stage
+        cores = self.stage_cores(stage)
+        if cores is None and self.config.get('affinity'):
+            # Linux 上新线程继承创建者的绑定，未配置的阶段恢复为使用全部核心
+            cores = list(range(os.cpu_count() or 1))
+        if cores and pin_current_thread(cores):
+            print(f"线程 {threading.current_thread().name} ({stage}) 已绑定到核心 {cores}")
@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+import tkinter as tk
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+class _PanelState:
+    """单个文本控件的渲染状态"""
+    def __init__(self, name: str, widget, max_lines: int, max_chars: int, scroll_to: str):
+        self.name = name
+        self.widget = widget
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        self.scroll_to = scroll_to
+        # 控件当前内容的影子副本，用于计算增量
+        self.text = ""
+        # 待渲染的操作：先整体替换（可选），再追加
+        self.pending_replace: Optional[str] = None
+        self.pending_appends: List[str] = []
+        # 末尾的实时行：原地更新，追加的内容插在它之前
+        self.live_len = 0
+        self.pending_live: Optional[str] = None
+        self.live_since: Optional[float] = None
+
+
+class UIRenderer:
+    """按固定帧率在 Tk 线程中批量刷新文本控件
+
+    任意线程都可以调用 append / replace / clear，这些调用只记录待渲染内容；
+    真正的控件操作统一在 Tk 主线程的定时回调中完成。每个控件的内容受行数和
+    字符数上限约束，超出的旧内容会写入会话日志文件。
+
+    控件末尾可以有一行实时内容（set_live），每次只改动与上次不同的部分，
+    追加的正式内容始终插在实时行之前。
+    """
+    LIVE_TAG = "live"
+    DEFAULT_FPS = 20
+    DEFAULT_MAX_LINES = 2000
+    DEFAULT_MAX_CHARS = 100000
+
+    def __init__(self, root, fps: int = DEFAULT_FPS, max_lines: int = DEFAULT_MAX_LINES,
+                 max_chars: int = DEFAULT_MAX_CHARS, session_log_dir: Optional[str] = "logs"):
+        self.root = root
+        self.interval_ms = max(1, int(1000 / max(1, fps)))
+        self.max_lines = max_lines
+        self.max_chars = max_chars
+        self.session_log_dir = session_log_dir
+
+        self._panels: Dict[str, _PanelState] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._after_id = None
+        self._running = False
+        self._log_file = None
+        # 实时行从产生到显示在界面上的延迟回调: (控件名, 秒)
+        self.live_latency_callback: Optional[Callable[[str, float], None]] = None
+
+    def register(self, name: str, widget, max_lines: Optional[int] = None,
+                 max_chars: Optional[int] = None, scroll_to: str = tk.END):
+        """注册需要托管的文本控件"""
+        with self._lock:
+            self._panels[name] = _PanelState(
+                name, widget,
+                max_lines if max_lines is not None else self.max_lines,
+                max_chars if max_chars is not None else self.max_chars,
+                scroll_to
+            )
+
+    def unregister(self, name: str):
+        """取消托管文本控件"""
+        with self._lock:
+            self._panels.pop(name, None)
+
+    def append(self, name: str, text: str):
+        """追加文本（线程安全）"""
+        if not text:
+            return
+        with self._lock:
+            panel = self._panels.get(name)
+            if panel is None:
+                return
+            panel.pending_appends.append(text)
+            self._dirty = True
+
+    def replace(self, name: str, text: str):
+        """替换控件的全部内容（线程安全），渲染时只改动与旧内容不同的部分"""
+        with self._lock:
+            panel = self._panels.get(name)
+            if panel is None:
+                return
+            panel.pending_replace = text
+            panel.pending_appends = []
+            panel.pending_live = None
+            panel.live_since = None
+            self._dirty = True
+
+    def set_live(self, name: str, text: str, since: Optional[float] = None):
+        """设置控件末尾的实时行（线程安全），空文本表示移除
+
+        since 为这段文本对应的音频送入识别的时间，显示后通过 live_latency_callback 报告延迟。
+        """
+        with self._lock:
+            panel = self._panels.get(name)
+            if panel is None:
+                return
+            panel.pending_live = text
+            if since is not None:
+                panel.live_since = since
+            self._dirty = True
+
+    def clear(self, name: Optional[str] = None):
+        """清空指定控件，name 为空时清空全部控件"""
+        with self._lock:
+            names = [name] if name is not None else list(self._panels.keys())
+        for panel_name in names:
+            self.replace(panel_name, "")
+
+    def start(self):
+        """开始定时刷新"""
+        if self._running:
+            return
+        self._running = True
+        self._schedule()
+
+    def stop(self):
+        """停止刷新并关闭会话日志"""
+        self._running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        # 把尚未渲染的内容刷新出去，避免丢失
+        try:
+            self.flush()
+        except tk.TclError:
+            pass
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
+
+    def _schedule(self):
+        if self._running:
+            self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"界面刷新出错: {e}")
+        finally:
+            self._schedule()
+
+    def flush(self):
+        """在 Tk 线程中应用所有待渲染的操作"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            work = []
+            for panel in self._panels.values():
+                if panel.pending_replace is None and not panel.pending_appends and panel.pending_live is None:
+                    continue
+                work.append((panel, panel.pending_replace, "".join(panel.pending_appends),
+                             panel.pending_live, panel.live_since))
+                panel.pending_replace = None
+                panel.pending_appends = []
+                panel.pending_live = None
+                panel.live_since = None
+
+        for panel, replace_text, append_text, live_text, live_since in work:
+            if replace_text is not None:
+                self._apply_replace(panel, replace_text)
+            if live_text is not None or panel.live_len:
+                self._apply_live(panel, append_text, live_text)
+            elif append_text:
+                panel.widget.insert(tk.END, append_text)
+                panel.text += append_text
+            self._enforce_limits(panel)
+            panel.widget.see(panel.scroll_to)
+            if live_since is not None and self.live_latency_callback:
+                self.live_latency_callback(panel.name, time.time() - live_since)
+
+    def _apply_replace(self, panel: _PanelState, new_text: str):
+        """只删除并插入与当前内容不同的尾部"""
+        old_text = panel.text
+        common = len(os.path.commonprefix([old_text, new_text]))
+        if common < len(old_text):
+            panel.widget.delete(f"1.0 + {common} chars", "end-1c")
+        if common < len(new_text):
+            panel.widget.insert(tk.END, new_text[common:])
+        panel.text = new_text
+        panel.live_len = 0
+
+    def _apply_live(self, panel: _PanelState, append_text: str, live_text: Optional[str]):
+        """把追加内容插在实时行之前并更新实时行，只改动与当前尾部不同的部分"""
+        if live_text is None:
+            live_text = panel.text[len(panel.text) - panel.live_len:]
+        start = len(panel.text) - panel.live_len
+        old_tail = panel.text[start:]
+        new_tail = append_text + live_text
+        common = len(os.path.commonprefix([old_tail, new_tail]))
+        if common < len(old_tail):
+            panel.widget.delete(f"1.0 + {start + common} chars", "end-1c")
+        if common < len(new_tail):
+            panel.widget.insert(tk.END, new_tail[common:])
+        panel.text = panel.text[:start] + new_tail
+        panel.live_len = len(live_text)
+
+        # 实时行用单独的样式显示，转为正式内容后去掉样式
+        committed = f"1.0 + {len(panel.text) - panel.live_len} chars"
+        panel.widget.tag_remove(self.LIVE_TAG, "1.0", committed)
+        if panel.live_len:
+            panel.widget.tag_add(self.LIVE_TAG, committed, "end-1c")
+
+    def _enforce_limits(self, panel: _PanelState):
+        """裁剪超出行数或字符数上限的旧内容，并写入会话日志"""
+        cut = 0
+        if panel.max_chars and len(panel.text) > panel.max_chars:
+            cut = len(panel.text) - panel.max_chars
+            # 尽量按整行裁剪
+            newline = panel.text.find("\n", cut - 1)
+            if newline >= 0:
+                cut = newline + 1
+        if panel.max_lines:
+            line_count = panel.text.count("\n", cut)
+            if not panel.text.endswith("\n"):
+                line_count += 1
+            excess = line_count - panel.max_lines
+            pos = cut
+            while excess > 0:
+                newline = panel.text.find("\n", pos)
+                if newline < 0:
+                    break
+                pos = newline + 1
+                excess -= 1
+            cut = pos
+        # 不裁剪实时行
+        cut = min(cut, len(panel.text) - panel.live_len)
+        if cut <= 0:
+            return
+
+        evicted = panel.text[:cut]
+        panel.widget.delete("1.0", f"1.0 + {cut} chars")
+        panel.text = panel.text[cut:]
+        self._write_session_log(panel.name, evicted)
+
+    def _write_session_log(self, name: str, text: str):
+        if not self.session_log_dir:
+            return
+        try:
+            if self._log_file is None:
+                os.makedirs(self.session_log_dir, exist_ok=True)
+                filename = datetime.now().strftime("session_%Y%m%d_%H%M%S.log")
+                self._log_file = open(os.path.join(self.session_log_dir, filename),
+                                      'a', encoding='utf-8')
+            self._log_file.write(f"[{datetime.now().strftime('%H:%M:%S')}] [{name}]\n{text}")
+            if not text.endswith("\n"):
+                self._log_file.write("\n")
+            self._log_file.flush()
+        except Exception as e:
+            print(f"写入会话日志出错: {e}")